@@ -1,6 +1,7 @@
 import base64
 import streamlit as st
 import os
+from finance.prewarm import start_prewarmer
 
 # Set the page configuration for the Streamlit app, including title and layout style
 st.set_page_config(
@@ -8,6 +9,10 @@ st.set_page_config(
     layout="wide"
 )
 
+# Start the background pre-warming of the Finance Analytics caches with the first session of the
+# server, so the finance page is already warm when a user opens it.
+start_prewarmer()
+
 # Sabta logo generated by ChatGPT using the following prompt:
 # "Generate a logo for a consulting interview preparation platform called 'SABTA'. The logo should be modern, professional, and also have some details. Use a color palette that includes blue."
 # OpenAI. (2025). ChatGPT (Version 4.o) [Large language model]. https://chatgpt.com
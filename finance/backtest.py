@@ -0,0 +1,293 @@
+# Vectorized backtests of simple trading rules over tickers x parameter grids.
+# Every rule computes the positions of all parameter combinations and tickers for a block of up to
+# BLOCK_DAYS days at once (days x combinations x tickers) with array operations, and the performance
+# statistics are accumulated block by block: sums, turnover and the wealth path of a block are
+# vectorized over its days, while wealth, its peak, the worst drawdown and the last position are carried
+# to the next block. A block holds at most BLOCK_VALUES grid cells, so memory stays bounded for any
+# history length, and the statistics are updated CHUNK_VALUES positions at a time so the work buffers
+# stay in the CPU cache. Moving averages and rolling statistics of every window come from one
+# cumulative sum of the prices. Large grids (long histories, many tickers) split the rows of the grid
+# over a process pool.
+#
+# Positions are decided on the close of day t and earn the return of day t + 1; transaction costs
+# are charged on every change in position.
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from finance.metrics import TRADING_DAYS, memoize_on_prices
+
+# Strategy -> (first parameter, second parameter, default grids). The grids are 50 x 50 where both
+# parameters are windows.
+STRATEGIES = {
+    "Moving-average crossover": ("Fast window", "Slow window",
+                                 tuple(range(2, 102, 2)), tuple(range(10, 260, 5))),
+    "Momentum": ("Lookback", "Skip (days)",
+                 tuple(range(5, 255, 5)), (0, 1, 2, 5, 10, 21)),
+    "Mean reversion": ("Window", "Entry z-score",
+                       tuple(range(5, 105, 5)), tuple(np.round(np.arange(0.5, 3.01, 0.25), 2).tolist())),
+}
+METRICS = ["Annual Return", "Sharpe Ratio", "Turnover", "Max Drawdown"]
+# Position values (days x combinations x tickers) above which the grid rows are spread over processes.
+POOL_MIN_VALUES = 500_000_000
+MAX_PROCESSES = 8
+# Days per block at most, grid cells (days x parameter combinations x tickers) per block at most, and
+# positions per update of the statistics.
+BLOCK_DAYS = 16
+BLOCK_VALUES = 4_000_000
+CHUNK_VALUES = 100_000
+
+
+def _cumulative_sums(prices):
+    """Cumulative sums of every column with a leading row of zeros (float64, days + 1 rows)."""
+    return np.vstack([np.zeros((1, prices.shape[1])), np.cumsum(prices, axis=0)])
+
+
+def _trailing_means(csum, days, windows):
+    """Trailing means of every window at the given days (days x windows x tickers, NaN before a full window)."""
+    start = days[:, None] + 1 - windows[None, :]
+    means = (csum[days + 1][:, None, :] - csum[np.maximum(start, 0)]) / windows[None, :, None]
+    means[start < 0] = np.nan
+    return means
+
+
+def _day_blocks(prices, n_cells):
+    """
+    Day indices in blocks of up to BLOCK_DAYS days with at most BLOCK_VALUES cells (n_cells x tickers
+    per day; at least one day).
+
+    The positions of the last day earn nothing, so the blocks stop one day before the end.
+    """
+    n_days = prices.shape[0] - 1
+    size = min(BLOCK_DAYS, max(1, BLOCK_VALUES // (n_cells * prices.shape[1])))
+    return (np.arange(start, min(start + size, n_days)) for start in range(0, n_days, size))
+
+
+def _running(ufunc, values, first, second):
+    """
+    Running product / maximum (np.multiply, np.maximum) of `values` along the first axis.
+
+    A scan in log2(days) shifted whole-array steps that write alternately into the same-shaped buffers
+    `first` and `second` (`values` is left unchanged): ufunc.accumulate runs element by element and is
+    several times slower than these vectorized steps for the short day axis of a block.
+    Returns the buffer that holds the result.
+    """
+    if values.shape[0] == 1:
+        np.copyto(first, values)
+        return first
+    shift, target = 1, first
+    while shift < values.shape[0]:
+        target[:shift] = values[:shift]
+        ufunc(values[shift:], values[:-shift], out=target[shift:])
+        values, target = target, (second if target is first else first)
+        shift *= 2
+    return values
+
+
+def _performance(position_blocks, returns, cost):
+    """
+    Statistics of positions over the same returns, accumulated block by block of days.
+
+    Parameters:
+        position_blocks (iterator): (days, combinations, tickers) float32 positions decided at each close,
+                                    consecutive blocks in date order.
+        returns (numpy.ndarray): (days, tickers) float32 daily returns; row t is the return into day t.
+        cost (float): Cost per unit of position change, as a fraction of the position value.
+    Returns:
+        dict: METRICS -> (combinations, tickers) arrays.
+    """
+    n_days = returns.shape[0] - 1
+    # Positions lie in [-1, 1] and change by at most 2, so capping the daily returns keeps every
+    # strategy return above -0.9999 (wealth stays positive).
+    limit = 0.9999 - 2 * cost
+    returns = np.clip(returns, -limit, limit)
+    cost = np.float32(cost)
+    day = 0
+    for block in position_blocks:
+        n, n_combinations, n_tickers = block.shape
+        if day == 0:
+            previous = np.zeros_like(block[0])
+            total, total_squares, turnover = np.zeros_like(previous), np.zeros_like(previous), np.zeros_like(previous)
+            wealth, peak, worst = np.ones_like(previous), np.ones_like(previous), np.ones_like(previous)
+            # Work buffers of one chunk (later blocks are never longer than the first); the updates
+            # write into them, so the loop does not allocate.
+            step = max(1, CHUNK_VALUES // (n * n_tickers))
+            buffers = np.empty((3, n, step, n_tickers), dtype=np.float32)
+        block_returns = returns[day + 1:day + 1 + n, None, :]
+        for c in range(0, n_combinations, step):
+            held, part = block[:, c:c + step], slice(c, c + step)
+            trade, strategy, scratch = buffers[:, :n, :held.shape[1]]
+            np.subtract(held[0], previous[part], out=trade[0])
+            np.subtract(held[1:], held[:-1], out=trade[1:])
+            np.abs(trade, out=trade)
+            np.multiply(held, block_returns, out=strategy)
+            if cost:
+                np.multiply(trade, cost, out=scratch)
+                strategy -= scratch
+            total[part] += strategy.sum(axis=0)
+            turnover[part] += trade.sum(axis=0)
+            np.multiply(strategy, strategy, out=scratch)
+            total_squares[part] += scratch.sum(axis=0)
+            # Wealth path of the block (start = wealth carried over), its running peak and the lowest
+            # wealth / peak ratio seen so far.
+            strategy += np.float32(1.0)
+            path = _running(np.multiply, strategy, scratch, trade)
+            path *= wealth[part]
+            free = (strategy, trade) if path is scratch else (strategy, scratch)
+            running_peak = _running(np.maximum, path, *free)
+            np.maximum(running_peak, peak[part], out=running_peak)
+            wealth[part], peak[part] = path[-1], running_peak[-1]
+            np.divide(path, running_peak, out=path)
+            np.minimum(worst[part], path.min(axis=0), out=worst[part])
+        previous = block[-1].copy()
+        day += n
+
+    mean = total.astype(np.float64) / n_days
+    variance = (total_squares.astype(np.float64) - n_days * mean ** 2) / (n_days - 1)
+    std = np.sqrt(np.maximum(variance, 0.0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(std > 0, mean / std * np.sqrt(TRADING_DAYS), 0.0)
+    return {
+        "Annual Return": wealth.astype(np.float64) ** (TRADING_DAYS / n_days) - 1.0,
+        "Sharpe Ratio": sharpe,
+        "Turnover": turnover.astype(np.float64) * TRADING_DAYS / n_days,
+        "Max Drawdown": worst.astype(np.float64) - 1.0,
+    }
+
+
+def _crossover_positions(prices, fast_windows, slow_windows):
+    """Long while the fast moving average is above the slow one, flat otherwise; fast >= slow is skipped."""
+    fast_windows, slow_windows = np.asarray(fast_windows), np.asarray(slow_windows)
+    valid = fast_windows[:, None] < slow_windows[None, :]
+    combinations = np.flatnonzero(valid)
+    csum = _cumulative_sums(prices)
+
+    def blocks():
+        for days in _day_blocks(prices, valid.size):
+            fast = _trailing_means(csum, days, fast_windows)
+            slow = _trailing_means(csum, days, slow_windows)
+            # Every fast against every slow window, then the valid combinations. NaN comparisons are
+            # False, so there is no position before the slow window is full.
+            above = (fast[:, :, None, :] > slow[:, None, :, :]).reshape(len(days), -1, prices.shape[1])
+            yield np.take(above, combinations, axis=1).astype(np.float32)
+
+    return blocks(), valid
+
+
+def _momentum_positions(prices, lookbacks, skips):
+    """Long after a positive, short after a negative trailing return (time-series momentum)."""
+    valid = np.ones((len(lookbacks), len(skips)), dtype=bool)
+    lookback_index, skip_index = np.nonzero(valid)
+    lookbacks, skips = np.asarray(lookbacks)[lookback_index], np.asarray(skips)[skip_index]
+    log_prices = np.log(prices)
+
+    def blocks():
+        for days in _day_blocks(prices, valid.size):
+            # Return from t - skip - lookback to t - skip, known at the close of day t.
+            end = days[:, None] - skips[None, :]
+            start = end - lookbacks[None, :]
+            signal = np.sign(log_prices[np.maximum(end, 0)] - log_prices[np.maximum(start, 0)])
+            signal[start < 0] = 0.0
+            yield signal.astype(np.float32)
+
+    return blocks(), valid
+
+
+def _mean_reversion_positions(prices, windows, thresholds):
+    """Long below -z, short above +z standard deviations from the trailing mean, flat in between."""
+    windows = np.asarray(windows)
+    thresholds = np.asarray(thresholds, dtype=np.float64)[None, None, :, None]
+    valid = np.ones((len(windows), thresholds.shape[2]), dtype=bool)
+    csum, csum_squares = _cumulative_sums(prices), _cumulative_sums(prices ** 2)
+
+    def blocks():
+        for days in _day_blocks(prices, valid.size):
+            mean = _trailing_means(csum, days, windows)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                z = ((prices[days][:, None, :] - mean) / np.sqrt(np.maximum(
+                    _trailing_means(csum_squares, days, windows) - mean ** 2, 0.0)))[:, :, None, :]
+            positions = (z < -thresholds).astype(np.float32)
+            positions -= z > thresholds
+            yield positions.reshape(len(days), -1, prices.shape[1])
+
+    return blocks(), valid
+
+
+_RULES = {
+    "Moving-average crossover": _crossover_positions,
+    "Momentum": _momentum_positions,
+    "Mean reversion": _mean_reversion_positions,
+}
+
+
+def _backtest_rows(strategy, values, returns, first, second, cost):
+    """
+    Backtest the grid rows `first` (one pool job).
+
+    Returns:
+        tuple: (valid combinations mask (first x second), METRICS -> (valid combinations, tickers) arrays
+               in the order of the mask, or None if no combination is valid).
+    """
+    position_blocks, valid = _RULES[strategy](values, first, second)
+    return valid, _performance(position_blocks, returns, cost) if valid.any() else None
+
+
+@memoize_on_prices
+def backtest_grid(prices, strategy, first=None, second=None, cost_bps=5.0, processes=None):
+    """
+    Backtest one strategy for every ticker and every combination of its two parameters.
+
+    Parameters:
+        prices (pandas.DataFrame): Adjusted prices, one column per ticker (dates with gaps are dropped).
+        strategy (str): One of STRATEGIES.
+        first (tuple): Values of the first parameter (default: the strategy's grid); sorted.
+        second (tuple): Values of the second parameter (default: the strategy's grid); sorted.
+        cost_bps (float): Transaction cost in basis points per unit of position change.
+        processes (int): Worker processes for large grids (default: CPU count, up to 8).
+    Returns:
+        pandas.DataFrame: METRICS columns, MultiIndex (first parameter, second parameter, Ticker).
+                          Invalid combinations (fast >= slow window) are NaN. Shared between reruns,
+                          do not modify in place.
+    Raises:
+        ValueError: If the strategy is unknown or there are fewer than three dates.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy '{strategy}', expected one of: {', '.join(STRATEGIES)}.")
+    first_name, second_name, first_grid, second_grid = STRATEGIES[strategy]
+    # Sorted grids give ordered heatmap axes.
+    first = tuple(sorted(set(first_grid if first is None else first)))
+    second = tuple(sorted(set(second_grid if second is None else second)))
+    values = prices.dropna().to_numpy(dtype=np.float64)
+    if values.shape[0] < 3:
+        raise ValueError("At least three dates are needed for a backtest.")
+    # Normalized prices keep the cumulative sums well conditioned.
+    values = values / values[0]
+    returns = np.vstack([np.zeros((1, values.shape[1])), values[1:] / values[:-1] - 1.0]).astype(np.float32)
+
+    cost = cost_bps / 10_000
+    n_values = values.shape[0] * len(first) * len(second) * values.shape[1]
+    workers = 1 if n_values < POOL_MIN_VALUES else min(
+        len(first), processes or min(MAX_PROCESSES, multiprocessing.cpu_count()))
+    # Interleaved rows give every job a similar share of the valid combinations.
+    row_sets = [first[i::workers] for i in range(workers)]
+    if workers > 1:
+        # "spawn" avoids forking a process that runs other threads (the web server).
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            parts = list(pool.map(_backtest_rows, repeat(strategy), repeat(values), repeat(returns),
+                                  row_sets, repeat(second), repeat(cost)))
+    else:
+        parts = [_backtest_rows(strategy, values, returns, first, second, cost)]
+
+    results = {metric: np.full((len(first), len(second), values.shape[1]), np.nan) for metric in METRICS}
+    for i, (valid, stats) in enumerate(parts):
+        if stats is None:
+            continue
+        for metric in METRICS:
+            rows = results[metric][i::workers]
+            rows[valid] = stats[metric]
+    index = pd.MultiIndex.from_product([first, second, prices.columns], names=[first_name, second_name, "Ticker"])
+    return pd.DataFrame({metric: results[metric].ravel() for metric in METRICS}, index=index)
@@ -0,0 +1,224 @@
+# Offline benchmark suite for the Finance Analytics computations.
+# Seeded synthetic price matrices of increasing size (tickers x years) are pushed through the same
+# engine functions the page uses, stage by stage, and every stage records its wall time (best of
+# several runs, memo caches cleared before each run) and peak memory (tracemalloc, in a separate
+# run so tracing does not distort the timings). tracemalloc only sees the current process, so stages
+# that can use a process pool (backtest grid, pairs scan) run with one process here. Slow stages are
+# timed once and only run up to their own size cap (SLOW_STAGES). Results are written as JSON or CSV so
+# they can be compared between releases.
+#
+# Usage: python -m finance.benchmark [--tickers 10 100 1000] [--years 1 5 20] [--out results.json]
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from finance.backtest import backtest_grid
+from finance.clustering import cluster_sweep
+from finance.correlation import LARGE_UNIVERSE, CovarianceStore, cluster_order
+from finance.indicators import INDICATORS, compute_indicator, price_bars
+from finance.metrics import TRADING_DAYS, compute_price_metrics, metrics_table
+from finance.pairs import candidate_pairs, scan_pairs
+from finance.pca import principal_components
+from finance.providers import SyntheticProvider, synthetic_universe
+from finance.regression import batch_regression
+from finance.risk import risk_table
+
+TICKER_COUNTS = [10, 100, 1000]
+YEARS = [1, 5, 20]
+BENCHMARKS = ["^GSPC", "^DJI", "^IXIC"]
+REPEAT = 3
+# Stages that are timed once, with the largest price matrix (days x tickers) they run on; larger
+# combinations are skipped (the 50 x 50 crossover grid takes minutes at 1000 tickers x 20 years).
+SLOW_STAGES = {"backtest_crossover_grid": 600_000, "pairs_scan": None}
+MEMORY_METHOD = "tracemalloc, single process"
+# Fixed last date, so a given seed always produces exactly the same matrices.
+LAST_DATE = "2024-12-31"
+
+
+def synthetic_prices(n_tickers, years, seed=42):
+    """
+    Seeded synthetic adjusted prices for n_tickers stocks and the benchmark indices.
+
+    Returns:
+        tuple[pandas.DataFrame, pandas.DataFrame]: (stock prices, benchmark prices), business-day index.
+    """
+    provider = SyntheticProvider(seed)
+    n_days = years * TRADING_DAYS + 1
+    index = pd.bdate_range(end=LAST_DATE, periods=n_days, name="Date")
+
+    def to_prices(tickers):
+        log_returns = provider.log_returns(tickers, n_days)
+        log_returns[0] = 0.0
+        return pd.DataFrame(100.0 * np.exp(np.cumsum(log_returns, axis=0)), index=index, columns=tickers)
+
+    return to_prices(synthetic_universe(n_tickers)), to_prices(BENCHMARKS)
+
+
+def _clear_caches():
+    for func in (compute_price_metrics, metrics_table, cluster_sweep, risk_table, backtest_grid,
+                 scan_pairs, principal_components, compute_indicator):
+        func.cache_clear()
+
+
+def pipeline_stages(prices, bench_prices):
+    """
+    The page's computations as (name, callable) pairs, in page order. Inputs of later stages are
+    prepared up front, so every stage only measures its own work.
+    """
+    returns = prices.pct_change().dropna()
+    bench_returns = bench_prices.pct_change().dropna()
+    features = compute_price_metrics(prices)['features']
+    # Primed covariance store; the stage deselects and reselects the last ticker (one row/column each way).
+    store = CovarianceStore().update(returns)
+    without_last = returns.iloc[:, :-1]
+    candidates = candidate_pairs(CovarianceStore().update(returns).correlation())
+    bars = price_bars(prices)
+
+    def indicators():
+        return [compute_indicator(bars, name, params) for name, params in INDICATORS.items()]
+
+    def correlation():
+        # As on the page's first load: a fresh store, clustered order in large-universe mode.
+        corr = CovarianceStore().update(returns).correlation(returns.columns)
+        if returns.shape[1] > LARGE_UNIVERSE:
+            order = cluster_order(corr)
+            corr = corr.loc[order, order]
+        return corr
+
+    def drawdown():
+        growth = np.cumprod(1.0 + returns.to_numpy(), axis=0)
+        return growth / np.maximum.accumulate(growth, axis=0) - 1.0
+
+    return [
+        ("normalize", lambda: prices.div(prices.iloc[0]) * 100.0),
+        ("pct_change", lambda: prices.pct_change().dropna()),
+        ("price_metrics", lambda: compute_price_metrics(prices)),
+        ("annualized_metrics", lambda: metrics_table(prices, 0.02)),
+        ("drawdown", drawdown),
+        ("correlation", correlation),
+        ("correlation_toggle_one", lambda: store.update(without_last).update(returns).correlation()),
+        ("kmeans_silhouette", lambda: cluster_sweep(features)),
+        ("beta_regression", lambda: batch_regression(returns, bench_returns)),
+        ("var_cvar", lambda: risk_table(returns, (1.0,) * returns.shape[1])),
+        # One process, so tracemalloc sees every allocation of the pooled stages.
+        ("backtest_crossover_grid", lambda: backtest_grid(prices, "Moving-average crossover", None, None, 5.0, 1)),
+        ("pairs_scan", lambda: scan_pairs(prices, candidates, 1)),
+        ("pca", lambda: principal_components(returns)),
+        ("indicators", indicators),
+    ]
+
+
+def measure(func, repeat=REPEAT):
+    """
+    Best wall time over `repeat` runs and peak traced memory of one extra run.
+
+    Returns:
+        tuple[float, float]: (seconds, peak MiB allocated during the call).
+    """
+    timings = []
+    for _ in range(repeat):
+        _clear_caches()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    _clear_caches()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(timings), peak / 2 ** 20
+
+
+def run_suite(ticker_counts=TICKER_COUNTS, years=YEARS, repeat=REPEAT, seed=42, stages=None, progress=None):
+    """
+    Run every stage for every (tickers, years) combination (slow stages only up to their size cap).
+
+    Parameters:
+        ticker_counts (list[int]): Universe sizes.
+        years (list[int]): History lengths in years.
+        repeat (int): Timed runs per stage (the best one is reported); slow stages run once.
+        seed (int): Seed of the synthetic data.
+        stages (list[str]): Only run these stages (default: all).
+        progress (callable): Optional progress(record) callback, e.g. for printing.
+    Returns:
+        list[dict]: One record per combination and stage (tickers, years, days, stage, runs, seconds,
+                    peak_mib, memory_method).
+    """
+    records = []
+    for n_tickers in ticker_counts:
+        for n_years in years:
+            prices, bench_prices = synthetic_prices(n_tickers, n_years, seed)
+            for name, func in pipeline_stages(prices, bench_prices):
+                if stages and name not in stages:
+                    continue
+                runs = repeat
+                if name in SLOW_STAGES:
+                    cap = SLOW_STAGES[name]
+                    if cap is not None and prices.size > cap:
+                        continue
+                    runs = 1
+                seconds, peak_mib = measure(func, runs)
+                record = {"tickers": n_tickers, "years": n_years, "days": len(prices), "stage": name,
+                          "runs": runs, "seconds": round(seconds, 6), "peak_mib": round(peak_mib, 3),
+                          "memory_method": MEMORY_METHOD}
+                records.append(record)
+                if progress:
+                    progress(record)
+    return records
+
+
+def environment():
+    """Versions and machine details stored with the results."""
+    import sklearn
+    import scipy
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scipy": scipy.__version__,
+        "scikit-learn": sklearn.__version__,
+    }
+
+
+def write_results(records, path, seed):
+    """Write results as CSV (if path ends with .csv) or JSON with an environment header."""
+    if path.endswith(".csv"):
+        pd.DataFrame(records).to_csv(path, index=False)
+        return
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "seed": seed, "results": records}, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Finance Analytics pipeline on synthetic data.")
+    parser.add_argument("--tickers", nargs="+", type=int, default=TICKER_COUNTS)
+    parser.add_argument("--years", nargs="+", type=int, default=YEARS)
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="Timed runs per stage (slow stages run once).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stages", nargs="+", help="Only run these stages.")
+    parser.add_argument("--out", default="benchmark-results.json", help="Output file (.json or .csv).")
+    args = parser.parse_args(argv)
+
+    def progress(record):
+        print(f"{record['tickers']:>5} tickers {record['years']:>3}y  {record['stage']:<20}"
+              f"{record['seconds'] * 1000:>10.1f} ms {record['peak_mib']:>10.1f} MiB", file=sys.stderr)
+
+    records = run_suite(args.tickers, args.years, args.repeat, args.seed, args.stages, progress)
+    write_results(records, args.out, args.seed)
+
+
+if __name__ == "__main__":
+    main()
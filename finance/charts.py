@@ -0,0 +1,92 @@
+# Downsampled WebGL line charts for long price histories.
+# Instead of melting the wide price frame into a long frame and sending every daily point of every
+# ticker to the browser, each column is reduced to the minimum and maximum of every bucket of a
+# pixel-width budget (so peaks and troughs survive) and drawn as one Scattergl trace. A date window
+# can be passed in to show a zoomed range at full resolution.
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Approximate drawable chart width in pixels; one min and one max point are kept per pixel pair.
+CHART_WIDTH_PX = 1200
+
+
+def minmax_indices(values, n_buckets):
+    """
+    Row positions to keep per column: first, last, and the min and max of each of n_buckets buckets.
+
+    Parameters:
+        values (numpy.ndarray): 2D array (rows = time, columns = series); NaNs are ignored.
+        n_buckets (int): Number of buckets the time axis is split into.
+    Returns:
+        list[numpy.ndarray]: Sorted row positions for every column.
+    """
+    n_rows, n_cols = values.shape
+    if n_rows <= 2 * n_buckets + 2:
+        return [np.arange(n_rows)] * n_cols
+    # Bucket boundaries over the whole time axis; every bucket gets roughly the same number of rows.
+    edges = np.linspace(0, n_rows, n_buckets + 1).astype(int)
+    bucket_len = np.diff(edges).max()
+    # Pad the time axis so it reshapes into (buckets x bucket_len) blocks for all columns at once.
+    padded_index = np.minimum(edges[:-1, None] + np.arange(bucket_len)[None, :], edges[1:, None] - 1)
+    blocks = values[padded_index]                    # (buckets, bucket_len, columns)
+    filled_low = np.where(np.isnan(blocks), np.inf, blocks)
+    filled_high = np.where(np.isnan(blocks), -np.inf, blocks)
+    # Position inside each bucket -> absolute row position.
+    bucket_rows = np.arange(n_buckets)[:, None]
+    arg_min = padded_index[bucket_rows, filled_low.argmin(axis=1)]     # (buckets, columns)
+    arg_max = padded_index[bucket_rows, filled_high.argmax(axis=1)]
+    ends = np.array([0, n_rows - 1])
+    return [np.unique(np.concatenate([ends, arg_min[:, j], arg_max[:, j]])) for j in range(n_cols)]
+
+
+def downsample(frame, max_points=CHART_WIDTH_PX):
+    """
+    Min/max-per-bucket downsampling of every column of a wide, time-indexed frame.
+
+    Returns:
+        dict: {column: pandas.Series} with at most about max_points points per column.
+    """
+    positions = minmax_indices(frame.to_numpy(dtype=np.float64), max(1, max_points // 2))
+    return {
+        column: frame[column].iloc[pos].dropna()
+        for column, pos in zip(frame.columns, positions)
+    }
+
+
+def line_traces(frame, max_points=CHART_WIDTH_PX, date_range=None, **trace_args):
+    """
+    Downsampled Scattergl line traces (one per column) of a wide, time-indexed frame, e.g. for
+    subplots; see line_figure for the parameters. Extra keyword arguments are passed to every trace.
+    """
+    if date_range is not None:
+        start, end = pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1])
+        frame = frame.loc[(frame.index >= start) & (frame.index <= end)]
+    traces = []
+    for column, series in downsample(frame, max_points).items():
+        # Dates as epoch milliseconds and values as float32 are sent as compact binary arrays.
+        x_ms = series.index.to_numpy(dtype="datetime64[ms]").astype(np.int64)
+        traces.append(go.Scattergl(x=x_ms, y=series.to_numpy(dtype=np.float32), mode="lines", name=str(column),
+                                   **trace_args))
+    return traces
+
+
+def line_figure(frame, title, y_label, max_points=CHART_WIDTH_PX, date_range=None):
+    """
+    Build a WebGL line chart (one Scattergl trace per column) from a wide, time-indexed frame.
+
+    Parameters:
+        frame (pandas.DataFrame): Date index, one column per series.
+        title (str): Chart title.
+        y_label (str): Y-axis title.
+        max_points (int): Point budget per series after downsampling.
+        date_range (tuple): Optional (start, end) window; only that window is downsampled and shown,
+                            so narrow windows are drawn at full resolution.
+    Returns:
+        plotly.graph_objects.Figure
+    """
+    fig = go.Figure(line_traces(frame, max_points, date_range))
+    fig.update_layout(title=title, xaxis_title="Date", yaxis_title=y_label)
+    fig.update_xaxes(type="date")
+    return fig
@@ -0,0 +1,49 @@
+# Precomputed K-Means sweep for the risk/return clustering.
+# All cluster counts of the slider are fitted once per feature set (in parallel) together with
+# their inertia and silhouette score, and memoized on the content hash of the features. Moving the
+# slider then only selects a stored result, and the scores give an elbow/silhouette chart for free.
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+from finance.metrics import memoize_on_prices
+
+# Cluster counts offered by the page slider.
+K_VALUES = tuple(range(2, 7))
+
+
+def _fit(X, k):
+    """Fit one K-Means model; silhouette is only defined for 2 <= k < number of samples."""
+    kmeans = KMeans(n_clusters=k, n_init='auto', random_state=42)
+    labels = kmeans.fit_predict(X)
+    silhouette = silhouette_score(X, labels) if 1 < k < X.shape[0] else np.nan
+    return labels, kmeans.inertia_, silhouette
+
+
+@memoize_on_prices
+def cluster_sweep(features, k_values=K_VALUES):
+    """
+    Fit K-Means for every feasible k on standardized features, in parallel.
+
+    Parameters:
+        features (pandas.DataFrame): One row per stock, numeric feature columns.
+        k_values (tuple[int]): Cluster counts to evaluate (counts above the number of stocks are skipped).
+    Returns:
+        dict: 'labels' ({k: numpy.ndarray of cluster labels}) and
+              'scores' (DataFrame indexed by k with Inertia and Silhouette columns).
+    """
+    # Scale features before clustering (K-Means is distance-based, so it's good to normalize features).
+    X = StandardScaler().fit_transform(features)
+    feasible = [k for k in k_values if k <= X.shape[0]]
+    with ThreadPoolExecutor(max_workers=max(1, len(feasible))) as pool:
+        fits = dict(zip(feasible, pool.map(lambda k: _fit(X, k), feasible)))
+    scores = pd.DataFrame(
+        {'Inertia': [fits[k][1] for k in feasible], 'Silhouette': [fits[k][2] for k in feasible]},
+        index=pd.Index(feasible, name='Clusters')
+    )
+    return {'labels': {k: fits[k][0] for k in feasible}, 'scores': scores}
@@ -0,0 +1,149 @@
+# Correlation analysis that scales to index-sized universes.
+# A CovarianceStore keeps the float32 cross-products of the centered returns of the current
+# selection, so adding or removing a ticker only computes or drops that ticker's row and column.
+# Rows/columns are ordered by hierarchical clustering so related stocks sit next to each other in
+# the heatmap, and the most/least correlated pairs are read straight from the upper triangle with a
+# partial sort instead of melting the matrix into a long frame.
+
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import leaves_list, linkage
+from scipy.spatial.distance import squareform
+
+# Above this many tickers the page switches to the large-universe heatmap.
+LARGE_UNIVERSE = 25
+
+
+def cluster_order(corr):
+    """
+    Order tickers so that highly correlated ones are adjacent (average-linkage clustering on the
+    correlation distance sqrt((1 - rho) / 2)).
+
+    Returns:
+        list: Ticker labels in heatmap order.
+    """
+    if corr.shape[0] < 3:
+        return list(corr.index)
+    distance = np.sqrt(np.clip((1.0 - np.nan_to_num(corr.to_numpy(dtype=np.float64))) / 2.0, 0.0, None))
+    np.fill_diagonal(distance, 0.0)
+    tree = linkage(squareform(distance, checks=False), method="average")
+    return list(corr.index[leaves_list(tree)])
+
+
+def top_pairs(corr, k=10):
+    """
+    Most and least correlated ticker pairs from the upper triangle (no long-format frame).
+
+    Parameters:
+        corr (pandas.DataFrame): Correlation matrix.
+        k (int): Number of pairs per table.
+    Returns:
+        tuple[pandas.DataFrame, pandas.DataFrame]: (most correlated, least correlated), each with
+                                                   columns Ticker A, Ticker B and Correlation.
+    """
+    n = corr.shape[0]
+    rows, cols = np.triu_indices(n, k=1)
+    values = corr.to_numpy()[rows, cols]
+    values = np.where(np.isnan(values), 0.0, values)
+    k = min(k, values.size)
+
+    def table(order):
+        return pd.DataFrame({
+            'Ticker A': corr.index[rows[order]],
+            'Ticker B': corr.columns[cols[order]],
+            'Correlation': values[order]
+        })
+
+    if k == 0:
+        return table(np.array([], dtype=int)), table(np.array([], dtype=int))
+    # argpartition finds the k extremes in O(n^2); only those k values are then sorted.
+    highest = np.argpartition(values, values.size - k)[values.size - k:]
+    highest = highest[np.argsort(values[highest])[::-1]]
+    lowest = np.argpartition(values, k - 1)[:k]
+    lowest = lowest[np.argsort(values[lowest])]
+    return table(highest), table(lowest)
+
+
+class CovarianceStore:
+    """
+    Incrementally maintained covariance/correlation of a changing set of return columns.
+
+    Keeps the sufficient statistics over one aligned date index: every ticker's returns centered on
+    their own mean, and the matrix of their cross-products (sums of squared deviations on the
+    diagonal), both in float32 (half the memory and matrix-product time of float64; centering first
+    avoids the cancellation of raw sums of squares). update() compares the new returns frame with
+    the stored columns: tickers that are gone (or whose data changed) have their row and column
+    dropped, and new tickers get one matrix product against the stored columns, O(T * n) per added
+    ticker instead of O(T * n^2) for a full recomputation. A different date index (e.g. a shorter
+    period, or a ticker with a shorter history) starts over.
+    """
+
+    def __init__(self):
+        self.index = None
+        self.tickers = []
+        self._values = np.empty((0, 0), dtype=np.float32)
+        self._cross = np.empty((0, 0), dtype=np.float32)
+
+    def _reset(self, index):
+        self.index = index
+        self.tickers = []
+        self._values = np.empty((len(index), 0), dtype=np.float32)
+        self._cross = np.empty((0, 0), dtype=np.float32)
+
+    def update(self, returns):
+        """
+        Bring the statistics in line with the columns of `returns` (daily returns without missing values).
+
+        Returns:
+            CovarianceStore: self, so calls can be chained (store.update(returns).correlation()).
+        """
+        if self.index is None or not self.index.equals(returns.index):
+            self._reset(returns.index)
+        columns = [str(c) for c in returns.columns]
+        values = returns.to_numpy(dtype=np.float32)
+        # A column's mean only depends on its own data, so stored and new columns are centered alike.
+        values = values - values.mean(axis=0, dtype=np.float64).astype(np.float32)
+        position = {t: j for j, t in enumerate(columns)}
+
+        # Drop tickers that were deselected or whose data changed: one row and column each.
+        # (Comparing the stored columns with the new ones is one vectorized O(T * n) pass.)
+        present = [i for i, t in enumerate(self.tickers) if t in position]
+        unchanged = (self._values[:, present] == values[:, [position[self.tickers[i]] for i in present]]).all(axis=0)
+        keep = [i for i, same in zip(present, unchanged) if same]
+        if len(keep) < len(self.tickers):
+            self.tickers = [self.tickers[i] for i in keep]
+            self._values = self._values[:, keep]
+            self._cross = self._cross[np.ix_(keep, keep)]
+
+        # Add new tickers: their cross-products with the stored columns and with each other.
+        stored = set(self.tickers)
+        added = [t for t in columns if t not in stored]
+        if added:
+            new = values[:, [position[t] for t in added]]
+            old_new = self._values.T @ new
+            self._cross = np.block([[self._cross, old_new], [old_new.T, new.T @ new]])
+            self._values = np.hstack([self._values, new])
+            self.tickers += added
+        return self
+
+    def _positions(self, tickers):
+        lookup = {t: i for i, t in enumerate(self.tickers)}
+        return [lookup[str(t)] for t in tickers]
+
+    def covariance(self, tickers=None):
+        """Sample covariance matrix (ddof=1, float32) of the given tickers (default: all, in stored order)."""
+        tickers = self.tickers if tickers is None else list(tickers)
+        pos = self._positions(tickers)
+        cov = self._cross[np.ix_(pos, pos)] / np.float32(len(self.index) - 1)
+        return pd.DataFrame(cov, index=tickers, columns=tickers)
+
+    def correlation(self, tickers=None):
+        """Pearson correlation matrix of the given tickers (default: all, in stored order)."""
+        cov = self.covariance(tickers)
+        values = cov.to_numpy()
+        scale = np.sqrt(np.clip(np.diag(values), 0.0, None))
+        # Constant series have no defined correlation; leave them as NaN instead of dividing by zero.
+        scale[scale == 0] = np.nan
+        corr = np.clip(values / np.outer(scale, scale), -1, 1)
+        np.fill_diagonal(corr, 1)
+        return pd.DataFrame(corr, index=cov.index, columns=cov.columns)
@@ -0,0 +1,330 @@
+# Importable analytics engine behind the Finance Analytics page.
+# Loading (price store and fundamentals cache), cleaning, the metrics table, the Beta/Alpha
+# regression, the risk/return clustering and the valuation multiples are plain functions without
+# Streamlit, so the page, notebooks and the batch command line compute exactly the same numbers:
+#
+#   python -m finance.engine report AAPL MSFT NVDA --start 2024-01-01 --end 2025-01-01 --out report.parquet
+#
+# The heavy lifting stays in the memoized modules (metrics, regression, clustering); this module only
+# wires them together and owns the data handling that used to live in the page script.
+
+import argparse
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from finance.clustering import K_VALUES, cluster_sweep
+from finance.fetch import fetch_all
+from finance.fundamentals import get_fundamentals_store
+from finance.indicators import price_bars
+from finance.metrics import compute_price_metrics, metrics_table
+from finance.price_store import get_price_store
+from finance.regression import batch_regression
+
+# Benchmark indices for the regression (all are loaded, one is reported).
+BENCHMARKS = ["^GSPC", "^DJI", "^IXIC"]
+DEFAULT_BENCHMARK = "^GSPC"
+N_CLUSTERS = 3
+REGRESSION_COLUMNS = ['Beta', 'Alpha', 'R-squared', 'Residual Vol']
+# Valuation multiple -> fundamentals field (Yahoo Finance info key).
+MULTIPLES = {
+    'Trailing P/E': 'trailingPE',
+    'Forward P/E': 'forwardPE',
+    'PEG Ratio': 'pegRatio',
+    'Price/Book': 'priceToBook',
+    'EV/EBITDA': 'enterpriseToEbitda',
+    'EV/Sales': 'enterpriseToSales'
+}
+REPORT_FORMATS = (".parquet", ".csv")
+
+
+def load_prices(tickers, start_date, end_date):
+    """
+    Fetch historical stock data (OHLCV) for given tickers and date range.
+
+    Prices come from the local price store (finance/price_store.py): only date ranges that are not
+    stored yet (plus the newest bars) are downloaded, everything else is read from disk.
+
+    Parameters:
+        tickers (list[str] | str): List of stock ticker symbols (or a single symbol).
+        start_date (datetime.date): Start date for historical data.
+        end_date (datetime.date): End date for historical data (exclusive).
+    Returns:
+        pandas.DataFrame: MultiIndex columns ([Open, High, Low, Close, Adj Close, Volume] x Ticker).
+    """
+    return get_price_store().get_prices(tickers, start_date, end_date)
+
+
+def load_fundamentals(tickers):
+    """
+    Return the valuation fields for the given tickers from the local fundamentals cache
+    (finance/fundamentals.py), which only goes to the data source for tickers older than a day.
+
+    Returns:
+        tuple[dict, dict]: ({ticker: {info key: value}}, {ticker: exception} for tickers without data).
+    """
+    return get_fundamentals_store().get(tickers)
+
+
+def fetch_inputs(tickers, start_date, end_date, benchmarks=BENCHMARKS, fundamentals_tickers=None,
+                 price_loader=load_prices, fundamentals_loader=load_fundamentals, initializer=None):
+    """
+    Load stock prices, benchmark prices and fundamentals concurrently (see finance/fetch.py), so the
+    wait is roughly the slowest single call rather than the sum of all calls.
+
+    Parameters:
+        tickers (list[str]): Stock tickers, or None to skip the prices (e.g. for uploaded data).
+        start_date (datetime.date): Start date.
+        end_date (datetime.date): End date (exclusive).
+        benchmarks (list[str]): Benchmark indices, loaded in one request.
+        fundamentals_tickers (list[str]): Tickers for the fundamentals (default: `tickers`).
+        price_loader (callable): Replacement for load_prices (e.g. a cached wrapper).
+        fundamentals_loader (callable): Replacement for load_fundamentals.
+        initializer (callable): Run once in every worker thread, see fetch_all.
+    Returns:
+        tuple[dict, dict]: (results, errors) with the keys "benchmarks", "prices" (if requested)
+                           and "fundamentals".
+    """
+    fundamentals_tickers = tickers if fundamentals_tickers is None else fundamentals_tickers
+    tasks = {"benchmarks": lambda: price_loader(benchmarks, start_date, end_date)}
+    if tickers is not None:
+        tasks["prices"] = lambda: price_loader(tickers, start_date, end_date)
+    tasks["fundamentals"] = lambda: fundamentals_loader(fundamentals_tickers)
+    return fetch_all(tasks, initializer=initializer)
+
+
+def adjusted_close(data, tickers):
+    """
+    Adjusted closing prices (one column per ticker) from the OHLCV data of load_prices.
+
+    Adjusted Close reflects true performance (adjusted for splits and dividends). Multi-ticker data has
+    (field, ticker) columns; single-ticker data only the fields, so its column is named after the ticker.
+    """
+    if isinstance(data.columns, pd.MultiIndex):
+        return data['Adj Close'].copy()
+    stock_prices = data[['Adj Close']].copy()
+    stock_prices.columns = [tickers[0] if isinstance(tickers, list) else tickers]
+    return stock_prices
+
+
+def clean_prices(prices):
+    """
+    Prepare a price matrix for the analysis without modifying it (cached inputs stay untouched).
+
+    The index becomes a DatetimeIndex, gaps (non-trading days, missing data points) are forward-filled,
+    and dates before any ticker has data as well as tickers without any data are dropped.
+
+    Parameters:
+        prices (pandas.DataFrame): Prices, one column per ticker.
+    Returns:
+        pandas.DataFrame: The cleaned prices (possibly empty).
+    """
+    if not isinstance(prices.index, pd.DatetimeIndex):
+        prices = prices.set_axis(pd.to_datetime(prices.index), axis=0)
+    if prices.isnull().values.any():
+        prices = prices.ffill()
+    return prices.dropna(axis=0, how='all').dropna(axis=1, how='all')
+
+
+def adjusted_bars(data, prices):
+    """
+    High, low and close prices for the technical indicators (see indicators.price_bars).
+
+    Highs and lows are adjusted like the closing prices (by Adj Close / Close) and aligned with the
+    cleaned `prices`. Without OHLCV data (uploaded closing prices) they fall back to the close.
+    """
+    if data is None:
+        return price_bars(prices)
+    fields = data if isinstance(data.columns, pd.MultiIndex) else data.set_axis(
+        pd.MultiIndex.from_product([data.columns, prices.columns]), axis=1)
+    adjustment = fields['Adj Close'] / fields['Close']
+    high = (fields['High'] * adjustment).reindex_like(prices).ffill()
+    low = (fields['Low'] * adjustment).reindex_like(prices).ffill()
+    return price_bars(prices, high, low)
+
+
+def benchmark_returns(bench_data):
+    """
+    Daily returns of every benchmark index that returned data.
+
+    Returns:
+        pandas.DataFrame: One column per benchmark, or None if no benchmark has data.
+    """
+    bench_prices = bench_data['Adj Close'].dropna(axis=1, how='all')
+    returns = bench_prices.pct_change().dropna()
+    return None if returns.empty else returns
+
+
+def metrics_report(prices, risk_free_rate=0.0, regression=None, benchmark=DEFAULT_BENCHMARK):
+    """
+    Metrics table of every ticker, with the regression against one benchmark if available.
+
+    Parameters:
+        prices (pandas.DataFrame): Cleaned adjusted prices, one column per ticker.
+        risk_free_rate (float): Annual risk-free rate as a decimal (for the Sharpe ratio).
+        regression (pandas.DataFrame): Result of batch_regression (Benchmark, Ticker index), or None.
+        benchmark (str): Benchmark whose Beta, Alpha, R-squared and Residual Vol are added.
+    Returns:
+        pandas.DataFrame: One row per ticker, a new frame the caller may modify.
+    """
+    # Copy: metrics_table is memoized and shared.
+    report = metrics_table(prices, risk_free_rate).copy()
+    if regression is not None and benchmark in regression.index.get_level_values('Benchmark'):
+        selected = regression.xs(benchmark, level='Benchmark')
+        for column in REGRESSION_COLUMNS:
+            report[column] = selected[column]
+    return report
+
+
+def cluster_labels(features, n_clusters=N_CLUSTERS):
+    """
+    K-Means cluster of every stock on its return and volatility (standardized).
+
+    Cluster counts offered by the page come from the shared, memoized sweep over K_VALUES.
+
+    Parameters:
+        features (pandas.DataFrame): Return (%) and Volatility (%) per stock (compute_price_metrics).
+        n_clusters (int): Number of clusters.
+    Returns:
+        tuple[pandas.Series, float]: (cluster label per stock, silhouette score or NaN).
+    Raises:
+        ValueError: If there are fewer stocks than clusters.
+    """
+    if n_clusters > features.shape[0]:
+        raise ValueError(f"Number of clusters ({n_clusters}) cannot exceed number of stocks ({features.shape[0]}).")
+    k_values = K_VALUES if n_clusters in K_VALUES else (n_clusters,)
+    sweep = cluster_sweep(features[['Return (%)', 'Volatility (%)']], k_values)
+    labels = pd.Series(sweep['labels'][n_clusters], index=features.index, name='Cluster')
+    return labels, sweep['scores'].loc[n_clusters, 'Silhouette']
+
+
+def valuation_multiples(fundamentals, tickers):
+    """
+    Valuation multiples (MULTIPLES) per ticker; tickers without fundamentals get empty (NaN) rows.
+
+    Parameters:
+        fundamentals (dict): {ticker: {info key: value}}, see load_fundamentals.
+        tickers (list[str]): Row order.
+    Returns:
+        pandas.DataFrame: One row per ticker, one float column per multiple.
+    """
+    rows = {}
+    for ticker in tickers:
+        info = fundamentals.get(ticker) or {}
+        rows[ticker] = {name: info.get(field) for name, field in MULTIPLES.items()}
+    return pd.DataFrame.from_dict(rows, orient='index', columns=list(MULTIPLES)).astype(np.float64)
+
+
+def analyze(tickers, start_date, end_date, risk_free_rate=0.0, benchmark=DEFAULT_BENCHMARK,
+            n_clusters=N_CLUSTERS):
+    """
+    Full metrics report for a ticker list and date range, as on the page with the given settings.
+
+    Parameters:
+        tickers (list[str]): Stock tickers.
+        start_date (datetime.date): Start date.
+        end_date (datetime.date): End date (exclusive).
+        risk_free_rate (float): Annual risk-free rate as a decimal.
+        benchmark (str): Benchmark index for Beta, Alpha, R-squared and Residual Vol.
+        n_clusters (int): Number of risk/return clusters (skipped if there are fewer stocks).
+    Returns:
+        tuple[pandas.DataFrame, dict]: (report, warnings). The report has one row per ticker with the
+                                       metrics, regression, clustering features, Cluster and valuation
+                                       multiples; warnings maps a part of the report to why it is missing.
+    Raises:
+        ValueError: If no prices could be loaded for any of the tickers.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    fetched, errors = fetch_inputs(tickers, start_date, end_date)
+    if "prices" in errors:
+        raise ValueError(f"Could not load price data: {errors['prices']}")
+    prices = clean_prices(adjusted_close(fetched["prices"], tickers))
+    if prices.empty:
+        raise ValueError("No price data available for the selected tickers and period.")
+    warnings = {}
+    missing = [t for t in tickers if t not in prices.columns]
+    if missing:
+        warnings["prices"] = f"no price data for {', '.join(missing)}"
+
+    price_metrics = compute_price_metrics(prices)
+    regression = None
+    bench_returns = None if "benchmarks" in errors else benchmark_returns(fetched["benchmarks"])
+    if bench_returns is not None and benchmark in bench_returns.columns:
+        regression = batch_regression(price_metrics['returns'], bench_returns[[benchmark]])
+    else:
+        warnings["regression"] = f"no data for benchmark {benchmark}"
+    report = metrics_report(prices, risk_free_rate, regression, benchmark)
+
+    features = price_metrics['features']
+    report = report.join(features)
+    try:
+        report['Cluster'], _ = cluster_labels(features, n_clusters)
+    except ValueError as e:
+        warnings["clusters"] = str(e)
+
+    fundamentals, failed = fetched.get("fundamentals", ({}, {}))
+    if "fundamentals" in errors:
+        failed = {t: errors["fundamentals"] for t in tickers}
+    failed = [t for t in prices.columns if t in failed]
+    if failed:
+        warnings["multiples"] = f"no valuation data for {', '.join(failed)}"
+    report = report.join(valuation_multiples(fundamentals, list(prices.columns)))
+    report.index.name = 'Ticker'
+    return report, warnings
+
+
+def write_report(report, path):
+    """Write a report to Parquet or CSV, chosen by the file extension."""
+    if path.endswith(".parquet"):
+        report.to_parquet(path)
+    elif path.endswith(".csv"):
+        report.to_csv(path)
+    else:
+        raise ValueError(f"Unsupported report format '{path}', expected one of: {', '.join(REPORT_FORMATS)}.")
+
+
+def read_tickers(path):
+    """Tickers from a text file: whitespace or comma separated, '#' starts a comment."""
+    tickers = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            tickers += line.split("#", 1)[0].replace(",", " ").split()
+    return tickers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch analytics of the Finance Analytics page.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report = commands.add_parser("report", help="Compute the metrics report for a ticker list and write it to a file.")
+    report.add_argument("tickers", nargs="*")
+    report.add_argument("--tickers-file", help="Text file with more tickers (whitespace or comma separated).")
+    report.add_argument("--start", default=date.today() - timedelta(days=365), type=date.fromisoformat)
+    report.add_argument("--end", default=date.today(), type=date.fromisoformat)
+    report.add_argument("--risk-free", default=0.0, type=float, help="Annual risk-free rate in percent.")
+    report.add_argument("--benchmark", default=DEFAULT_BENCHMARK, choices=BENCHMARKS)
+    report.add_argument("--clusters", default=N_CLUSTERS, type=int)
+    report.add_argument("--out", required=True, help="Output file (.parquet or .csv).")
+    args = parser.parse_args(argv)
+
+    tickers = args.tickers + (read_tickers(args.tickers_file) if args.tickers_file else [])
+    if not tickers:
+        parser.error("no tickers given")
+    if args.start >= args.end:
+        parser.error("--start must be before --end")
+    if not args.out.endswith(REPORT_FORMATS):
+        parser.error(f"--out must end with one of: {', '.join(REPORT_FORMATS)}")
+    try:
+        result, warnings = analyze(tickers, args.start, args.end, args.risk_free / 100.0,
+                                   args.benchmark, args.clusters)
+    except ValueError as e:
+        sys.exit(f"error: {e}")
+    for part, message in warnings.items():
+        print(f"warning ({part}): {message}", file=sys.stderr)
+    write_report(result, args.out)
+    print(f"Wrote {len(result)} tickers to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
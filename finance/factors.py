@@ -0,0 +1,203 @@
+# Multi-factor regressions (CAPM up to Fama-French + momentum) for many tickers at once.
+# Factor returns come from a local CSV (Date plus one column per factor, e.g. Mkt-RF, SMB, HML,
+# Mom and the risk-free rate RF). All tickers are regressed on the same design matrix, so the
+# exposures of every ticker come out of one least-squares solve, and standard errors need only one
+# (X'X)^-1. Rolling loadings use cumulative sums of X'X and X'Y, so every window costs one small
+# batched solve instead of a regression over the window.
+#
+# The factor file can be built from the Kenneth R. French data library:
+# python -m finance.factors build [--out data/factors.csv]
+
+import argparse
+import io
+import os
+import re
+import urllib.request
+import zipfile
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from finance.rolling import TRADING_DAYS, window_sums
+
+FACTORS_FILE = os.environ.get(
+    "SABTA_FACTORS",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "factors.csv")
+)
+# Factor columns in display order; other numeric columns of the file are offered as factors too.
+FACTOR_NAMES = ["Mkt-RF", "SMB", "HML", "Mom"]
+RF_COLUMN = "RF"
+# Daily factor returns quoted in percent have a standard deviation far above this (about 1.0 for
+# the market), decimal returns far below it (about 0.01). The unit is decided for the whole file,
+# since RF hardly moves in either unit.
+PERCENT_STD = 0.2
+
+FRENCH_FF3_URL = "https://mba.tuck.dartmouth.edu/pages/faculty/ken.french/ftp/F-F_Research_Data_Factors_daily_CSV.zip"
+FRENCH_MOM_URL = "https://mba.tuck.dartmouth.edu/pages/faculty/ken.french/ftp/F-F_Momentum_Factor_daily_CSV.zip"
+
+
+@lru_cache(maxsize=4)
+def load_factors(content):
+    """
+    Parse a factor-returns CSV into decimal daily returns, memoized on the file content.
+
+    Parameters:
+        content (bytes): CSV with a Date column (ISO dates or YYYYMMDD) and numeric factor columns,
+                         in decimals or in percent (detected from the factor volatility).
+    Returns:
+        pandas.DataFrame: Date index, one float column per factor (and RF if present), sorted by date.
+                          Shared between calls, do not modify in place.
+    Raises:
+        ValueError: If there is no Date column or no numeric factor column.
+    """
+    frame = pd.read_csv(io.BytesIO(content))
+    frame.columns = [str(c).strip() for c in frame.columns]
+    date_col = next((c for c in frame.columns if c.lower() == "date"), None)
+    if date_col is None:
+        raise ValueError("The factor file needs a 'Date' column.")
+    dates = frame.pop(date_col).astype(str).str.strip()
+    compact = dates.str.fullmatch(r"\d{8}")
+    frame.index = pd.to_datetime(dates.where(~compact, dates.str[:4] + "-" + dates.str[4:6] + "-" + dates.str[6:]))
+    frame.index.name = "Date"
+    factors = frame.apply(pd.to_numeric, errors="coerce").dropna(axis=1, how="all").dropna()
+    if factors.empty or not [c for c in factors.columns if c != RF_COLUMN]:
+        raise ValueError("The factor file has no numeric factor columns.")
+    if (factors.drop(columns=RF_COLUMN, errors="ignore").std() > PERCENT_STD).any():
+        factors = factors / 100.0
+    return factors.sort_index()
+
+
+def factor_columns(factors):
+    """Factor columns of a factor frame (everything but RF), known factors first."""
+    columns = [c for c in factors.columns if c != RF_COLUMN]
+    return [c for c in FACTOR_NAMES if c in columns] + [c for c in columns if c not in FACTOR_NAMES]
+
+
+def _design(returns, factors, names):
+    """Excess returns (T x n) and design matrix [1, factors] (T x k+1) on the common dates."""
+    aligned = returns.join(factors, how="inner", rsuffix=" (factor)").dropna()
+    y = aligned.iloc[:, :returns.shape[1]].to_numpy(dtype=np.float64)
+    if RF_COLUMN in factors.columns:
+        y = y - aligned[RF_COLUMN].to_numpy(dtype=np.float64)[:, None]
+    x = np.column_stack([np.ones(len(aligned)), aligned[names].to_numpy(dtype=np.float64)])
+    return aligned.index, y, x
+
+
+def factor_regression(returns, factors, names=None):
+    """
+    Regress every ticker's excess return on the factors in one least-squares solve:
+    r_i - rf = alpha_i + sum_f beta_if * factor_f + e_i.
+
+    Parameters:
+        returns (pandas.DataFrame): Daily returns, one column per ticker.
+        factors (pandas.DataFrame): Daily factor returns (decimals), see load_factors.
+        names (list[str]): Factors to use (default: all factor columns).
+    Returns:
+        dict: 'coef' and 'tstat' (DataFrames, tickers x [Alpha (ann.), factors...]; alpha annualized),
+              'fit' (DataFrame with R-squared, Adj. R-squared and Observations per ticker).
+    Raises:
+        ValueError: If there are not more common dates than coefficients.
+    """
+    names = factor_columns(factors) if names is None else list(names)
+    _, y, x = _design(returns, factors, names)
+    n_obs, n_coef = x.shape
+    if n_obs <= n_coef:
+        raise ValueError(f"Only {n_obs} days overlap with the factor data, too few for {len(names)} factors.")
+
+    # One solve for all tickers: B is (k+1) x n.
+    coef, _, _, _ = np.linalg.lstsq(x, y, rcond=None)
+    resid = y - x @ coef
+    dof = n_obs - n_coef
+    sigma2 = (resid ** 2).sum(axis=0) / dof
+    xtx_inv_diag = np.diag(np.linalg.pinv(x.T @ x))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tstat = coef / np.sqrt(xtx_inv_diag[:, None] * sigma2[None, :])
+        sst = ((y - y.mean(axis=0)) ** 2).sum(axis=0)
+        r_squared = 1.0 - (resid ** 2).sum(axis=0) / sst
+    adj_r_squared = 1.0 - (1.0 - r_squared) * (n_obs - 1) / dof
+
+    labels = ["Alpha (ann.)"] + names
+    coef = coef.copy()
+    coef[0] *= TRADING_DAYS
+    return {
+        "coef": pd.DataFrame(coef.T, index=returns.columns, columns=labels),
+        "tstat": pd.DataFrame(tstat.T, index=returns.columns, columns=labels),
+        "fit": pd.DataFrame({
+            "R-squared": r_squared,
+            "Adj. R-squared": adj_r_squared,
+            "Observations": n_obs
+        }, index=returns.columns)
+    }
+
+
+def rolling_factor_loadings(returns, factors, window, names=None):
+    """
+    Factor loadings of every ticker over each trailing window, from cumulative sums of X'X and X'Y.
+
+    Returns:
+        dict: {factor: DataFrame (dates x tickers)} of loadings, NaN until a full window is available.
+    """
+    names = factor_columns(factors) if names is None else list(names)
+    dates, y, x = _design(returns, factors, names)
+    # Windowed cross-products: (T, k+1, k+1) and (T, k+1, n).
+    xtx = window_sums(x[:, :, None] * x[:, None, :], window)
+    xty = window_sums(x[:, :, None] * y[:, None, :], window)
+    loadings = np.full((len(dates), x.shape[1], y.shape[1]), np.nan)
+    valid = np.arange(len(dates)) >= window - 1
+    if valid.any():
+        # Pseudo-inverse instead of solve, so a degenerate window (e.g. a factor that did not move) gives
+        # finite least-squares loadings instead of an error.
+        loadings[valid] = np.linalg.pinv(xtx[valid]) @ xty[valid]
+    return {
+        name: pd.DataFrame(loadings[:, i + 1, :], index=dates, columns=returns.columns)
+        for i, name in enumerate(names)
+    }
+
+
+def read_french_csv(source):
+    """
+    Read a daily file of the Kenneth R. French data library (CSV or zipped CSV, path or URL).
+
+    Returns:
+        pandas.DataFrame: Date index, factor columns in percent (as published).
+    """
+    if re.match(r"https?://", source):
+        with urllib.request.urlopen(source, timeout=60) as response:
+            raw = response.read()
+    else:
+        with open(source, "rb") as f:
+            raw = f.read()
+    if raw[:2] == b"PK":
+        with zipfile.ZipFile(io.BytesIO(raw)) as archive:
+            raw = archive.read(archive.namelist()[0])
+    lines = raw.decode("latin-1").splitlines()
+    # Description lines come first; the table starts at the header line ",Mkt-RF,SMB,..." and ends
+    # at the first line that does not start with a YYYYMMDD date (annual tables or the copyright).
+    start = next(i for i, line in enumerate(lines) if line.startswith(","))
+    rows = []
+    for line in lines[start + 1:]:
+        if not re.match(r"\s*\d{8}\s*,", line):
+            break
+        rows.append(line)
+    header = ["Date"] + [c.strip() for c in lines[start].split(",")[1:]]
+    table = pd.read_csv(io.StringIO("\n".join(rows)), header=None, names=header, dtype={"Date": str})
+    table["Date"] = pd.to_datetime(table["Date"].str.strip(), format="%Y%m%d")
+    return table.set_index("Date")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Factor data utilities.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build the factor file from the Kenneth R. French data library.")
+    build.add_argument("--ff3", default=FRENCH_FF3_URL, help="Daily Fama-French 3-factor file (path or URL).")
+    build.add_argument("--momentum", default=FRENCH_MOM_URL, help="Daily momentum factor file (path or URL).")
+    build.add_argument("--out", default=FACTORS_FILE)
+    args = parser.parse_args(argv)
+    factors = read_french_csv(args.ff3).join(read_french_csv(args.momentum), how="inner")
+    # Stored in decimals with ISO dates.
+    (factors / 100.0).round(6).to_csv(args.out, index_label="Date", date_format="%Y-%m-%d")
+
+
+if __name__ == "__main__":
+    main()
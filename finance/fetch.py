@@ -0,0 +1,94 @@
+# Concurrent fetch layer for the Finance Analytics page.
+# All network calls of one rerun (prices, benchmark, fundamentals) are submitted to a bounded
+# thread pool, retried with exponential backoff and given a time limit. Failed or timed-out calls
+# do not block the others: the caller gets every result that arrived plus the errors of the rest,
+# so the page can render the sections whose data is ready.
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Defaults sized for Yahoo Finance: enough workers for 15 tickers plus the benchmark in one wave.
+MAX_WORKERS = 16
+TIMEOUT = 30.0
+RETRIES = 2
+BACKOFF = 0.5
+
+
+class FetchTimeout(Exception):
+    """Raised (as an error value) for a task that did not finish within its time limit."""
+
+
+def call_with_retry(func, retries=RETRIES, backoff=BACKOFF):
+    """
+    Call func() and retry it on any exception with exponential backoff and a little jitter.
+
+    Parameters:
+        func (callable): Zero-argument function to call.
+        retries (int): Number of additional attempts after the first failure.
+        backoff (float): Delay in seconds before the first retry; doubled on every further retry.
+    Returns:
+        The return value of the first successful call (the last exception is re-raised).
+    """
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random() * 0.1))
+
+
+def fetch_all(tasks, max_workers=MAX_WORKERS, timeout=TIMEOUT, retries=RETRIES, backoff=BACKOFF,
+              initializer=None):
+    """
+    Run independent fetch tasks concurrently and collect partial results.
+
+    Parameters:
+        tasks (dict): Mapping of key -> zero-argument callable.
+        max_workers (int): Upper bound on concurrent calls.
+        timeout (float): Seconds a task may run (including its retries) once a worker picked it up.
+        retries (int): Retries per task, see call_with_retry.
+        backoff (float): Initial retry delay in seconds.
+        initializer (callable): Optional function run once in every worker thread
+                                (e.g. to attach the Streamlit script context).
+    Returns:
+        tuple[dict, dict]: (results, errors) keyed like `tasks`. Every key appears in exactly one
+                           of the two dicts; errors hold the exception (FetchTimeout for time-outs).
+    """
+    results, errors = {}, {}
+    if not tasks:
+        return results, errors
+
+    started = {}
+    started_guard = threading.Lock()
+
+    def run(key, func):
+        with started_guard:
+            started[key] = time.monotonic()
+        return call_with_retry(func, retries=retries, backoff=backoff)
+
+    # The pool is not used as a context manager: leaving the with-block would wait for
+    # timed-out calls, which is exactly what the time limit is meant to avoid.
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(tasks)), initializer=initializer)
+    futures = {pool.submit(run, key, func): key for key, func in tasks.items()}
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = futures[future]
+                try:
+                    results[key] = future.result()
+                except Exception as exc:
+                    errors[key] = exc
+            now = time.monotonic()
+            with started_guard:
+                expired = {f for f in pending if now - started.get(futures[f], now) > timeout}
+            for future in expired:
+                errors[futures[future]] = FetchTimeout(f"{futures[future]!r} took longer than {timeout:.0f}s")
+            pending -= expired
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results, errors
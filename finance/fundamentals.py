@@ -0,0 +1,156 @@
+# Persistent fundamentals cache for the "Valuation Multiples" table.
+# Only the handful of fields the page shows are kept (not the full Yahoo info payload), one row per
+# ticker with the time it was fetched. Rows younger than MAX_AGE are served from disk; stale or
+# unknown tickers are refreshed together in one concurrent batch. Fundamentals change at most
+# daily, so nearly every rerun is answered without any network call.
+
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from finance.fetch import fetch_all
+from finance.price_store import CACHE_DIR, store_path
+from finance.providers import FUNDAMENTAL_FIELDS, get_provider
+
+DEFAULT_DB_PATH = os.path.join(CACHE_DIR, "fundamentals.sqlite")
+
+# A stored row is refreshed once it is older than this many seconds (one day).
+MAX_AGE = 24 * 3600
+# Number of tickers refreshed concurrently in one batch.
+BATCH_SIZE = 8
+
+
+class FundamentalsStore:
+    """
+    SQLite-backed cache of valuation fields with per-ticker staleness.
+
+    Parameters:
+        path (str): Location of the SQLite file (created on first use).
+        fetch (callable): fetch(ticker) -> dict with (at least) the FUNDAMENTAL_FIELDS keys
+                          (defaults to the configured market data provider).
+        max_age (float): Seconds after which a stored row is refreshed.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, fetch=None, max_age=MAX_AGE):
+        self.path = path
+        self.fetch = fetch or get_provider().info
+        self.max_age = max_age
+        # Serializes refreshes so concurrent sessions do not refresh the same tickers twice.
+        self._refresh_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fundamentals (ticker TEXT PRIMARY KEY, "
+                + ", ".join(f"{field} REAL" for field in FUNDAMENTAL_FIELDS)
+                + ", fetched_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def read(self, tickers):
+        """Return {ticker: (fields dict, fetched_at)} for every stored ticker among `tickers`."""
+        if not tickers:
+            return {}
+        placeholders = ", ".join("?" * len(tickers))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT ticker, {', '.join(FUNDAMENTAL_FIELDS)}, fetched_at FROM fundamentals "
+                f"WHERE ticker IN ({placeholders})",
+                list(tickers)
+            ).fetchall()
+        # Coerced again, so infinite values stored by earlier versions never reach the ratio tables.
+        return {
+            row[0]: (dict(zip(FUNDAMENTAL_FIELDS, map(_to_float, row[1:-1]))), row[-1])
+            for row in rows
+        }
+
+    def stale_tickers(self, tickers, max_age=None):
+        """Return the tickers that are missing or older than max_age (default: the store's max_age)."""
+        max_age = self.max_age if max_age is None else max_age
+        stored = self.read(tickers)
+        now = time.time()
+        return [t for t in tickers if t not in stored or now - stored[t][1] > max_age]
+
+    def refresh(self, tickers):
+        """
+        Fetch and store the fundamentals of the given tickers in concurrent batches.
+
+        Returns:
+            dict: {ticker: exception} for tickers whose fetch failed (their old rows are kept).
+        """
+        errors = {}
+        for i in range(0, len(tickers), BATCH_SIZE):
+            batch = tickers[i:i + BATCH_SIZE]
+            results, batch_errors = fetch_all(
+                {t: (lambda t=t: self.fetch(t)) for t in batch}, max_workers=BATCH_SIZE
+            )
+            errors.update(batch_errors)
+            now = time.time()
+            rows = [
+                (t, *[_to_float(info.get(field)) for field in FUNDAMENTAL_FIELDS], now)
+                for t, info in results.items()
+            ]
+            with self._connect() as conn:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO fundamentals (ticker, {', '.join(FUNDAMENTAL_FIELDS)}, fetched_at) "
+                    f"VALUES ({', '.join('?' * (len(FUNDAMENTAL_FIELDS) + 2))})",
+                    rows
+                )
+        return errors
+
+    def get(self, tickers, max_age=None):
+        """
+        Return valuation fields for the tickers, refreshing only stale or unknown ones.
+
+        Parameters:
+            tickers (list[str]): Ticker symbols.
+            max_age (float): Override of the store's max_age (shorter values refresh rows early).
+        Returns:
+            tuple[dict, dict]: ({ticker: {field: value}}, {ticker: exception}). A ticker whose refresh
+                               failed still gets its last stored values; it only appears in the
+                               errors dict if nothing was ever stored for it.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        errors = {}
+        if self.stale_tickers(tickers, max_age):
+            with self._refresh_lock:
+                # Another session may have refreshed some tickers while we waited for the lock.
+                stale = self.stale_tickers(tickers, max_age)
+                if stale:
+                    errors = self.refresh(stale)
+        stored = self.read(tickers)
+        values = {t: stored[t][0] for t in tickers if t in stored}
+        return values, {t: e for t, e in errors.items() if t not in values}
+
+
+def _to_float(value):
+    """
+    Coerce a Yahoo info value to a finite float, or None (Yahoo sometimes returns strings like
+    'Infinity' or 'NaN', which are not meaningful multiples).
+    """
+    try:
+        result = float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+    return result if result is not None and math.isfinite(result) else None
+
+
+# One shared store per process; Streamlit sessions run as threads of the same process.
+_default_store = None
+_default_store_guard = threading.Lock()
+
+
+def get_fundamentals_store():
+    """Return the process-wide FundamentalsStore for the configured provider, creating it on first use."""
+    global _default_store
+    with _default_store_guard:
+        if _default_store is None:
+            provider = get_provider()
+            _default_store = FundamentalsStore(store_path("fundamentals", provider), fetch=provider.info)
+        return _default_store
@@ -0,0 +1,118 @@
+# Vectorized technical indicators over the whole price matrix (all tickers at once).
+# Moving averages and Bollinger Bands come from cumulative sums (one pass per window, NaN-aware),
+# the exponential indicators (RSI, MACD, ATR) from pandas' EWM, which runs column-wise in C. No
+# indicator loops over tickers or days in Python. compute_indicator memoizes every indicator on
+# the content hash of the price bars plus its name and parameters, so switching overlays on and off
+# (or between stocks) never recomputes them.
+
+import numpy as np
+import pandas as pd
+
+from finance.metrics import memoize_on_prices
+from finance.rolling import window_sums
+
+# Indicator -> default parameters (as positional tuples, so they can be part of the memo key).
+INDICATORS = {
+    "Bollinger Bands": (20, 2.0),
+    "MA Envelope": (20, 0.05),
+    "RSI": (14,),
+    "MACD": (12, 26, 9),
+    "ATR": (14,),
+}
+# Indicators drawn on top of the price; the others get their own panel.
+PRICE_OVERLAYS = ["Bollinger Bands", "MA Envelope"]
+
+
+def price_bars(close, high=None, low=None):
+    """
+    Combine close, high and low prices into one frame with (field, ticker) columns.
+    Missing highs and lows (e.g. uploaded closing prices) fall back to the close.
+    """
+    high = close if high is None else high.reindex_like(close).fillna(close)
+    low = close if low is None else low.reindex_like(close).fillna(close)
+    return pd.concat({"High": high, "Low": low, "Close": close}, axis=1)
+
+
+def rolling_mean(prices, window):
+    """Simple moving average of every column from one cumulative sum (NaN until `window` valid values)."""
+    values = prices.to_numpy(dtype=np.float64)
+    valid = ~np.isnan(values)
+    sums = window_sums(np.where(valid, values, 0.0), window)
+    counts = window_sums(valid.astype(np.float64), window)
+    with np.errstate(invalid="ignore"):
+        means = np.where(counts == window, sums / window, np.nan)
+    return pd.DataFrame(means, index=prices.index, columns=prices.columns)
+
+
+def bollinger_bands(prices, window=20, n_std=2.0):
+    """Middle (SMA), Upper and Lower bands at n_std rolling (population) standard deviations."""
+    middle = rolling_mean(prices, window)
+    mean_square = rolling_mean(prices ** 2, window)
+    std = np.sqrt((mean_square - middle ** 2).clip(lower=0.0))
+    return {"Middle": middle, "Upper": middle + n_std * std, "Lower": middle - n_std * std}
+
+
+def ma_envelope(prices, window=20, width=0.05):
+    """Moving average with bands a fixed percentage above and below it."""
+    middle = rolling_mean(prices, window)
+    return {"Middle": middle, "Upper": middle * (1.0 + width), "Lower": middle * (1.0 - width)}
+
+
+def _wilder(frame, window):
+    """Wilder's smoothing (an EWM with alpha = 1 / window), NaN until `window` values are seen."""
+    return frame.ewm(alpha=1.0 / window, adjust=False, min_periods=window).mean()
+
+
+def rsi(prices, window=14):
+    """Relative Strength Index (0-100) with Wilder's smoothing of gains and losses."""
+    change = prices.diff()
+    gain, loss = _wilder(change.clip(lower=0.0), window), _wilder(-change.clip(upper=0.0), window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100.0 - 100.0 / (1.0 + gain / loss)
+    # No losses in the window: maximally overbought.
+    return {"RSI": values.mask((loss == 0) & gain.notna(), 100.0)}
+
+
+def macd(prices, fast=12, slow=26, signal=9):
+    """MACD line (fast EMA - slow EMA), its signal line (EMA of the MACD) and the histogram."""
+    line = (prices.ewm(span=fast, adjust=False).mean() - prices.ewm(span=slow, adjust=False).mean())
+    signal_line = line.ewm(span=signal, adjust=False).mean()
+    return {"MACD": line, "Signal": signal_line, "Histogram": line - signal_line}
+
+
+def average_true_range(high, low, close, window=14):
+    """Average True Range: Wilder-smoothed max(high - low, |high - previous close|, |low - previous close|)."""
+    previous = close.shift(1)
+    true_range = np.maximum(high - low, np.maximum((high - previous).abs(), (low - previous).abs()))
+    # The first day has no previous close.
+    true_range = true_range.fillna(high - low)
+    return {"ATR": _wilder(true_range, window)}
+
+
+@memoize_on_prices
+def compute_indicator(bars, name, params):
+    """
+    One indicator for every ticker, memoized on the price bars, the name and the parameters.
+
+    Parameters:
+        bars (pandas.DataFrame): (field, ticker) columns with High, Low and Close, see price_bars.
+        name (str): One of INDICATORS.
+        params (tuple): Positional parameters of the indicator (see INDICATORS for the defaults).
+    Returns:
+        dict: {line name: DataFrame (dates x tickers)}, e.g. Middle/Upper/Lower for the bands.
+              Shared between reruns, do not modify in place.
+    Raises:
+        ValueError: If the indicator is unknown.
+    """
+    close = bars["Close"]
+    if name == "Bollinger Bands":
+        return bollinger_bands(close, *params)
+    if name == "MA Envelope":
+        return ma_envelope(close, *params)
+    if name == "RSI":
+        return rsi(close, *params)
+    if name == "MACD":
+        return macd(close, *params)
+    if name == "ATR":
+        return average_true_range(bars["High"], bars["Low"], close, *params)
+    raise ValueError(f"Unknown indicator '{name}', expected one of: {', '.join(INDICATORS)}.")
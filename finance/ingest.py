@@ -0,0 +1,133 @@
+# Memory-efficient ingestion of uploaded price datasets.
+# CSV files are parsed in chunks straight into float32 columns (no float64/object intermediates
+# for the whole file), Parquet and Feather files are read directly into Arrow-backed frames, and
+# both wide (Date + one column per ticker) and long (Date, Ticker, Price) layouts are detected
+# automatically. Parsed datasets are memoized on a hash of the file content, so reruns with the
+# same upload never parse it again.
+
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Rows per CSV chunk; bounds the temporary memory of the parser.
+CHUNK_ROWS = 200_000
+# Number of parsed uploads kept in memory.
+MEMO_SIZE = 4
+
+SUPPORTED_TYPES = ["csv", "parquet", "feather"]
+_TICKER_COLUMNS = ["ticker", "symbol"]
+# Price column of a long-format file, in order of preference.
+_PRICE_COLUMNS = ["adj close", "adj_close", "price", "close"]
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def _find_column(columns, candidates):
+    """First column whose lower-cased name is in candidates (in candidate order), or None."""
+    lookup = {str(c).strip().lower(): c for c in columns}
+    for candidate in candidates:
+        if candidate in lookup:
+            return lookup[candidate]
+    return None
+
+
+def detect_layout(columns):
+    """
+    Detect the layout of a price table from its column names.
+
+    Returns:
+        tuple: ('long', date_col, ticker_col, price_col) or ('wide', date_col, None, None).
+    Raises:
+        ValueError: If there is no Date column.
+    """
+    date_col = _find_column(columns, ["date"])
+    if date_col is None:
+        raise ValueError("Uploaded data must have a 'Date' column.")
+    ticker_col = _find_column(columns, _TICKER_COLUMNS)
+    price_col = _find_column(columns, _PRICE_COLUMNS)
+    if ticker_col is not None and price_col is not None:
+        return "long", date_col, ticker_col, price_col
+    return "wide", date_col, None, None
+
+
+def _long_to_wide(frame, date_col, ticker_col, price_col):
+    frame = frame.drop_duplicates([date_col, ticker_col], keep="last")
+    wide = frame.pivot(index=date_col, columns=ticker_col, values=price_col)
+    wide.columns = [str(c) for c in wide.columns]
+    return wide
+
+
+def _finish(wide):
+    """Common last step: datetime index named Date, sorted, float32 prices."""
+    wide.index = pd.to_datetime(wide.index)
+    wide.index.name = "Date"
+    wide.columns.name = None
+    return wide.sort_index().astype(np.float32)
+
+
+def read_csv_prices(buffer, chunk_rows=CHUNK_ROWS):
+    """Parse a wide or long CSV in chunks into a wide float32 price frame."""
+    header = pd.read_csv(buffer, nrows=0).columns
+    buffer.seek(0)
+    layout, date_col, ticker_col, price_col = detect_layout(header)
+    if layout == "long":
+        # Only the three needed columns are parsed; tickers repeat a lot, so they become categories.
+        reader = pd.read_csv(buffer, usecols=[date_col, ticker_col, price_col], chunksize=chunk_rows,
+                             dtype={ticker_col: "category", price_col: np.float32})
+        frame = pd.concat(reader, ignore_index=True)
+        frame[ticker_col] = frame[ticker_col].astype(str)
+        return _finish(_long_to_wide(frame, date_col, ticker_col, price_col))
+    price_cols = [c for c in header if c != date_col]
+    try:
+        reader = pd.read_csv(buffer, chunksize=chunk_rows, index_col=date_col,
+                             dtype={c: np.float32 for c in price_cols})
+        return _finish(pd.concat(reader))
+    except ValueError as exc:
+        raise ValueError(f"All columns except 'Date' must contain numeric prices ({exc}).") from exc
+
+
+def read_arrow_prices(buffer, kind):
+    """Read a Parquet or Feather file into an Arrow-backed frame and convert it to wide float32 prices."""
+    reader = pd.read_parquet if kind == "parquet" else pd.read_feather
+    frame = reader(buffer, dtype_backend="pyarrow")
+    if frame.index.name is not None and str(frame.index.name).lower() == "date":
+        frame = frame.reset_index()
+    layout, date_col, ticker_col, price_col = detect_layout(frame.columns)
+    if layout == "long":
+        frame = frame[[date_col, ticker_col, price_col]]
+        return _finish(_long_to_wide(frame, date_col, ticker_col, price_col))
+    return _finish(frame.set_index(date_col))
+
+
+def load_price_file(content, filename):
+    """
+    Parse an uploaded price file (CSV, Parquet or Feather; wide or long layout), memoized on its content.
+
+    Parameters:
+        content (bytes): Raw file content.
+        filename (str): Original file name (its extension selects the parser).
+    Returns:
+        pandas.DataFrame: Date index, one float32 column per ticker. Shared between reruns, do not modify in place.
+    Raises:
+        ValueError: For unsupported file types or tables without a Date column / numeric prices.
+    """
+    kind = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if kind not in SUPPORTED_TYPES:
+        raise ValueError(f"Unsupported file type '.{kind}', expected one of: {', '.join(SUPPORTED_TYPES)}.")
+    key = (kind, hashlib.blake2b(content, digest_size=16).hexdigest())
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            return _memo[key]
+    buffer = io.BytesIO(content)
+    prices = read_csv_prices(buffer) if kind == "csv" else read_arrow_prices(buffer, kind)
+    with _memo_lock:
+        _memo[key] = prices
+        if len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    return prices
@@ -0,0 +1,141 @@
+# Single-pass, memoized metrics engine for the Finance Analytics page.
+# Everything the page derives from the price matrix (returns, normalized prices, cumulative
+# growth, drawdowns, clustering features and the annualized metrics table) is computed once in
+# one vectorized pass over all tickers. Results are memoized on a content hash of the prices
+# (plus the risk-free rate for the Sharpe ratio), so reruns caused by unrelated widgets reuse them.
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+# Number of distinct price matrices kept in memory per memoized function.
+MEMO_SIZE = 32
+
+
+def frame_hash(frame):
+    """Content hash of a DataFrame (values, index and column labels)."""
+    digest = hashlib.sha1()
+    if all(dtype.kind in "biuf" for dtype in frame.dtypes):
+        # Numeric frames are hashed as one block of raw values; hash_pandas_object works column by
+        # column, which dominates for wide frames (thousands of tickers or indicator fields).
+        values = frame.to_numpy()
+        digest.update(str(values.dtype).encode())
+        digest.update(np.ascontiguousarray(values).tobytes())
+        digest.update(pd.util.hash_pandas_object(frame.index).to_numpy().tobytes())
+    else:
+        digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    digest.update(repr(list(frame.columns)).encode())
+    return digest.hexdigest()
+
+
+def memoize_on_prices(func):
+    """
+    Memoize func(prices, *args) on the content hash of `prices` plus the other arguments
+    (defaults included, so omitting an argument and passing its default hit the same entry).
+    Keyword arguments (e.g. a progress callback) are passed on to func but are not part of the key.
+
+    The cached objects are returned as-is (no copies), so callers must not modify them in place.
+    Only the MEMO_SIZE most recently used results are kept.
+    """
+    cache = OrderedDict()
+    lock = threading.Lock()
+    defaults = func.__defaults__ or ()
+    n_args = func.__code__.co_argcount - 1
+
+    def wrapper(prices, *args, **options):
+        # Omitted arguments are filled in with their defaults, so f(prices) and f(prices, default)
+        # share one entry instead of computing the same result twice.
+        missing = n_args - len(args)
+        if 0 < missing <= len(defaults):
+            args += defaults[len(defaults) - missing:]
+        key = (frame_hash(prices), args)
+        with lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+        result = func(prices, *args, **options)
+        with lock:
+            cache[key] = result
+            if len(cache) > MEMO_SIZE:
+                cache.popitem(last=False)
+        return result
+
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    wrapper.cache_clear = cache.clear
+    return wrapper
+
+
+@memoize_on_prices
+def compute_price_metrics(prices):
+    """
+    Derive every per-ticker series and statistic of the page from the price matrix in one pass.
+
+    Parameters:
+        prices (pandas.DataFrame): Adjusted prices, Date index, one column per ticker.
+    Returns:
+        dict: 'returns' (daily returns), 'norm_prices' (start = 100), 'cum_returns' (growth of 1),
+              'drawdown', 'features' (Return (%) and Volatility (%) for clustering) and
+              'stats' (Annual Return, Annual Volatility, Max Drawdown).
+    """
+    values = prices.to_numpy(dtype=np.float64)
+    # Daily returns; like pct_change().dropna(), every date with a missing value is dropped.
+    daily = values[1:] / values[:-1] - 1.0
+    complete = ~np.isnan(daily).any(axis=1)
+    daily = daily[complete]
+    returns = pd.DataFrame(daily, index=prices.index[1:][complete], columns=prices.columns)
+
+    n_days = daily.shape[0]
+    growth = np.cumprod(1.0 + daily, axis=0)
+    running_max = np.maximum.accumulate(growth, axis=0)
+    drawdown = (growth - running_max) / running_max
+    daily_std = daily.std(axis=0, ddof=1) if n_days > 1 else np.full(daily.shape[1], np.nan)
+    final_growth = growth[-1] if n_days else np.full(daily.shape[1], np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        total_return = (values[-1] / values[0] - 1.0) * 100.0
+        annual_return = final_growth ** (TRADING_DAYS / n_days) - 1.0 if n_days else final_growth
+    annual_vol = daily_std * np.sqrt(TRADING_DAYS)
+
+    features = pd.DataFrame({
+        'Return (%)': total_return,
+        'Volatility (%)': daily_std * 100.0
+    }, index=prices.columns).dropna()
+    stats = pd.DataFrame({
+        'Annual Return': annual_return,
+        'Annual Volatility': annual_vol,
+        'Max Drawdown': drawdown.min(axis=0) if n_days else np.nan
+    }, index=prices.columns)
+
+    return {
+        'returns': returns,
+        'norm_prices': prices.div(prices.iloc[0]) * 100.0,
+        'cum_returns': pd.DataFrame(growth, index=returns.index, columns=prices.columns),
+        'drawdown': pd.DataFrame(drawdown, index=returns.index, columns=prices.columns),
+        'features': features,
+        'stats': stats
+    }
+
+
+@memoize_on_prices
+def metrics_table(prices, risk_free_rate):
+    """
+    Annualized metrics table (Annual Return, Annual Volatility, Sharpe Ratio, Max Drawdown).
+
+    Parameters:
+        prices (pandas.DataFrame): Adjusted prices, Date index, one column per ticker.
+        risk_free_rate (float): Annual risk-free rate as a decimal (e.g. 0.025).
+    Returns:
+        pandas.DataFrame: One row per ticker.
+    """
+    stats = compute_price_metrics(prices)['stats']
+    return pd.DataFrame({
+        'Annual Return': stats['Annual Return'],
+        'Annual Volatility': stats['Annual Volatility'],
+        'Sharpe Ratio': (stats['Annual Return'] - risk_free_rate) / stats['Annual Volatility'],
+        'Max Drawdown': stats['Max Drawdown']
+    })
@@ -0,0 +1,156 @@
+# Pairs-trading scanner: Engle-Granger cointegration tests for many ticker pairs at once.
+# Testing every pair is O(n^2), so pairs are first prefiltered with the correlation matrix of daily
+# returns (only positively correlated pairs are candidates), then tested in batches: for a batch of
+# pairs the hedge ratios, spreads, ADF regressions, half-lives and z-scores are all array
+# operations over (days x pairs). Batches are spread over a process pool when there are several,
+# and the whole scan is memoized on the price-data hash and the candidate pairs.
+#
+# Per pair (A, B): log A = intercept + hedge ratio * log B + spread. The spread is tested for a unit
+# root with an augmented Dickey-Fuller regression; the more negative the ADF statistic, the stronger
+# the evidence that the spread mean-reverts (the pair is cointegrated).
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from finance.metrics import memoize_on_prices
+
+MIN_CORRELATION = 0.5
+# Lagged differences in the ADF regression.
+ADF_LAGS = 1
+# Asymptotic Engle-Granger critical values for two variables with a constant (MacKinnon, 2010).
+CRITICAL_VALUES = [("1%", -3.8977), ("5%", -3.3377), ("10%", -3.0462)]
+# Pairs per pool job; runs with more than one job use the process pool.
+PAIRS_PER_JOB = 2_000
+MAX_PROCESSES = 8
+
+
+def candidate_pairs(corr, min_correlation=MIN_CORRELATION):
+    """
+    Pairs from the upper triangle of a correlation matrix whose correlation reaches the threshold.
+
+    Parameters:
+        corr (pandas.DataFrame): Correlation matrix of daily returns.
+        min_correlation (float): Minimum correlation of a candidate pair.
+    Returns:
+        tuple: ((Ticker A, Ticker B, correlation), ...), most correlated first (hashable for memoization).
+    """
+    values = corr.to_numpy(dtype=np.float64)
+    rows, cols = np.triu_indices(values.shape[0], k=1)
+    correlation = values[rows, cols]
+    keep = np.flatnonzero(correlation >= min_correlation)
+    keep = keep[np.argsort(-correlation[keep], kind="stable")]
+    return tuple(zip(corr.index[rows[keep]], corr.columns[cols[keep]], np.round(correlation[keep], 6).tolist()))
+
+
+def _test_pairs(log_prices, first, second, lags=ADF_LAGS):
+    """
+    Engle-Granger test of every pair (first[k], second[k]) of log-price columns (one pool job).
+
+    Returns:
+        dict: 'hedge_ratio', 'intercept', 'adf', 'half_life' and 'z_score', one value per pair.
+    """
+    y, x = log_prices[:, first], log_prices[:, second]
+    y_mean, x_mean = y.mean(axis=0), x.mean(axis=0)
+    yc, xc = y - y_mean, x - x_mean
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hedge_ratio = (xc * yc).sum(axis=0) / (xc ** 2).sum(axis=0)
+    spread = yc - hedge_ratio * xc                              # (days, pairs), mean zero
+    diff = np.diff(spread, axis=0)
+
+    # ADF regression without constant: d s_t = g s_(t-1) + sum_k c_k d s_(t-k) + e, for all pairs at once.
+    target = diff[lags:]
+    n_obs = target.shape[0]
+    design = np.stack([spread[lags:-1]] + [diff[lags - k:diff.shape[0] - k] for k in range(1, lags + 1)], axis=2)
+    xtx = np.einsum("tpi,tpj->pij", design, design)
+    xty = np.einsum("tpi,tp->pi", design, target)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        xtx_inv = np.linalg.pinv(xtx)
+        coef = np.einsum("pij,pj->pi", xtx_inv, xty)
+        resid = target - np.einsum("tpi,pi->tp", design, coef)
+        sigma2 = (resid ** 2).sum(axis=0) / (n_obs - design.shape[2])
+        adf = coef[:, 0] / np.sqrt(sigma2 * xtx_inv[:, 0, 0])
+
+        # Half-life of mean reversion from the AR(1) speed: d s_t = a + lam * s_(t-1) + e.
+        lagged = spread[:-1] - spread[:-1].mean(axis=0)
+        lam = (lagged * (diff - diff.mean(axis=0))).sum(axis=0) / (lagged ** 2).sum(axis=0)
+        half_life = np.where(lam < 0, -np.log(2.0) / np.log1p(np.maximum(lam, -0.999999)), np.inf)
+        z_score = spread[-1] / spread.std(axis=0, ddof=1)
+    return {
+        'hedge_ratio': hedge_ratio,
+        'intercept': y_mean - hedge_ratio * x_mean,
+        'adf': adf,
+        'half_life': half_life,
+        'z_score': z_score
+    }
+
+
+def significance(adf):
+    """Lowest Engle-Granger significance level the ADF statistic passes ("1%", "5%", "10%" or "")."""
+    for level, critical in CRITICAL_VALUES:
+        if adf < critical:
+            return level
+    return ""
+
+
+@memoize_on_prices
+def scan_pairs(prices, candidates, processes=None):
+    """
+    Test candidate pairs for cointegration and rank them by strength.
+
+    Parameters:
+        prices (pandas.DataFrame): Adjusted prices, one column per ticker (dates with gaps are dropped).
+        candidates (tuple): ((Ticker A, Ticker B, correlation), ...), e.g. from candidate_pairs.
+        processes (int): Worker processes when there is more than one job (default: CPU count, up to 8).
+    Returns:
+        pandas.DataFrame: One row per pair, most negative ADF statistic (strongest) first, with columns
+                          Ticker A, Ticker B, Correlation, Hedge Ratio, Intercept, ADF Statistic,
+                          Significance, Half-Life (days) and Z-Score. Shared between reruns, do not
+                          modify in place.
+    Raises:
+        ValueError: If there are too few dates for the ADF regression.
+    """
+    columns = ['Ticker A', 'Ticker B', 'Correlation', 'Hedge Ratio', 'Intercept', 'ADF Statistic',
+               'Significance', 'Half-Life (days)', 'Z-Score']
+    values = prices.dropna()
+    if len(values) < ADF_LAGS + 10:
+        raise ValueError(f"At least {ADF_LAGS + 10} dates are needed for the cointegration tests.")
+    if not candidates:
+        return pd.DataFrame(columns=columns)
+    log_prices = np.log(values.to_numpy(dtype=np.float64))
+    position = {ticker: i for i, ticker in enumerate(values.columns)}
+    first = np.array([position[a] for a, _, _ in candidates])
+    second = np.array([position[b] for _, b, _ in candidates])
+
+    jobs = [(log_prices, first[start:start + PAIRS_PER_JOB], second[start:start + PAIRS_PER_JOB])
+            for start in range(0, len(candidates), PAIRS_PER_JOB)]
+    workers = min(len(jobs), processes or min(MAX_PROCESSES, multiprocessing.cpu_count()))
+    if workers > 1:
+        # "spawn" avoids forking a process that runs other threads (the web server).
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            parts = list(pool.map(_test_pairs, *zip(*jobs)))
+    else:
+        parts = [_test_pairs(*job) for job in jobs]
+    results = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+    table = pd.DataFrame({
+        'Ticker A': [a for a, _, _ in candidates],
+        'Ticker B': [b for _, b, _ in candidates],
+        'Correlation': [c for _, _, c in candidates],
+        'Hedge Ratio': results['hedge_ratio'],
+        'Intercept': results['intercept'],
+        'ADF Statistic': results['adf'],
+        'Significance': [significance(adf) for adf in results['adf']],
+        'Half-Life (days)': results['half_life'],
+        'Z-Score': results['z_score']
+    })
+    return table.sort_values('ADF Statistic', kind="stable", ignore_index=True)
+
+
+def pair_spread(prices, ticker_a, ticker_b, hedge_ratio, intercept):
+    """Spread log A - hedge ratio * log B - intercept and its z-score over the period, as a DataFrame."""
+    values = prices[[ticker_a, ticker_b]].dropna()
+    spread = np.log(values[ticker_a]) - hedge_ratio * np.log(values[ticker_b]) - intercept
+    return pd.DataFrame({'Spread': spread, 'Z-Score': (spread - spread.mean()) / spread.std()})
@@ -0,0 +1,174 @@
+# Mean-variance portfolio optimization and a Monte Carlo efficient frontier.
+# Expected returns and a (optionally Ledoit-Wolf shrunk) covariance matrix are estimated once from
+# the returns matrix; min-variance, max-Sharpe and target-return portfolios are long-only SLSQP
+# solutions. The random-portfolio cloud is generated and evaluated in fixed-size chunks of weight
+# vectors with matrix products (no per-portfolio Python loop), so 100k+ portfolios over 50 assets
+# take a fraction of a second and memory stays bounded by the chunk size.
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+from sklearn.covariance import ledoit_wolf
+
+from finance.metrics import TRADING_DAYS, memoize_on_prices
+
+# Random weight vectors per chunk; bounds the temporary (chunk x assets) matrices.
+CHUNK_SIZE = 25_000
+N_PORTFOLIOS = 100_000
+FRONTIER_POINTS = 40
+
+
+def estimate_inputs(returns, shrink=True):
+    """
+    Annualized expected returns and covariance matrix of the return columns.
+
+    Parameters:
+        returns (pandas.DataFrame): Daily returns without missing values, one column per ticker.
+        shrink (bool): Use the Ledoit-Wolf shrinkage estimator instead of the sample covariance.
+    Returns:
+        tuple: (expected returns Series, covariance DataFrame, shrinkage intensity or 0.0).
+    """
+    values = returns.to_numpy(dtype=np.float64)
+    mu = values.mean(axis=0) * TRADING_DAYS
+    if shrink:
+        cov, shrinkage = ledoit_wolf(values)
+    else:
+        cov, shrinkage = np.cov(values, rowvar=False, ddof=1), 0.0
+    cov = np.atleast_2d(cov) * TRADING_DAYS
+    return (pd.Series(mu, index=returns.columns),
+            pd.DataFrame(cov, index=returns.columns, columns=returns.columns),
+            float(shrinkage))
+
+
+def _solve(objective, gradient, n_assets, constraints=(), start=None):
+    """Long-only, fully invested SLSQP solution of the given objective (with its analytic gradient)."""
+    budget = {'type': 'eq', 'fun': lambda w: w.sum() - 1.0, 'jac': lambda w: np.ones_like(w)}
+    x0 = np.full(n_assets, 1.0 / n_assets) if start is None else start
+    result = minimize(objective, x0, jac=gradient, method='SLSQP',
+                      bounds=[(0.0, 1.0)] * n_assets, constraints=[budget, *constraints],
+                      options={'maxiter': 500, 'ftol': 1e-12})
+    weights = np.clip(result.x, 0.0, None)
+    return weights / weights.sum()
+
+
+def min_variance_weights(cov):
+    """Long-only minimum-variance weights (numpy array) for a covariance matrix."""
+    sigma = np.asarray(cov, dtype=np.float64)
+    return _solve(lambda w: w @ sigma @ w, lambda w: 2.0 * sigma @ w, sigma.shape[0])
+
+
+def max_sharpe_weights(mu, cov, risk_free_rate=0.0):
+    """Long-only weights with the highest (return - risk_free_rate) / volatility."""
+    mu, sigma = np.asarray(mu, dtype=np.float64), np.asarray(cov, dtype=np.float64)
+
+    def negative_sharpe(w):
+        return -(w @ mu - risk_free_rate) / np.sqrt(w @ sigma @ w)
+
+    def gradient(w):
+        variance = w @ sigma @ w
+        excess = w @ mu - risk_free_rate
+        return -(mu * variance - excess * (sigma @ w)) / variance ** 1.5
+
+    return _solve(negative_sharpe, gradient, sigma.shape[0])
+
+
+def target_return_weights(mu, cov, target, start=None):
+    """
+    Long-only minimum-variance weights with an expected return of `target` (clipped to the feasible range).
+    `start` optionally warm-starts the solver, e.g. from the neighbouring frontier point.
+    """
+    mu, sigma = np.asarray(mu, dtype=np.float64), np.asarray(cov, dtype=np.float64)
+    target = float(np.clip(target, mu.min(), mu.max()))
+    on_target = {'type': 'eq', 'fun': lambda w: w @ mu - target, 'jac': lambda w: mu}
+    return _solve(lambda w: w @ sigma @ w, lambda w: 2.0 * sigma @ w, sigma.shape[0], [on_target], start)
+
+
+def portfolio_stats(weights, mu, cov, risk_free_rate=0.0):
+    """(expected return, volatility, Sharpe ratio) of one weight vector."""
+    ret = float(np.dot(weights, mu))
+    vol = float(np.sqrt(weights @ np.asarray(cov) @ weights))
+    return ret, vol, (ret - risk_free_rate) / vol if vol > 0 else np.nan
+
+
+def efficient_frontier(mu, cov, n_points=FRONTIER_POINTS):
+    """
+    Long-only efficient frontier: minimum volatility for evenly spaced target returns between the
+    min-variance portfolio's return and the highest single-asset return.
+
+    Returns:
+        pandas.DataFrame: Columns Return and Volatility, one row per frontier point.
+    """
+    mu_values, sigma = np.asarray(mu, dtype=np.float64), np.asarray(cov, dtype=np.float64)
+    weights = min_variance_weights(sigma)
+    points = []
+    # Each point warm-starts from the previous one, which is already close to the solution.
+    for target in np.linspace(float(weights @ mu_values), mu_values.max(), n_points):
+        weights = target_return_weights(mu_values, sigma, target, start=weights)
+        points.append((weights @ mu_values, np.sqrt(weights @ sigma @ weights)))
+    return pd.DataFrame(points, columns=['Return', 'Volatility'])
+
+
+def random_portfolios(mu, cov, n_portfolios=N_PORTFOLIOS, risk_free_rate=0.0, chunk_size=CHUNK_SIZE, seed=0):
+    """
+    Expected return, volatility and Sharpe ratio of random long-only portfolios, evaluated in chunks.
+
+    Weights are drawn uniformly from the simplex (normalized exponentials, i.e. Dirichlet(1)); each
+    chunk is evaluated with two matrix products: returns = W @ mu and variances = rowsum((W @ cov) * W).
+
+    Parameters:
+        mu (array-like): Annualized expected returns.
+        cov (array-like): Annualized covariance matrix.
+        n_portfolios (int): Number of random weight vectors.
+        risk_free_rate (float): Annual risk-free rate as a decimal, for the Sharpe ratio.
+        chunk_size (int): Weight vectors generated and evaluated per matrix product.
+        seed (int): Random seed, so the cloud is reproducible.
+    Returns:
+        dict: 'Return', 'Volatility', 'Sharpe' (float32 arrays of length n_portfolios) and
+              'best_weights' (weights of the highest-Sharpe sampled portfolio).
+    """
+    mu, sigma = np.asarray(mu, dtype=np.float64), np.asarray(cov, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    rets = np.empty(n_portfolios, dtype=np.float32)
+    vols = np.empty(n_portfolios, dtype=np.float32)
+    best_sharpe, best_weights = -np.inf, None
+    for start in range(0, n_portfolios, chunk_size):
+        stop = min(start + chunk_size, n_portfolios)
+        weights = rng.standard_exponential((stop - start, mu.shape[0]))
+        weights /= weights.sum(axis=1, keepdims=True)
+        chunk_ret = weights @ mu
+        chunk_vol = np.sqrt(np.einsum('ij,ij->i', weights @ sigma, weights))
+        chunk_sharpe = (chunk_ret - risk_free_rate) / chunk_vol
+        best = int(np.argmax(chunk_sharpe))
+        if chunk_sharpe[best] > best_sharpe:
+            best_sharpe, best_weights = chunk_sharpe[best], weights[best].copy()
+        rets[start:stop], vols[start:stop] = chunk_ret, chunk_vol
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = (rets - np.float32(risk_free_rate)) / vols
+    return {'Return': rets, 'Volatility': vols, 'Sharpe': sharpe, 'best_weights': best_weights}
+
+
+@memoize_on_prices
+def portfolio_analysis(returns, risk_free_rate=0.0, shrink=True, n_portfolios=N_PORTFOLIOS):
+    """
+    Everything the portfolio section needs that does not depend on the target return.
+
+    Parameters:
+        returns (pandas.DataFrame): Daily returns without missing values, at least two columns.
+        risk_free_rate (float): Annual risk-free rate as a decimal.
+        shrink (bool): Use Ledoit-Wolf shrinkage for the covariance matrix.
+        n_portfolios (int): Size of the Monte Carlo portfolio cloud.
+    Returns:
+        dict: 'mu', 'cov', 'shrinkage', 'min_variance' and 'max_sharpe' (weight Series),
+              'frontier' (DataFrame) and 'simulated' (see random_portfolios).
+              Shared between reruns, do not modify in place.
+    """
+    mu, cov, shrinkage = estimate_inputs(returns, shrink)
+    return {
+        'mu': mu,
+        'cov': cov,
+        'shrinkage': shrinkage,
+        'min_variance': pd.Series(min_variance_weights(cov), index=returns.columns),
+        'max_sharpe': pd.Series(max_sharpe_weights(mu, cov, risk_free_rate), index=returns.columns),
+        'frontier': efficient_frontier(mu, cov),
+        'simulated': random_portfolios(mu, cov, n_portfolios, risk_free_rate)
+    }
@@ -0,0 +1,105 @@
+# Refresh-ahead pre-warming of the price and fundamentals caches.
+# A daemon thread keeps the standard configuration of the Finance Analytics page warm: the full
+# ticker list of the page plus the benchmark indices, over the longest window the date inputs
+# offer. It wakes up every CHECK_INTERVAL seconds and refreshes the newest bars and the
+# fundamentals REFRESH_LEAD seconds before they would expire, so a user request finds them fresh
+# on disk instead of waiting for a download after every TTL expiry or restart.
+# Everything is warmed one ticker at a time, holding the store locks only for that ticker, and prices a
+# user request is fetching at that moment are skipped, so a first visitor never queues behind the
+# whole ten-year download of the ticker list.
+
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+from finance.fundamentals import MAX_AGE, get_fundamentals_store
+from finance.price_store import LIVE_TTL, get_price_store
+from finance.providers import DEFAULT_TICKERS
+
+# Refresh entries this many seconds before they expire.
+REFRESH_LEAD = 300
+# Seconds between checks; must be shorter than REFRESH_LEAD so no expiry is missed.
+CHECK_INTERVAL = 120
+# Warmed history: the date inputs of the page go back ten years.
+HISTORY_DAYS = 3653
+
+
+class Prewarmer:
+    """
+    Background thread that keeps prices and fundamentals of a ticker list fresh in the local stores.
+
+    Parameters:
+        tickers (list[str]): Stocks and indices to keep warm (indices, starting with '^', get no fundamentals).
+        history_days (int): Length of the warmed price history, ending today.
+        lead (float): Seconds before expiry at which entries are refreshed.
+        interval (float): Seconds between two checks.
+    """
+
+    def __init__(self, tickers=DEFAULT_TICKERS, history_days=HISTORY_DAYS, lead=REFRESH_LEAD,
+                 interval=CHECK_INTERVAL):
+        self.tickers = list(tickers)
+        self.history_days = history_days
+        self.lead = lead
+        self.interval = interval
+        # Time and errors of the last pass, for diagnostics.
+        self.last_run = None
+        self.last_errors = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def warm_once(self):
+        """Refresh everything that expires within the next `lead` seconds (or is missing)."""
+        today = date.today()
+        errors = {}
+        prices, fundamentals = get_price_store(), get_fundamentals_store()
+        for ticker in self.tickers:
+            if self._stop.is_set():
+                break
+            try:
+                prices.prefetch(ticker, today - timedelta(days=self.history_days), today + timedelta(days=1),
+                                live_ttl=max(0, LIVE_TTL - self.lead))
+                # One ticker per call, so the fundamentals refresh lock is only held briefly as well.
+                if not ticker.startswith("^"):
+                    _, failed = fundamentals.get([ticker], max_age=max(0, MAX_AGE - self.lead))
+                    errors.update(failed)
+            except Exception as e:
+                errors[ticker] = e
+        self.last_run, self.last_errors = time.time(), errors
+        return errors
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.warm_once()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start the background thread (no-op if it is already running)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sabta-prewarm", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Ask the background thread to finish after its current pass."""
+        self._stop.set()
+
+
+# One prewarmer per process; Streamlit sessions run as threads of the same process.
+_prewarmer = None
+_prewarmer_guard = threading.Lock()
+
+
+def start_prewarmer():
+    """
+    Start the process-wide prewarmer on first call; later calls return the running instance.
+    Setting the SABTA_PREWARM environment variable to 0 disables it (returns None).
+    """
+    global _prewarmer
+    if os.environ.get("SABTA_PREWARM", "1").lower() in ("0", "false", "off"):
+        return None
+    with _prewarmer_guard:
+        if _prewarmer is None:
+            _prewarmer = Prewarmer().start()
+        return _prewarmer
@@ -0,0 +1,365 @@
+# Persistent, incremental price store for the Finance Analytics page.
+# Daily bars are kept in a local SQLite file (one row per ticker and date) together with the
+# date ranges that have already been requested for every ticker. When a new window is asked for,
+# only the missing gaps (and the newest bars near today) are downloaded; everything else is
+# served from disk, so slightly different date windows on the same tickers stay local.
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from finance.providers import PRICE_FIELDS, get_provider
+
+# SQL column names for PRICE_FIELDS (SQLite columns cannot contain spaces).
+_SQL_COLUMNS = ["open", "high", "low", "close", "adj_close", "volume"]
+
+# Folder for all on-disk caches; can be moved with the SABTA_CACHE_DIR environment variable.
+CACHE_DIR = os.environ.get(
+    "SABTA_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache")
+)
+DEFAULT_DB_PATH = os.path.join(CACHE_DIR, "prices.sqlite")
+
+# Bars older than this many days are treated as final; newer bars are re-fetched after LIVE_TTL seconds.
+LIVE_EDGE_DAYS = 1
+LIVE_TTL = 3600
+
+# A download that returns no rows at all is only remembered as "covered" if the gap is this short
+# (weekends and holidays). Longer empty gaps (e.g. before a ticker's listing date, or a request that
+# silently failed) are remembered as empty for EMPTY_TTL seconds and then asked for again.
+EMPTY_GAP_DAYS = 7
+EMPTY_TTL = 24 * 3600
+
+
+def _to_date(value):
+    """Convert a date, datetime, Timestamp or ISO string to a datetime.date."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+def subtract_ranges(start, end, ranges):
+    """
+    Return the parts of [start, end) that are not covered by any of the given ranges.
+
+    Parameters:
+        start (datetime.date): Start of the requested window (inclusive).
+        end (datetime.date): End of the requested window (exclusive).
+        ranges (list[tuple]): Covered (start, end) pairs, end exclusive.
+    Returns:
+        list[tuple]: Missing (start, end) pairs in chronological order.
+    """
+    gaps = []
+    cursor = start
+    for r_start, r_end in sorted(ranges):
+        if r_end <= cursor:
+            continue
+        if r_start >= end:
+            break
+        if r_start > cursor:
+            gaps.append((cursor, r_start))
+        cursor = max(cursor, r_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def merge_ranges(ranges):
+    """Merge overlapping or touching (start, end) ranges into the smallest equivalent list."""
+    merged = []
+    for r_start, r_end in sorted(ranges):
+        if merged and r_start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], r_end))
+        else:
+            merged.append((r_start, r_end))
+    return merged
+
+
+def split_by_ticker(data, tickers):
+    """
+    Split a yfinance-shaped download into one [Date x PRICE_FIELDS] frame per ticker.
+
+    Single-ticker downloads from older yfinance versions have flat columns; these are mapped to
+    the only requested ticker.
+    """
+    frames = {}
+    if data is None or data.empty:
+        return frames
+    if isinstance(data.columns, pd.MultiIndex):
+        # yfinance default layout: first level is the price field, second level the ticker.
+        for ticker in tickers:
+            if ticker not in data.columns.get_level_values(1):
+                continue
+            frame = data.xs(ticker, axis=1, level=1)
+            frames[ticker] = frame.reindex(columns=PRICE_FIELDS).dropna(how="all")
+    elif len(tickers) == 1:
+        frames[tickers[0]] = data.reindex(columns=PRICE_FIELDS).dropna(how="all")
+    return frames
+
+
+class PriceStore:
+    """
+    SQLite-backed store of daily bars that remembers which date ranges it holds per ticker.
+
+    Parameters:
+        path (str): Location of the SQLite file (created on first use).
+        fetch (callable): fetch(tickers, start, end) -> yfinance-shaped DataFrame used for gaps
+                          (defaults to the configured market data provider, see finance/providers.py).
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, fetch=None):
+        self.path = path
+        self.fetch = fetch or get_provider().download
+        # One lock per ticker so concurrent sessions never download the same gap twice,
+        # while requests for different tickers can still run in parallel.
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS prices ("
+                "ticker TEXT NOT NULL, date TEXT NOT NULL, "
+                + ", ".join(f"{col} REAL" for col in _SQL_COLUMNS)
+                + ", PRIMARY KEY (ticker, date))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS coverage ("
+                "ticker TEXT NOT NULL, start TEXT NOT NULL, end TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS refreshed ("
+                "ticker TEXT PRIMARY KEY, refreshed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS empty ("
+                "ticker TEXT NOT NULL, start TEXT NOT NULL, end TEXT NOT NULL, checked_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _ticker_locks(self, tickers):
+        # Always hand out locks in sorted order so two requests can never deadlock each other.
+        with self._locks_guard:
+            return [self._locks.setdefault(t, threading.Lock()) for t in sorted(set(tickers))]
+
+    def coverage(self, ticker):
+        """Return the merged (start, end) date ranges already stored for a ticker."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT start, end FROM coverage WHERE ticker = ?", (ticker,)
+            ).fetchall()
+        return merge_ranges([(date.fromisoformat(s), date.fromisoformat(e)) for s, e in rows])
+
+    def empty_ranges(self, ticker):
+        """Return the long date ranges that came back empty for a ticker within the last EMPTY_TTL seconds."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT start, end FROM empty WHERE ticker = ? AND checked_at > ?",
+                (ticker, time.time() - EMPTY_TTL)
+            ).fetchall()
+        return [(date.fromisoformat(s), date.fromisoformat(e)) for s, e in rows]
+
+    def _refreshed_at(self, ticker):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT refreshed_at FROM refreshed WHERE ticker = ?", (ticker,)
+            ).fetchone()
+        return row[0] if row else 0.0
+
+    def missing_ranges(self, ticker, start, end, live_ttl=LIVE_TTL):
+        """
+        Return the date ranges inside [start, end) that still have to be downloaded for a ticker.
+
+        Ranges older than the live edge are final once stored, long ranges without any data count as
+        covered for EMPTY_TTL seconds. The live edge (the last LIVE_EDGE_DAYS before today) only counts
+        as covered for live_ttl seconds after it was fetched, so the newest bars are picked up without
+        re-downloading the whole history.
+        """
+        start, end = _to_date(start), _to_date(end)
+        # Nothing after tomorrow can exist yet, so never ask Yahoo for it.
+        end = min(end, date.today() + timedelta(days=1))
+        if start >= end:
+            return []
+        ranges = self.coverage(ticker) + self.empty_ranges(ticker)
+        live_edge = date.today() - timedelta(days=LIVE_EDGE_DAYS)
+        if time.time() - self._refreshed_at(ticker) > live_ttl:
+            # Stale live edge: only trust stored ranges up to the live edge.
+            ranges = [(s, min(e, live_edge)) for s, e in ranges if s < live_edge]
+        return subtract_ranges(start, end, ranges)
+
+    def _write(self, ticker, frame, ranges):
+        """Insert downloaded bars for one ticker and record the ranges they cover."""
+        rows = [
+            (ticker, idx.date().isoformat(), *[None if pd.isna(v) else float(v) for v in values])
+            for idx, values in zip(pd.to_datetime(frame.index), frame[PRICE_FIELDS].to_numpy())
+        ] if frame is not None else []
+        merged = merge_ranges(self.coverage(ticker) + list(ranges))
+        live_edge = date.today() - timedelta(days=LIVE_EDGE_DAYS)
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO prices (ticker, date, {', '.join(_SQL_COLUMNS)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(_SQL_COLUMNS))})",
+                rows
+            )
+            conn.execute("DELETE FROM coverage WHERE ticker = ?", (ticker,))
+            conn.executemany(
+                "INSERT INTO coverage (ticker, start, end) VALUES (?, ?, ?)",
+                [(ticker, s.isoformat(), e.isoformat()) for s, e in merged]
+            )
+            if any(e > live_edge for _, e in ranges):
+                conn.execute(
+                    "INSERT OR REPLACE INTO refreshed (ticker, refreshed_at) VALUES (?, ?)",
+                    (ticker, time.time())
+                )
+
+    def _write_empty(self, ticker, start, end):
+        """Remember that a long range of one ticker came back without data (replaces expired entries)."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM empty WHERE ticker = ? AND checked_at <= ?", (ticker, now - EMPTY_TTL))
+            conn.execute(
+                "INSERT INTO empty (ticker, start, end, checked_at) VALUES (?, ?, ?, ?)",
+                (ticker, start.isoformat(), end.isoformat(), now)
+            )
+
+    def _fill_gaps(self, tickers, start, end, live_ttl=LIVE_TTL):
+        """
+        Download every missing range for the given tickers, batching tickers with identical gaps.
+
+        Raises:
+            Exception: The first error of the data source, after all other gaps were stored (so a
+                       retry only downloads the failed gaps).
+        """
+        plan = {}
+        for ticker in tickers:
+            for gap in self.missing_ranges(ticker, start, end, live_ttl):
+                plan.setdefault(gap, []).append(ticker)
+        errors = []
+        for (gap_start, gap_end), gap_tickers in plan.items():
+            try:
+                data = self.fetch(gap_tickers, gap_start, gap_end)
+            except Exception as e:
+                errors.append(e)
+                continue
+            frames = split_by_ticker(data, gap_tickers)
+            for ticker in gap_tickers:
+                frame = frames.get(ticker)
+                if (frame is None or frame.empty) and (gap_end - gap_start).days > EMPTY_GAP_DAYS:
+                    self._write_empty(ticker, gap_start, gap_end)
+                    continue
+                self._write(ticker, frame, [(gap_start, gap_end)])
+        if errors:
+            raise errors[0]
+
+    def read(self, tickers, start, end):
+        """
+        Build a yfinance-shaped frame for the tickers and [start, end) purely from local data.
+
+        Returns:
+            pandas.DataFrame: Date index and MultiIndex columns (Price, Ticker), one column per
+                              field and requested ticker (missing tickers are all-NaN columns).
+        """
+        start, end = _to_date(start), _to_date(end)
+        placeholders = ", ".join("?" * len(tickers))
+        with self._connect() as conn:
+            frame = pd.read_sql_query(
+                f"SELECT ticker, date, {', '.join(_SQL_COLUMNS)} FROM prices "
+                f"WHERE ticker IN ({placeholders}) AND date >= ? AND date < ? ORDER BY date",
+                conn,
+                params=[*tickers, start.isoformat(), end.isoformat()]
+            )
+        frame["date"] = pd.to_datetime(frame["date"])
+        frame = frame.rename(columns=dict(zip(_SQL_COLUMNS, PRICE_FIELDS)))
+        wide = frame.pivot(index="date", columns="ticker", values=PRICE_FIELDS)
+        columns = pd.MultiIndex.from_product([PRICE_FIELDS, list(tickers)], names=["Price", "Ticker"])
+        wide = wide.reindex(columns=columns)
+        wide.index.name = "Date"
+        return wide
+
+    def get_prices(self, tickers, start, end, live_ttl=LIVE_TTL):
+        """
+        Return daily bars for the tickers and [start, end), downloading only what is missing.
+
+        Parameters:
+            tickers (list[str] | str): Ticker symbols (a single string is accepted as well).
+            start (datetime.date): Start date (inclusive).
+            end (datetime.date): End date (exclusive, like yfinance).
+            live_ttl (float): Seconds the newest bars count as fresh (shorter values refresh them early).
+        Returns:
+            pandas.DataFrame: See PriceStore.read.
+        Raises:
+            Exception: The error of the data source if a missing range could not be downloaded.
+        """
+        tickers = [tickers] if isinstance(tickers, str) else list(dict.fromkeys(tickers))
+        locks = self._ticker_locks(tickers)
+        for lock in locks:
+            lock.acquire()
+        try:
+            self._fill_gaps(tickers, start, end, live_ttl)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+        return self.read(tickers, start, end)
+
+    def prefetch(self, ticker, start, end, live_ttl=LIVE_TTL):
+        """
+        Download the missing ranges of one ticker in the background without waiting for it.
+
+        Parameters:
+            ticker (str): Ticker symbol.
+            start (datetime.date): Start date (inclusive).
+            end (datetime.date): End date (exclusive).
+            live_ttl (float): Seconds the newest bars count as fresh.
+        Returns:
+            bool: False if a request holds the ticker right now (it is fetching the same data, so the
+                  ticker is skipped), True once the missing ranges were fetched.
+        Raises:
+            Exception: The error of the data source if a missing range could not be downloaded.
+        """
+        lock = self._ticker_locks([ticker])[0]
+        if not lock.acquire(blocking=False):
+            return False
+        try:
+            self._fill_gaps([ticker], start, end, live_ttl)
+        finally:
+            lock.release()
+        return True
+
+
+# One shared store per process; Streamlit sessions run as threads of the same process.
+_default_store = None
+_default_store_guard = threading.Lock()
+
+
+def store_path(kind, provider):
+    """
+    Cache file for one provider and its argument, so e.g. synthetic prices never mix with Yahoo prices
+    and two price folders (or synthetic seeds) never share a file.
+    """
+    if provider.spec == "yfinance":
+        return os.path.join(CACHE_DIR, f"{kind}.sqlite")
+    digest = hashlib.sha1(provider.spec.encode()).hexdigest()[:10]
+    return os.path.join(CACHE_DIR, f"{kind}-{provider.name}-{digest}.sqlite")
+
+
+def get_price_store():
+    """Return the process-wide PriceStore for the configured provider, creating it on first use."""
+    global _default_store
+    with _default_store_guard:
+        if _default_store is None:
+            provider = get_provider()
+            _default_store = PriceStore(store_path("prices", provider), fetch=provider.download)
+        return _default_store
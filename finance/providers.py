@@ -0,0 +1,321 @@
+# Pluggable market-data providers for the Finance Analytics page.
+# Every provider offers the same two calls the page needs:
+#   download(tickers, start, end) -> yfinance-shaped daily bars ([Price, Ticker] columns)
+#   info(ticker)                  -> dict with (at least) the valuation fields
+# The backend is picked with the SABTA_MARKET_DATA environment variable:
+#   yfinance (default)   live Yahoo Finance data
+#   directory:<path>     local folder with one <TICKER>.csv / <TICKER>.parquet file per ticker
+#   fixtures             the bundled snapshot folder data/fixtures (re-record it with the snapshot command below)
+#   synthetic[:<seed>]   seeded geometric Brownian motion with a market/sector correlation structure
+# Snapshots for offline use are recorded with:
+#   python -m finance.providers snapshot --start 2020-01-01 --end 2025-01-01 [--out data/fixtures] [TICKER ...]
+# The bundled data/fixtures snapshot (default tickers and benchmarks, 2024-10-01 to 2026-10-16) was
+# recorded with --source synthetic so it can be regenerated without network access; record it with the
+# default --source yfinance for real prices.
+
+import argparse
+import os
+import zlib
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+# Price fields of a daily bar, in the same order and naming as yfinance.
+PRICE_FIELDS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+# Yahoo info keys the valuation table uses.
+FUNDAMENTAL_FIELDS = [
+    "trailingPE", "forwardPE", "pegRatio", "priceToBook", "enterpriseToEbitda", "enterpriseToSales"
+]
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "fixtures")
+# Default tickers of the finance page plus its benchmark indices (what the fixtures snapshot covers).
+DEFAULT_TICKERS = [
+    "AAPL", "MSFT", "GOOGL", "AMZN", "TSLA", "JPM", "JNJ", "XOM", "WMT", "NVDA",
+    "NFLX", "META", "BAC", "PG", "DIS", "^GSPC", "^DJI", "^IXIC"
+]
+
+
+def to_yfinance_frame(frames):
+    """
+    Combine {ticker: [Date x PRICE_FIELDS] frame} into one yfinance-shaped frame.
+
+    Returns:
+        pandas.DataFrame: Date index and MultiIndex columns (Price, Ticker).
+    """
+    if not frames:
+        return pd.DataFrame(columns=pd.MultiIndex.from_product([PRICE_FIELDS, []], names=["Price", "Ticker"]))
+    combined = pd.concat(frames, axis=1, names=["Ticker", "Price"]).swaplevel(axis=1)
+    combined = combined.reindex(columns=pd.MultiIndex.from_product([PRICE_FIELDS, list(frames)], names=["Price", "Ticker"]))
+    combined.index.name = "Date"
+    return combined
+
+
+def _window(frame, start, end):
+    """Rows of a Date-indexed frame inside [start, end)."""
+    return frame.loc[(frame.index >= pd.Timestamp(start)) & (frame.index < pd.Timestamp(end))]
+
+
+class YFinanceProvider:
+    """Live data from Yahoo Finance (the original behaviour of the page)."""
+
+    name = "yfinance"
+    label = "Yahoo Finance"
+    # Backend spec including its argument (see provider_from_spec); keys the on-disk caches.
+    spec = "yfinance"
+
+    def download(self, tickers, start, end):
+        # We set auto_adjust=False to get raw prices and an explicit 'Adj Close' column for adjusted close prices.
+        # We disable progress printout by setting progress=False if available (in newer yfinance).
+        try:
+            return yf.download(tickers, start=start, end=end, auto_adjust=False, progress=False)
+        except TypeError:
+            # In case older yfinance doesn't support progress param, call without it.
+            return yf.download(tickers, start=start, end=end, auto_adjust=False)
+
+    def info(self, ticker):
+        return yf.Ticker(ticker).info
+
+
+class DirectoryProvider:
+    """
+    Local folder with one price file per ticker.
+
+    Each <TICKER>.csv or <TICKER>.parquet file needs a Date column and any of the PRICE_FIELDS;
+    a file with only Close (or a single Price column) is used for all price fields. An optional
+    fundamentals.csv with a 'ticker' column and FUNDAMENTAL_FIELDS columns provides info().
+    """
+
+    name = "directory"
+    label = "local price files"
+
+    def __init__(self, path):
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"Market data folder not found: {path}")
+        self.path = path
+        self.spec = f"{self.name}:{os.path.abspath(path)}"
+
+    def _read_prices(self, ticker):
+        for ext, reader in ((".parquet", pd.read_parquet), (".csv", pd.read_csv)):
+            file_path = os.path.join(self.path, ticker + ext)
+            if os.path.isfile(file_path):
+                frame = reader(file_path)
+                break
+        else:
+            raise FileNotFoundError(f"No price file for {ticker} in {self.path}")
+        if "Date" in frame.columns:
+            frame = frame.set_index("Date")
+        frame.index = pd.to_datetime(frame.index)
+        if "Price" in frame.columns and "Close" not in frame.columns:
+            frame = frame.rename(columns={"Price": "Close"})
+        if "Adj Close" not in frame.columns:
+            frame["Adj Close"] = frame["Close"]
+        for field in ("Open", "High", "Low", "Close"):
+            if field not in frame.columns:
+                frame[field] = frame["Adj Close"]
+        return frame.reindex(columns=PRICE_FIELDS).sort_index()
+
+    def download(self, tickers, start, end):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        frames = {}
+        for ticker in tickers:
+            try:
+                frames[ticker] = _window(self._read_prices(ticker), start, end)
+            except FileNotFoundError:
+                # Behave like yfinance for unknown symbols: the ticker is simply missing.
+                continue
+        return to_yfinance_frame(frames)
+
+    def info(self, ticker):
+        file_path = os.path.join(self.path, "fundamentals.csv")
+        if not os.path.isfile(file_path):
+            return {}
+        table = pd.read_csv(file_path).set_index("ticker")
+        if ticker not in table.index:
+            return {}
+        return {k: (None if pd.isna(v) else v) for k, v in table.loc[ticker].items()}
+
+
+class FixtureProvider(DirectoryProvider):
+    """Snapshot of the default tickers and benchmarks stored in data/fixtures."""
+
+    name = "fixtures"
+    label = "bundled fixture snapshots"
+
+    def __init__(self, path=FIXTURES_DIR):
+        if not os.path.isdir(path):
+            raise FileNotFoundError(
+                f"Fixture snapshot not found: {path}. Record one with "
+                f"'python -m finance.providers snapshot --start <date> --out {path}'."
+            )
+        super().__init__(path)
+
+
+class SyntheticProvider:
+    """
+    Seeded synthetic market of any size: geometric Brownian motion with a correlation structure.
+
+    Daily log returns follow a one-market, several-sector factor model
+        r = mu + beta * market + loading * sector + idiosyncratic noise
+    on a fixed business-day calendar starting at ORIGIN. Each ticker's parameters and noise are
+    derived from the seed and the ticker symbol only, so a ticker has the same history no matter
+    which other tickers or which date window are requested. Symbols starting with '^' are indices
+    that follow the market factor closely with very little idiosyncratic noise.
+    """
+
+    name = "synthetic"
+    label = "synthetic market data"
+    ORIGIN = pd.Timestamp("1990-01-01")
+    N_SECTORS = 11
+
+    def __init__(self, seed=42):
+        self.seed = int(seed)
+        self.spec = f"{self.name}:{self.seed}"
+        self._factor_cache = {}
+
+    def _calendar(self, end):
+        return pd.bdate_range(self.ORIGIN, pd.Timestamp(end) - pd.Timedelta(days=1), name="Date")
+
+    def _factors(self, n_days):
+        # Market and sector factor returns for the first n_days of the calendar (cached, grown on demand).
+        cached = self._factor_cache.get("factors")
+        if cached is None or cached.shape[0] < n_days:
+            size = max(n_days, 10000)
+            rng = np.random.default_rng([self.seed, 0])
+            cached = rng.standard_normal((size, 1 + self.N_SECTORS))
+            cached[:, 0] *= 0.010   # market factor: about 16% annual volatility
+            cached[:, 1:] *= 0.006  # sector factors
+            self._factor_cache["factors"] = cached
+        return cached[:n_days]
+
+    def _ticker_rng(self, ticker):
+        return np.random.default_rng([self.seed, zlib.crc32(ticker.encode())])
+
+    def log_returns(self, tickers, n_days):
+        """Daily log returns (n_days x len(tickers)) on the provider calendar."""
+        factors = self._factors(n_days)
+        out = np.empty((n_days, len(tickers)))
+        for j, ticker in enumerate(tickers):
+            rng = self._ticker_rng(ticker)
+            sector = 1 + zlib.crc32(ticker.encode()) % self.N_SECTORS
+            if ticker.startswith("^"):
+                # Indices: close to the market factor with a small index-specific tilt.
+                beta, loading, idio_vol = rng.uniform(0.9, 1.15), rng.uniform(0.0, 0.3), 0.002
+                mu = rng.uniform(0.0001, 0.0004)
+            else:
+                beta, loading = rng.uniform(0.6, 1.5), rng.uniform(0.5, 1.2)
+                idio_vol = rng.uniform(0.008, 0.02)
+                mu = rng.uniform(-0.0001, 0.0005)
+            out[:, j] = mu + beta * factors[:, 0] + loading * factors[:, sector] \
+                + idio_vol * rng.standard_normal(n_days)
+        return out
+
+    def download(self, tickers, start, end):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        calendar = self._calendar(end)
+        if len(calendar) == 0 or not tickers:
+            return to_yfinance_frame({})
+        log_ret = self.log_returns(tickers, len(calendar))
+        frames = {}
+        for j, ticker in enumerate(tickers):
+            rng = self._ticker_rng(ticker + "/bars")
+            start_price = rng.uniform(20, 400)
+            close = start_price * np.exp(np.cumsum(log_ret[:, j]))
+            open_ = np.concatenate([[start_price], close[:-1]])
+            spread = np.abs(rng.standard_normal(len(close))) * 0.005
+            frame = pd.DataFrame({
+                "Open": open_,
+                "High": np.maximum(open_, close) * (1 + spread),
+                "Low": np.minimum(open_, close) * (1 - spread),
+                "Close": close,
+                "Adj Close": close,
+                "Volume": rng.integers(1_000_000, 50_000_000, len(close)).astype(float)
+            }, index=calendar)
+            frames[ticker] = _window(frame, start, end)
+        return to_yfinance_frame(frames)
+
+    def info(self, ticker):
+        rng = self._ticker_rng(ticker + "/info")
+        trailing = rng.uniform(8, 45)
+        return {
+            "trailingPE": trailing,
+            "forwardPE": trailing * rng.uniform(0.7, 1.1),
+            "pegRatio": rng.uniform(0.5, 3.0),
+            "priceToBook": rng.uniform(0.8, 15.0),
+            "enterpriseToEbitda": rng.uniform(5, 30),
+            "enterpriseToSales": rng.uniform(0.5, 12)
+        }
+
+
+def synthetic_universe(n):
+    """Ticker symbols SYN0000, SYN0001, ... for synthetic universes of any size."""
+    return [f"SYN{i:04d}" for i in range(n)]
+
+
+def provider_from_spec(spec):
+    """
+    Build a provider from a backend spec such as 'yfinance', 'directory:/data/prices', 'fixtures'
+    or 'synthetic:7' (see the top of this module).
+    """
+    kind, _, arg = (spec or "yfinance").strip().partition(":")
+    kind = kind.lower()
+    if kind == "yfinance":
+        return YFinanceProvider()
+    if kind == "directory":
+        if not arg:
+            raise ValueError("The directory backend needs a path, e.g. 'directory:/data/prices'.")
+        return DirectoryProvider(arg)
+    if kind == "fixtures":
+        return FixtureProvider(arg or FIXTURES_DIR)
+    if kind == "synthetic":
+        return SyntheticProvider(seed=int(arg) if arg else 42)
+    raise ValueError(f"Unknown market data backend: {spec!r}")
+
+
+_provider = None
+
+
+def get_provider():
+    """Return the process-wide provider configured by SABTA_MARKET_DATA (Yahoo Finance by default)."""
+    global _provider
+    if _provider is None:
+        _provider = provider_from_spec(os.environ.get("SABTA_MARKET_DATA", "yfinance"))
+    return _provider
+
+
+def save_snapshot(provider, tickers, start, end, out_dir):
+    """
+    Write prices (<TICKER>.csv) and fundamentals (fundamentals.csv) from a provider into a folder
+    that DirectoryProvider / FixtureProvider can read. Values are written with 10 significant digits,
+    which keeps the files small without rounding prices or volumes.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    data = provider.download(list(tickers), start, end)
+    for ticker in tickers:
+        if ticker not in data.columns.get_level_values("Ticker"):
+            continue
+        frame = data.xs(ticker, axis=1, level="Ticker").dropna(how="all")
+        frame.to_csv(os.path.join(out_dir, ticker + ".csv"), index_label="Date", float_format="%.10g")
+    rows = []
+    for ticker in tickers:
+        info = provider.info(ticker) or {}
+        rows.append({"ticker": ticker, **{f: info.get(f) for f in FUNDAMENTAL_FIELDS}})
+    pd.DataFrame(rows).to_csv(os.path.join(out_dir, "fundamentals.csv"), index=False, float_format="%.10g")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Market data provider utilities.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    snapshot = commands.add_parser("snapshot", help="Record a price/fundamentals snapshot for offline use.")
+    snapshot.add_argument("tickers", nargs="*", default=DEFAULT_TICKERS)
+    snapshot.add_argument("--start", required=True, type=date.fromisoformat)
+    snapshot.add_argument("--end", default=date.today(), type=date.fromisoformat)
+    snapshot.add_argument("--out", default=FIXTURES_DIR)
+    snapshot.add_argument("--source", default="yfinance", help="Backend spec to record from.")
+    args = parser.parse_args(argv)
+    save_snapshot(provider_from_spec(args.source), args.tickers, args.start, args.end, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Closed-form single-factor regressions (CAPM beta/alpha) for many tickers at once.
+# Instead of fitting one sklearn LinearRegression per ticker, all tickers are regressed on all
+# benchmarks with a few matrix products over the aligned returns matrix. Rolling betas use
+# cumulative sums, so every window costs O(1) no matter how long it is.
+
+import numpy as np
+import pandas as pd
+
+from finance.rolling import window_sums
+
+
+def align_returns(returns, bench_returns):
+    """
+    Inner-join ticker returns and benchmark returns on their common dates.
+
+    Parameters:
+        returns (pandas.DataFrame): Daily returns, one column per ticker.
+        bench_returns (pandas.DataFrame | pandas.Series): Daily benchmark returns, one column per benchmark.
+    Returns:
+        tuple[pandas.DataFrame, pandas.DataFrame]: (ticker returns, benchmark returns) on the same dates,
+                                                   rows with any missing value removed.
+    """
+    if isinstance(bench_returns, pd.Series):
+        bench_returns = bench_returns.to_frame()
+    aligned = returns.join(bench_returns, how="inner", rsuffix=" (benchmark)").dropna()
+    return aligned.iloc[:, :returns.shape[1]], aligned.iloc[:, returns.shape[1]:]
+
+
+def batch_regression(returns, bench_returns):
+    """
+    Regress every ticker on every benchmark in one pass: r_ticker = alpha + beta * r_benchmark + e.
+
+    Parameters:
+        returns (pandas.DataFrame): Daily returns, one column per ticker.
+        bench_returns (pandas.DataFrame | pandas.Series): Daily benchmark returns, one column per benchmark.
+    Returns:
+        pandas.DataFrame: Index (Benchmark, Ticker), columns Beta, Alpha (daily intercept),
+                          R-squared and Residual Vol (daily standard deviation of e).
+    """
+    y_frame, x_frame = align_returns(returns, bench_returns)
+    y = y_frame.to_numpy(dtype=np.float64)
+    x = x_frame.to_numpy(dtype=np.float64)
+    n = y.shape[0]
+
+    x_mean, y_mean = x.mean(axis=0), y.mean(axis=0)
+    x_c, y_c = x - x_mean, y - y_mean
+    # Sums of squares and cross-products: (benchmarks,) , (tickers,) and (benchmarks x tickers).
+    sxx = (x_c ** 2).sum(axis=0)
+    syy = (y_c ** 2).sum(axis=0)
+    sxy = x_c.T @ y_c
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        beta = sxy / sxx[:, None]
+        alpha = y_mean[None, :] - beta * x_mean[:, None]
+        r_squared = sxy ** 2 / (sxx[:, None] * syy[None, :])
+        # Residual sum of squares of a simple regression: Syy - beta * Sxy.
+        ssr = np.clip(syy[None, :] - beta * sxy, 0.0, None)
+        resid_vol = np.sqrt(ssr / (n - 2)) if n > 2 else np.full_like(beta, np.nan)
+
+    index = pd.MultiIndex.from_product([x_frame.columns, y_frame.columns], names=["Benchmark", "Ticker"])
+    return pd.DataFrame({
+        "Beta": beta.ravel(),
+        "Alpha": alpha.ravel(),
+        "R-squared": r_squared.ravel(),
+        "Residual Vol": resid_vol.ravel()
+    }, index=index)
+
+
+def rolling_beta(returns, bench_return, window):
+    """
+    Rolling beta of every ticker on one benchmark over a trailing window, in O(n) time.
+
+    Parameters:
+        returns (pandas.DataFrame): Daily returns, one column per ticker.
+        bench_return (pandas.Series): Daily benchmark returns.
+        window (int): Number of trading days per window.
+    Returns:
+        pandas.DataFrame: Beta at every date (NaN until a full window is available), one column per ticker.
+    """
+    y_frame, x_frame = align_returns(returns, bench_return)
+    y = y_frame.to_numpy(dtype=np.float64)
+    x = x_frame.to_numpy(dtype=np.float64)[:, :1]
+    # Demean once with the full-sample mean to keep the cumulative sums well conditioned;
+    # beta is invariant to shifting either series by a constant.
+    x = x - x.mean()
+    y = y - y.mean(axis=0)
+
+    s_x = window_sums(x, window)
+    s_y = window_sums(y, window)
+    s_xx = window_sums(x * x, window)
+    s_xy = window_sums(x * y, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        beta = (s_xy - s_x * s_y / window) / (s_xx - s_x ** 2 / window)
+    return pd.DataFrame(beta, index=y_frame.index, columns=y_frame.columns)
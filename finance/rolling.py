@@ -0,0 +1,86 @@
+# Rolling-window risk metrics computed incrementally over the whole returns matrix.
+# Window sums come from one cumulative sum per statistic (each window is the difference of two
+# prefix sums), and trailing maxima use the van Herk/Gil-Werman block trick, so every metric
+# costs O(n) per ticker regardless of the window length and no window is recomputed from scratch.
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+
+
+def window_sums(values, window):
+    """Sum of every trailing `window` rows, computed from one cumulative sum (NaN for the first rows)."""
+    csum = np.cumsum(values, axis=0)
+    sums = np.full(values.shape, np.nan)
+    sums[window - 1:] = csum[window - 1:]
+    sums[window:] -= csum[:-window]
+    return sums
+
+
+def window_max(values, window):
+    """
+    Maximum of every trailing `window` rows in O(n) (van Herk/Gil-Werman): the series is cut into
+    blocks of `window` rows, and each window max is the larger of one suffix max and one prefix max.
+    """
+    n_rows = values.shape[0]
+    n_blocks = -(-n_rows // window)
+    padded = np.full((n_blocks * window,) + values.shape[1:], -np.inf)
+    padded[:n_rows] = values
+    blocks = padded.reshape((n_blocks, window) + values.shape[1:])
+    prefix = np.maximum.accumulate(blocks, axis=1).reshape(padded.shape)
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+    result = np.full(values.shape, np.nan)
+    if n_rows >= window:
+        # Window [t - window + 1, t]: suffix max from its start, prefix max up to its end.
+        result[window - 1:] = np.maximum(suffix[:n_rows - window + 1], prefix[window - 1:n_rows])
+    return result
+
+
+def _frame(values, like):
+    return pd.DataFrame(values, index=like.index, columns=like.columns)
+
+
+def rolling_volatility(returns, window):
+    """Annualized volatility of every trailing window (sample standard deviation)."""
+    # Demeaning with the full-sample mean keeps the cumulative sums small; variance is shift-invariant.
+    x = returns.to_numpy(dtype=np.float64)
+    x = x - x.mean(axis=0)
+    s1 = window_sums(x, window)
+    s2 = window_sums(x * x, window)
+    variance = np.clip((s2 - s1 ** 2 / window) / (window - 1), 0.0, None)
+    return _frame(np.sqrt(variance * TRADING_DAYS), returns)
+
+
+def rolling_sharpe(returns, window, risk_free_rate=0.0):
+    """
+    Annualized Sharpe ratio of every trailing window: (252 * mean daily return - rf) / annualized volatility.
+    Uses the arithmetic mean, so it is not identical to the full-period Sharpe built on the geometric return.
+    """
+    mean = window_sums(returns.to_numpy(dtype=np.float64), window) / window
+    vol = rolling_volatility(returns, window).to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = (mean * TRADING_DAYS - risk_free_rate) / vol
+    return _frame(sharpe, returns)
+
+
+def rolling_drawdown(returns, window):
+    """Drawdown of every date from the highest cumulative value of the trailing window."""
+    growth = np.cumprod(1.0 + returns.to_numpy(dtype=np.float64), axis=0)
+    peak = window_max(growth, window)
+    return _frame(growth / peak - 1.0, returns)
+
+
+def rolling_correlation(returns, bench_return, window):
+    """Correlation of every ticker with the benchmark over each trailing window."""
+    aligned = returns.join(bench_return.rename("__benchmark__"), how="inner").dropna()
+    y = aligned[returns.columns].to_numpy(dtype=np.float64)
+    x = aligned[["__benchmark__"]].to_numpy(dtype=np.float64)
+    x, y = x - x.mean(), y - y.mean(axis=0)
+    s_x, s_y = window_sums(x, window), window_sums(y, window)
+    cov = window_sums(x * y, window) - s_x * s_y / window
+    var_x = window_sums(x * x, window) - s_x ** 2 / window
+    var_y = window_sums(y * y, window) - s_y ** 2 / window
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = cov / np.sqrt(var_x * var_y)
+    return pd.DataFrame(np.clip(corr, -1, 1), index=aligned.index, columns=returns.columns)
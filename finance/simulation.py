@@ -0,0 +1,242 @@
+# Vectorized Monte Carlo scenario simulator for a basket of stocks.
+# Future daily log returns are drawn either from a correlated normal model (geometric Brownian
+# motion with the historical mean and covariance, correlated through a Cholesky factor) or by
+# block-bootstrapping whole days of historical returns (all tickers together, so correlations and
+# fat tails are kept). Paths are generated in fixed-size chunks and reduced immediately to
+# per-step histograms of the basket value plus terminal statistics, so memory does not grow with
+# the number of paths. Large runs are split into seeded jobs of equal size and spread over a
+# process pool; because every job has its own seed, results do not depend on the number of workers.
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from finance.metrics import memoize_on_prices
+
+MODELS = ["Correlated GBM", "Block bootstrap"]
+PERCENTILES = (5, 25, 50, 75, 95)
+# Paths generated per chunk (chunk x steps x assets float32 values live at a time).
+CHUNK_PATHS = 2_000
+# Paths per job; runs with more than one job use the process pool. 1,000,000 paths x 252 steps of a
+# 10-asset basket are 40 jobs of about 1 s (correlated GBM) or 0.6 s (bootstrap) on one core: 39 s and
+# 23 s in one process, so about 5 s and 3 s with 8 workers.
+JOB_PATHS = 25_000
+MAX_PROCESSES = 8
+# Histogram resolution of the per-step basket distribution (log value) and the terminal returns.
+HIST_BINS = 2_000
+# Half-width of the histogram range in standard deviations of the cumulative log return.
+HIST_SIGMAS = 10.0
+
+
+def _grid(sigma, drift, t):
+    """(lower bound, bin width) of a log-return histogram after t days: +-HIST_SIGMAS sd around the drift."""
+    t = np.asarray(t, dtype=np.float64)
+    half_width = HIST_SIGMAS * sigma * np.sqrt(t) + np.abs(drift) * t + 1e-6
+    center = drift * t
+    return center - half_width, 2.0 * half_width / HIST_BINS
+
+
+def _increments(rng, model, params, n_paths, steps):
+    """
+    Daily log returns of n_paths paths: array (steps, paths, assets), float32.
+
+    The correlated normal model uses antithetic pairs: the second half of the paths mirrors the shocks
+    of the first half, which halves the normal draws and the Cholesky product (the costliest part of a
+    chunk) and lowers the variance of the estimated mean. The Cholesky factor is applied to all steps
+    of the chunk in one (steps x paths, assets) matrix product.
+    """
+    n_assets = params['mean'].shape[0]
+    if model == "Correlated GBM":
+        half = -(-n_paths // 2)
+        z = rng.standard_normal((steps * half, n_assets), dtype=np.float32)
+        shocks = (z @ params['chol'].T).reshape(steps, half, n_assets)
+        increments = np.empty((steps, n_paths, n_assets), dtype=np.float32)
+        np.add(params['mean'], shocks, out=increments[:, :half])
+        np.subtract(params['mean'], shocks[:, :n_paths - half], out=increments[:, half:])
+        return increments
+    history, block = params['history'], params['block']
+    n_blocks = -(-steps // block)
+    starts = rng.integers(0, history.shape[0] - block + 1, size=(n_paths, n_blocks))
+    rows = (starts[:, :, None] + np.arange(block)).reshape(n_paths, -1)[:, :steps]
+    return history[rows.T]
+
+
+def _simulate_job(model, params, weights, steps, n_paths, seed):
+    """
+    Simulate n_paths paths in chunks and reduce them to histograms and sums (one pool job).
+
+    Returns:
+        dict: 'basket_hist' (steps x HIST_BINS counts of the basket log value),
+              'asset_hist' (assets x HIST_BINS counts of terminal log returns),
+              'asset_losses', 'asset_gross_sum' (per asset) and 'terminal' (basket terminal returns, float32).
+    """
+    rng = np.random.default_rng(seed)
+    n_assets = weights.shape[0]
+    lower, width = params['basket_grid']
+    asset_lower, asset_width = params['asset_grid']
+    basket_hist = np.zeros(steps * HIST_BINS, dtype=np.int64)
+    asset_hist = np.zeros(n_assets * HIST_BINS, dtype=np.int64)
+    asset_losses = np.zeros(n_assets, dtype=np.int64)
+    asset_gross_sum = np.zeros(n_assets, dtype=np.float64)
+    terminal = np.empty(n_paths, dtype=np.float32)
+    step_offsets = (np.arange(steps) * HIST_BINS)[:, None]
+    asset_offsets = np.arange(n_assets) * HIST_BINS
+    lower, width = lower[:, None], width[:, None]
+    weights = weights.astype(np.float32)
+
+    for start in range(0, n_paths, CHUNK_PATHS):
+        size = min(CHUNK_PATHS, n_paths - start)
+        # Cumulative log return of every asset, summed step by step in place over contiguous
+        # (paths, assets) rows (np.cumsum along an axis runs element by element and is much slower).
+        cum_log = _increments(rng, model, params, size, steps)          # (steps, paths, assets)
+        for step in range(1, steps):
+            cum_log[step] += cum_log[step - 1]
+        # Buy-and-hold basket value (start = 1) as one matrix-vector product over all steps and paths.
+        basket = np.log(np.exp(cum_log).reshape(-1, n_assets) @ weights).reshape(steps, size)
+        bins = np.clip(((basket - lower) / width).astype(np.int64), 0, HIST_BINS - 1)
+        basket_hist += np.bincount((bins + step_offsets).ravel(), minlength=steps * HIST_BINS)
+
+        final = cum_log[-1]                                             # (paths, assets)
+        asset_bins = np.clip(((final - asset_lower) / asset_width).astype(np.int64), 0, HIST_BINS - 1)
+        asset_hist += np.bincount((asset_bins + asset_offsets).ravel(), minlength=n_assets * HIST_BINS)
+        asset_losses += (final < 0).sum(axis=0)
+        asset_gross_sum += np.exp(final.astype(np.float64)).sum(axis=0)
+        terminal[start:start + size] = np.expm1(basket[-1])
+
+    return {
+        'basket_hist': basket_hist.reshape(steps, HIST_BINS),
+        'asset_hist': asset_hist.reshape(n_assets, HIST_BINS),
+        'asset_losses': asset_losses,
+        'asset_gross_sum': asset_gross_sum,
+        'terminal': terminal
+    }
+
+
+def histogram_percentiles(counts, lower, width, percentiles):
+    """
+    Percentiles of binned data, interpolated linearly inside the bin that contains them.
+
+    Parameters:
+        counts (numpy.ndarray): (rows, bins) histogram counts.
+        lower (numpy.ndarray): Lower edge of the first bin, per row.
+        width (numpy.ndarray): Bin width, per row.
+        percentiles (tuple): Percentiles in [0, 100].
+    Returns:
+        numpy.ndarray: (rows, len(percentiles)) values.
+    """
+    cumulative = np.cumsum(counts, axis=1)
+    total = cumulative[:, -1:]
+    result = np.empty((counts.shape[0], len(percentiles)))
+    for j, q in enumerate(percentiles):
+        target = total[:, 0] * q / 100.0
+        # First bin whose cumulative count reaches the target, then the fraction of that bin needed.
+        idx = np.minimum((cumulative < target[:, None]).sum(axis=1), counts.shape[1] - 1)
+        rows = np.arange(counts.shape[0])
+        before = np.where(idx > 0, cumulative[rows, idx - 1], 0)
+        in_bin = np.maximum(counts[rows, idx], 1)
+        result[:, j] = lower + (idx + np.clip((target - before) / in_bin, 0.0, 1.0)) * width
+    return result
+
+
+def _job_sizes(n_paths):
+    return [min(JOB_PATHS, n_paths - start) for start in range(0, n_paths, JOB_PATHS)]
+
+
+@memoize_on_prices
+def simulate_scenarios(returns, weights, model="Correlated GBM", horizon=252, n_paths=100_000,
+                       seed=42, block=20, processes=None, *, progress=None):
+    """
+    Monte Carlo projection of the selected stocks and their buy-and-hold basket.
+
+    Parameters:
+        returns (pandas.DataFrame): Daily historical returns without missing values, one column per ticker.
+        weights (tuple[float]): Initial basket weights in column order (normalized to sum to 1).
+        model (str): "Correlated GBM" or "Block bootstrap".
+        horizon (int): Number of trading days to simulate.
+        n_paths (int): Number of simulated paths.
+        seed (int): Seed of the random generator; equal inputs and seed give identical results.
+        block (int): Block length in days for the bootstrap.
+        processes (int): Worker processes for runs of more than JOB_PATHS paths (default: CPU count, up to 8).
+        progress (callable): Called with the finished share of the paths (0 to 1) after every job
+                             (not part of the memo key).
+    Returns:
+        dict: 'fan' (DataFrame of basket value percentiles per day, start = 1),
+              'terminal' (float32 array of basket terminal returns for every path),
+              'prob_loss' (basket probability of a loss at the horizon) and
+              'assets' (DataFrame per ticker: Prob. of Loss, Expected Return, 5th/50th/95th percentile return).
+              Shared between reruns, do not modify in place.
+    """
+    if model not in MODELS:
+        raise ValueError(f"Unknown model '{model}', expected one of: {', '.join(MODELS)}.")
+    history = np.log1p(returns.to_numpy(dtype=np.float64))
+    weights = np.asarray(weights, dtype=np.float64)
+    weights = weights / weights.sum()
+    mean, cov = history.mean(axis=0), np.atleast_2d(np.cov(history, rowvar=False))
+    if model == "Block bootstrap" and history.shape[0] <= block:
+        raise ValueError(f"The bootstrap needs more than {block} days of history.")
+
+    # Histogram grids from the historical volatility; the basket lies between its best and worst asset.
+    asset_sigma = np.sqrt(np.diag(cov))
+    steps = int(horizon)
+    basket_grid = _grid(asset_sigma.max(), float(weights @ mean), np.arange(1, steps + 1))
+    params = {
+        'mean': mean.astype(np.float32),
+        'basket_grid': basket_grid,
+        'asset_grid': _grid(asset_sigma, mean, steps),
+        'block': int(block)
+    }
+    if model == "Correlated GBM":
+        # Cholesky factor of the covariance; a tiny ridge keeps it defined for (near) collinear tickers.
+        ridge = 1e-12 * np.trace(cov) / cov.shape[0]
+        params['chol'] = np.linalg.cholesky(cov + ridge * np.eye(cov.shape[0])).astype(np.float32)
+    else:
+        params['history'] = history.astype(np.float32)
+
+    sizes = _job_sizes(int(n_paths))
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(model, params, weights, steps, size, job_seed) for size, job_seed in zip(sizes, seeds)]
+    workers = min(len(jobs), processes or min(MAX_PROCESSES, multiprocessing.cpu_count()))
+    parts = [None] * len(jobs)
+    done = 0
+    if workers > 1:
+        # "spawn" avoids forking a process that runs other threads (the web server).
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(_simulate_job, *job): i for i, job in enumerate(jobs)}
+            for future in as_completed(futures):
+                parts[futures[future]] = future.result()
+                done += sizes[futures[future]]
+                if progress is not None:
+                    progress(done / n_paths)
+    else:
+        for i, job in enumerate(jobs):
+            parts[i] = _simulate_job(*job)
+            done += sizes[i]
+            if progress is not None:
+                progress(done / n_paths)
+
+    basket_hist = sum(part['basket_hist'] for part in parts)
+    asset_hist = sum(part['asset_hist'] for part in parts)
+    terminal = np.concatenate([part['terminal'] for part in parts])
+    total = float(n_paths)
+
+    lower, width = basket_grid
+    fan = np.exp(histogram_percentiles(basket_hist, lower, width, PERCENTILES))
+    fan = pd.DataFrame(np.vstack([np.ones(len(PERCENTILES)), fan]),
+                       index=pd.RangeIndex(steps + 1, name='Day'),
+                       columns=[f"P{q}" for q in PERCENTILES])
+    asset_quantiles = np.expm1(histogram_percentiles(asset_hist, *params['asset_grid'], (5, 50, 95)))
+    assets = pd.DataFrame({
+        'Prob. of Loss': sum(part['asset_losses'] for part in parts) / total,
+        'Expected Return': sum(part['asset_gross_sum'] for part in parts) / total - 1.0,
+        '5th Percentile': asset_quantiles[:, 0],
+        'Median': asset_quantiles[:, 1],
+        '95th Percentile': asset_quantiles[:, 2]
+    }, index=returns.columns)
+    return {
+        'fan': fan,
+        'terminal': terminal,
+        'prob_loss': float((terminal < 0).mean()),
+        'assets': assets
+    }
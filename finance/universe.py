@@ -0,0 +1,224 @@
+# Searchable ticker universe for the company selection.
+# Listings (symbol, name, sector, exchange) are read once per process from a bundled CSV and indexed
+# in memory: sorted symbol and name-word lists answer prefix queries with a binary search, and an
+# inverted index of character trigrams answers fuzzy queries (typos, partial names) with one
+# bincount over the posting lists. A search per keystroke therefore costs well under a millisecond
+# to a few milliseconds even for tens of thousands of listings.
+#
+# The bundled file covers the page's default tickers and other large US listings. The full US
+# universe can be generated from the public NASDAQ Trader symbol directory:
+# python -m finance.universe build [--out data/tickers.csv]
+
+import argparse
+import os
+import re
+import threading
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+UNIVERSE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "tickers.csv")
+COLUMNS = ["symbol", "name", "sector", "exchange"]
+
+# NASDAQ Trader symbol directory: NASDAQ listings and listings of all other US exchanges.
+NASDAQ_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt"
+OTHER_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt"
+_EXCHANGE_CODES = {"A": "NYSE American", "N": "NYSE", "P": "NYSE Arca", "Z": "Cboe BZX", "V": "IEX"}
+
+# Fuzzy matches must contain at least this share of the query's trigrams.
+MIN_FUZZY_SCORE = 0.45
+SEARCH_LIMIT = 20
+
+_WORD = re.compile(r"[a-z0-9&]+")
+
+
+def _words(text):
+    return _WORD.findall(text.lower())
+
+
+def _trigrams(text):
+    """Distinct character trigrams of the normalized, space-padded text."""
+    padded = f" {' '.join(_words(text))} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TickerUniverse:
+    """
+    In-memory index over a listings table.
+
+    Parameters:
+        listings (pandas.DataFrame): Columns symbol, name, sector and exchange (one row per listing).
+    """
+
+    def __init__(self, listings):
+        self.listings = listings.reindex(columns=COLUMNS).fillna("").astype(str).reset_index(drop=True)
+        symbols = self.listings["symbol"].str.upper().tolist()
+        names = self.listings["name"].tolist()
+        self._symbol_row = {symbol: row for row, symbol in enumerate(symbols)}
+
+        # Sorted (key, row) lists for prefix search by binary search.
+        symbol_pairs = sorted((symbol, row) for row, symbol in enumerate(symbols))
+        self._symbol_keys = [key for key, _ in symbol_pairs]
+        self._symbol_rows = np.array([row for _, row in symbol_pairs], dtype=np.int64)
+        word_pairs = sorted((word, row) for row, name in enumerate(names) for word in set(_words(name)))
+        self._word_keys = [key for key, _ in word_pairs]
+        self._word_rows = np.array([row for _, row in word_pairs], dtype=np.int64)
+
+        # Inverted trigram index over "symbol name" for fuzzy matching.
+        postings = {}
+        self._gram_counts = np.empty(len(symbols), dtype=np.float64)
+        for row, (symbol, name) in enumerate(zip(symbols, names)):
+            grams = _trigrams(f"{symbol} {name}")
+            self._gram_counts[row] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(row)
+        self._postings = {gram: np.array(rows, dtype=np.int64) for gram, rows in postings.items()}
+
+    def __len__(self):
+        return len(self.listings)
+
+    @staticmethod
+    def _prefix(keys, rows, prefix):
+        lo = bisect_left(keys, prefix)
+        hi = bisect_left(keys, prefix + "\uffff", lo)
+        return rows[lo:hi]
+
+    def lookup(self, symbol):
+        """Listing of an exact symbol as a dict, or None."""
+        row = self._symbol_row.get(symbol.upper())
+        return None if row is None else self.listings.iloc[row].to_dict()
+
+    def search(self, query, limit=SEARCH_LIMIT, min_score=MIN_FUZZY_SCORE):
+        """
+        Listings matching a symbol or company-name query, best matches first.
+
+        Ranking: exact symbol, then symbol prefix (shorter symbols first), then names whose words start
+        with every query word, then fuzzy trigram matches (share of the query's trigrams found).
+
+        Parameters:
+            query (str): Free text, e.g. "MS", "micro", "bank of am" or "nvidea".
+            limit (int): Maximum number of results.
+            min_score (float): Minimum fuzzy score in [0, 1].
+        Returns:
+            pandas.DataFrame: Matching listings (COLUMNS), at most `limit` rows.
+        """
+        query = query.strip()
+        if not query:
+            return self.listings.iloc[:0]
+        scores = np.zeros(len(self.listings))
+
+        # Fuzzy: overlap of the query's trigrams with every listing, counted with one bincount.
+        # Queries shorter than a trigram are left to the prefix searches below.
+        grams = _trigrams(query) if len(" ".join(_words(query))) >= 3 else set()
+        hits = [self._postings[g] for g in grams if g in self._postings]
+        if hits:
+            overlap = np.bincount(np.concatenate(hits), minlength=len(scores))
+            containment = overlap / len(grams)
+            # Tie-break by the Dice coefficient, which prefers listings without extra words.
+            dice = 2.0 * overlap / (len(grams) + self._gram_counts)
+            scores = np.where(containment >= min_score, containment + 0.1 * dice, 0.0)
+
+        # Company names: every query word must start one of the name's words.
+        words = _words(query)
+        if words:
+            matched = None
+            for word in words:
+                rows = set(self._prefix(self._word_keys, self._word_rows, word).tolist())
+                matched = rows if matched is None else matched & rows
+            if matched:
+                rows = np.fromiter(matched, dtype=np.int64)
+                scores[rows] = np.maximum(scores[rows], 2.0)
+
+        # Symbols: prefix matches, shorter (closer) symbols first, and the exact symbol on top.
+        symbol_query = query.upper()
+        rows = self._prefix(self._symbol_keys, self._symbol_rows, symbol_query)
+        if rows.size:
+            lengths = self.listings["symbol"].to_numpy()[rows].astype(str)
+            scores[rows] = np.maximum(scores[rows], 3.0 - 0.01 * np.char.str_len(lengths))
+        exact = self._symbol_row.get(symbol_query)
+        if exact is not None:
+            scores[exact] = 4.0
+
+        candidates = np.flatnonzero(scores > 0)
+        if candidates.size > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        # Sort by score, then alphabetically by symbol for a stable order.
+        order = np.lexsort((self.listings["symbol"].to_numpy()[candidates], -scores[candidates]))
+        return self.listings.iloc[candidates[order]]
+
+
+def load_listings(path=UNIVERSE_FILE):
+    """Read a listings CSV (symbol, name, sector, exchange); later duplicates of a symbol are dropped."""
+    listings = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return listings.drop_duplicates("symbol", keep="first")
+
+
+# One index per process, shared by all sessions (Streamlit sessions run as threads of one process).
+_universe = None
+_universe_guard = threading.Lock()
+
+
+def get_universe():
+    """Return the process-wide TickerUniverse, building it from UNIVERSE_FILE on first use."""
+    global _universe
+    with _universe_guard:
+        if _universe is None:
+            _universe = TickerUniverse(load_listings())
+        return _universe
+
+
+def read_symbol_directory(nasdaq_listed=NASDAQ_LISTED_URL, other_listed=OTHER_LISTED_URL):
+    """
+    Listings from the NASDAQ Trader symbol directory files (URLs or local paths), with Yahoo-style
+    symbols (BRK.B -> BRK-B). Test issues are dropped; ETFs get the sector "ETF", others none.
+    """
+    def read(source):
+        frame = pd.read_csv(source, sep="|", dtype=str, keep_default_na=False)
+        # The last line is a "File Creation Time" footer.
+        return frame[~frame.iloc[:, 0].str.startswith("File Creation Time")]
+
+    def clean_name(name):
+        # "Apple Inc. - Common Stock" -> "Apple Inc."
+        return name.split(" - ")[0].strip()
+
+    nasdaq = read(nasdaq_listed)
+    nasdaq = nasdaq[nasdaq["Test Issue"] != "Y"]
+    other = read(other_listed)
+    other = other[other["Test Issue"] != "Y"]
+    frames = [
+        pd.DataFrame({
+            "symbol": nasdaq["Symbol"],
+            "name": nasdaq["Security Name"].map(clean_name),
+            "sector": np.where(nasdaq["ETF"] == "Y", "ETF", ""),
+            "exchange": "NASDAQ"
+        }),
+        pd.DataFrame({
+            "symbol": other["CQS Symbol"].str.replace(".", "-", regex=False),
+            "name": other["Security Name"].map(clean_name),
+            "sector": np.where(other["ETF"] == "Y", "ETF", ""),
+            "exchange": other["Exchange"].map(_EXCHANGE_CODES).fillna(other["Exchange"])
+        }),
+    ]
+    listings = pd.concat(frames, ignore_index=True)
+    # Preferred series, warrants, units and rights (lower-case suffixes or $=+^ in the symbol) use
+    # symbols Yahoo writes differently; skip them.
+    return listings[~listings["symbol"].str.contains(r"[a-z$=+^]", regex=True)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ticker universe utilities.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Rebuild the listings file from the NASDAQ Trader symbol directory.")
+    build.add_argument("--nasdaq-listed", default=NASDAQ_LISTED_URL)
+    build.add_argument("--other-listed", default=OTHER_LISTED_URL)
+    build.add_argument("--out", default=UNIVERSE_FILE)
+    args = parser.parse_args(argv)
+    # Curated rows (names, sectors and the indices) of the existing file take precedence.
+    current = load_listings(args.out) if os.path.exists(args.out) else pd.DataFrame(columns=COLUMNS)
+    listings = pd.concat([current, read_symbol_directory(args.nasdaq_listed, args.other_listed)], ignore_index=True)
+    listings.drop_duplicates("symbol", keep="first")[COLUMNS].to_csv(args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
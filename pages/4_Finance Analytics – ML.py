@@ -5,15 +5,36 @@
 # That said, our goal was simply to make something that works and is genuinely useful for finance interview prep,
 # something we ourselves would want to use and explore. The result is this page.
 
+import os
+import threading
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-import yfinance as yf
 import plotly.express as px
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
-from sklearn.linear_model import LinearRegression
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from finance.backtest import METRICS as BACKTEST_METRICS, STRATEGIES, backtest_grid
+from finance.charts import CHART_WIDTH_PX, line_figure, line_traces
+from finance.clustering import cluster_sweep
+from finance.correlation import LARGE_UNIVERSE, CovarianceStore, cluster_order, top_pairs
+from finance.engine import (BENCHMARKS, adjusted_bars, adjusted_close, benchmark_returns, clean_prices, cluster_labels,
+                            fetch_inputs, load_prices, metrics_report, valuation_multiples)
+from finance.factors import FACTORS_FILE, factor_columns, factor_regression, load_factors, rolling_factor_loadings
+from finance.indicators import INDICATORS, PRICE_OVERLAYS, compute_indicator
+from finance.ingest import SUPPORTED_TYPES, load_price_file
+from finance.metrics import compute_price_metrics
+from finance.pairs import MIN_CORRELATION, candidate_pairs, pair_spread, scan_pairs
+from finance.pca import N_COMPONENTS, principal_components
+from finance.portfolio import portfolio_analysis, portfolio_stats, target_return_weights
+from finance.prewarm import start_prewarmer
+from finance.providers import get_provider
+from finance.regression import batch_regression, rolling_beta
+from finance.risk import BASKET, CONFIDENCE_LEVELS, MC_DEFAULT_COLUMNS, MC_PATHS, METHODS as RISK_METHODS, risk_table
+from finance.rolling import rolling_correlation, rolling_drawdown, rolling_sharpe, rolling_volatility
+from finance.simulation import MODELS, simulate_scenarios
+from finance.universe import get_universe
 
 st.set_page_config(
     page_title="Interactive Stock Performance Analyzer – Machine Learning",
@@ -21,6 +42,10 @@ st.set_page_config(
     layout="wide"
 )
 
+# Keep the default tickers, benchmarks and fundamentals fresh in the background (started once per process),
+# so users do not wait for a download after a cache expiry.
+start_prewarmer()
+
 # Sabta logo generated by ChatGPT using the following prompt:
 # "Generate a logo for a consulting interview preparation platform called 'SABTA'. The logo should be modern, professional, and also have some details. Use a color palette that includes blue."
 # OpenAI. (2025). ChatGPT (Version 4.o) [Large language model]. https://chatgpt.com
@@ -30,7 +55,7 @@ st.title("📊 Interactive Stock Performance Analyzer – Machine Learning")
 st.markdown(
     "This interactive tool helps you prepare for finance interviews by analyzing stock performance, "
     "clustering similar stocks, and computing key metrics like Sharpe ratio, Beta/Alpha, and valuation multiples. "
-    "Use the sidebar to configure your analysis and explore the results below."
+    "Use the sidebar to choose the companies and period, then fine-tune each analysis directly in its section below."
 )
 st.write("""
 **Analyze and compare the performance of publicly listed companies.**
@@ -42,14 +67,16 @@ similarly in the market and how they differ in volatility and growth.
 
 st.sidebar.header("Input Options")
 st.sidebar.markdown(
-    "Use these inputs to select the companies, time period, clustering parameters, and benchmark for your analysis."
+    "Use these inputs to select the companies and time period for your analysis. "
+    "Clustering, benchmark and risk-free rate settings live in their sections, so changing them only updates that section."
 )
 st.sidebar.write("Select the dataset and parameters for analysis:")
 
-st.sidebar.markdown("### 1️⃣ Company Selection\nChoose one or more stock tickers to analyze. At least one ticker is required.")
+st.sidebar.markdown("### 1️⃣ Company Selection\nChoose one or more stock tickers to analyze, or search for any listed company. At least one ticker is required.")
 # 1. Company Selection:
 # Provide a list of example stock tickers for user to choose from.
 # We include a diverse set of companies across industries for comparisons.
+# Any other listing can be found with the search box below.
 available_tickers = [
     "AAPL",  # Apple Inc.
     "MSFT",  # Microsoft Corp.
@@ -67,10 +94,30 @@ available_tickers = [
     "PG",    # Procter & Gamble Co.
     "DIS"    # Walt Disney Co.
 ]
+# Search the ticker universe (thousands of listings, indexed once per process and shared by all sessions)
+# by symbol prefix, company name or a misspelled name; matches are offered first in the selection below.
+universe = get_universe()
+ticker_query = st.sidebar.text_input("Search by symbol or company name:", placeholder="e.g. MS, bank of america, nvidea")
+matches = universe.search(ticker_query)
+if ticker_query:
+    st.sidebar.caption(f"{len(matches)} matching listing{'s' if len(matches) != 1 else ''} added to the options below." if len(matches) else "No matching listings.")
+# Keep the current selection among the options, so a new search never drops already chosen tickers.
+current_selection = st.session_state.get("selected_tickers", [])
+ticker_options = list(dict.fromkeys(list(matches["symbol"]) + available_tickers + current_selection))
+
+
+def ticker_label(symbol):
+    """Show the company name next to the symbol when the listing is known."""
+    listing = universe.lookup(symbol)
+    return f"{symbol} – {listing['name']}" if listing else symbol
+
+
 selected_tickers = st.sidebar.multiselect(
     "Select one or more stock tickers to analyze:",
-    options=available_tickers,
-    default=["AAPL", "MSFT", "GOOGL", "AMZN"]  # default selection
+    options=ticker_options,
+    default=["AAPL", "MSFT", "GOOGL", "AMZN"],  # default selection
+    format_func=ticker_label,
+    key="selected_tickers"
 )
 
 st.divider()
@@ -92,117 +139,95 @@ if start_date >= end_date:
     st.sidebar.error("Start date must be before end date.")
     st.stop()
 
-st.sidebar.markdown("### 3️⃣ Clustering Parameters\nSelect how many clusters to form based on risk-return profiles (2–6).")
-# 3. Cluster Count Selection (for ML KMeans):
-# Allow user to choose how many clusters to form for grouping similar stocks.
-num_clusters = st.sidebar.slider(
-    "Number of clusters (for grouping stocks):",
-    min_value=2, max_value=6, value=3, step=1
-)
-
-# Update benchmark section: text and input
-st.sidebar.markdown("### 4️⃣ Benchmark & Risk-Free Rate\nSelect a benchmark index and enter an annual risk-free rate for computing Beta, Alpha, and Sharpe ratio.")
-# Benchmark selection for regression analysis (e.g., S&P 500)
-benchmark_options = ["^GSPC", "^DJI", "^IXIC"]
-benchmark_ticker = st.sidebar.selectbox(
-    "Benchmark index ticker",
-    options=benchmark_options,
-    index=0
-)
-# Risk-free rate input for Sharpe ratio (annual)
-risk_free_rate_annual = st.sidebar.number_input(
-    "Risk-free rate (annual %, e.g., 2.5):", min_value=0.0, max_value=10.0, value=0.0, step=0.1
-) / 100.0
+# Benchmark indices for the regression analysis (e.g., S&P 500). All of them are loaded together with the
+# stock prices; the benchmark itself is chosen in the metrics section.
+benchmark_options = BENCHMARKS
 
 # 4. Optional: File Uploader for user dataset (not mandatory for this scenario, but could be an extension).
 uploaded_file = st.sidebar.file_uploader(
-    "Or upload your own dataset (CSV) for analysis:",
-    type=['csv'],
-    help="You can upload a CSV with columns like Date and price data to analyze your own data."
+    "Or upload your own dataset (CSV, Parquet or Feather) for analysis:",
+    type=SUPPORTED_TYPES,
+    help="Either a 'Date' column plus one price column per ticker, or long format with Date, Ticker and Price columns."
 )
 use_uploaded_data = False
 if uploaded_file is not None:
-    # If a file is uploaded, we could parse it into a DataFrame.
-    # For demonstration, we expect the CSV to have a 'Date' column and one or more price columns.
+    # Parse the upload into a DataFrame with a Date index and one float32 price column per ticker.
+    # CSVs are parsed in chunks, Parquet/Feather via Arrow, and the result is cached on the file content,
+    # so reruns with the same file do not parse it again.
     try:
-        user_df = pd.read_csv(uploaded_file)
-        # Basic check: require a 'Date' column
-        if 'Date' in user_df.columns:
-            user_df['Date'] = pd.to_datetime(user_df['Date'])
-            user_df.set_index('Date', inplace=True)
-            use_uploaded_data = True
-        else:
-            st.sidebar.error("Uploaded CSV must have a 'Date' column.")
+        user_df = load_price_file(uploaded_file.getvalue(), uploaded_file.name)
+        use_uploaded_data = True
     except Exception as e:
-        st.sidebar.error(f"Error reading CSV: {e}")
+        st.sidebar.error(f"Error reading uploaded file: {e}")
         use_uploaded_data = False
 
 # Inform the user what data is being used (either live data from Yahoo or their uploaded file)
 if use_uploaded_data:
     st.write("Using uploaded dataset for analysis.")
 else:
-    st.write(f"Fetching historical stock data from Yahoo Finance for: {', '.join(selected_tickers)}.")
+    st.write(f"Fetching historical stock data from {get_provider().label} for: {', '.join(selected_tickers)}.")
 
 # Data Loading and Caching
 @st.cache_data(ttl=3600)
 def load_stock_data(tickers, start_date, end_date):
     """
-    Fetch historical stock data (OHLCV) for given tickers and date range from Yahoo Finance.
+    Fetch historical stock data (OHLCV) for given tickers and date range.
+
+    Streamlit-cached wrapper around the engine's load_prices (finance/engine.py), which reads from the
+    local price store and only downloads date ranges that are not stored yet (plus the newest bars).
 
     Parameters:
-        tickers (list[str]): List of stock ticker symbols.
+        tickers (list[str] | str): List of stock ticker symbols (or a single symbol).
         start_date (datetime.date): Start date for historical data.
         end_date (datetime.date): End date for historical data.
     Returns:
-        pandas.DataFrame: DataFrame containing the historical data.
-                          If multiple tickers, returns a MultiIndex DataFrame (Ticker x [Open, High, Low, Close, Adj Close, Volume]).
-                          If single ticker, returns a DataFrame with columns [Open, High, Low, Close, Adj Close, Volume].
+        pandas.DataFrame: DataFrame containing the historical data as a MultiIndex DataFrame
+                          ([Open, High, Low, Close, Adj Close, Volume] x Ticker).
     """
-    # yfinance will fetch daily historical data for the tickers.
-    # We set auto_adjust=False to get raw prices and an explicit 'Adj Close' column for adjusted close prices.
-    # We disable progress printout by setting progress=False if available (in newer yfinance).
-    try:
-        data = yf.download(tickers, start=start_date, end=end_date, auto_adjust=False, progress=False)
-    except TypeError:
-        # In case older yfinance doesn't support progress param, call without it.
-        data = yf.download(tickers, start=start_date, end=end_date, auto_adjust=False)
-    return data
+    return load_prices(tickers, start_date, end_date)
+
+# Fetch prices, benchmark and fundamentals concurrently instead of one after another,
+# so the wait is roughly the slowest single call rather than the sum of all calls.
+info_tickers = list(user_df.columns) if use_uploaded_data else selected_tickers
+# All benchmark options are loaded in one request so Beta can be compared across indices.
+# Worker threads get the script context so cached functions behave as in the main thread.
+script_ctx = get_script_run_ctx()
+fetched, fetch_errors = fetch_inputs(
+    None if use_uploaded_data else selected_tickers, start_date, end_date, benchmarks=benchmark_options,
+    fundamentals_tickers=info_tickers, price_loader=load_stock_data,
+    initializer=lambda: add_script_run_ctx(threading.current_thread(), script_ctx)
+)
 
 # Load data (either from Yahoo or use uploaded data if provided)
 if use_uploaded_data:
-    data = user_df.copy()
-    # If uploaded data, assume it is already in a similar format (Date index, columns as tickers or series).
-    # We'll treat each numeric column (besides Date) as a separate series for analysis.
-    # For simplicity, we proceed if so.
-    stock_prices = data  # We'll consider this as equivalent to Adj Close data.
+    # Uploaded data is already in the same format (Date index, one price column per ticker).
+    # It is shared with the upload cache, so the cleaning steps below never modify it in place.
+    stock_prices = user_df  # We'll consider this as equivalent to Adj Close data.
     selected_tickers = list(stock_prices.columns)
 else:
-    # Use Yahoo Finance data for selected tickers
-    data = load_stock_data(selected_tickers, start_date, end_date)
-    # The returned `data` can have different shapes depending on number of tickers.
-    # We need to extract the Adjusted Close prices for each ticker for analysis, since that reflects true performance (adjusted for splits/dividends).
-    if isinstance(data.columns, pd.MultiIndex):
-        # If multiple tickers, data columns are MultiIndex: first level ticker, second level price attribute.
-        # Extract the 'Adj Close' level for all tickers, resulting in a DataFrame of adjusted close prices for each ticker.
-        stock_prices = data['Adj Close'].copy()
-    else:
-        # If only one ticker, data is DataFrame with columns including 'Adj Close'.
-        stock_prices = data[['Adj Close']].copy()
-        # Rename the column to the ticker name for consistency
-        stock_name = selected_tickers[0] if isinstance(selected_tickers, list) else selected_tickers
-        stock_prices.columns = [stock_name]
-# Ensure the DataFrame index is of datetime type (it should be from yfinance, but double-check or convert if needed).
-stock_prices.index = pd.to_datetime(stock_prices.index)
-
-# Basic data sanity check and handling:
-if stock_prices.isnull().values.any():
-    # If any missing values (e.g., no trading data on some days, or if a ticker didn't exist for part of range), fill or drop as appropriate.
-    # We forward-fill missing prices to handle non-trading days or missing data points (assuming markets closed).
-    stock_prices.ffill(inplace=True)
-# If after filling there are still NaNs (e.g., at very start if a stock didn't exist yet), drop those dates:
-stock_prices.dropna(axis=0, how='all', inplace=True)
+    # Use Yahoo Finance data for selected tickers (fetched above); without prices nothing can be shown.
+    if "prices" in fetch_errors:
+        st.error(f"Could not load price data: {fetch_errors['prices']}")
+        st.stop()
+    data = fetched["prices"]
+    # Extract the Adjusted Close prices for each ticker, since they reflect true performance (adjusted for splits/dividends).
+    stock_prices = adjusted_close(data, selected_tickers)
+# Datetime index, forward-filled gaps (non-trading days or missing data points), and no dates or tickers
+# without any data. Each step returns a new frame, so cached data is never modified.
+stock_prices = clean_prices(stock_prices)
+if stock_prices.empty:
+    st.error("No price data available for the selected tickers and period.")
+    st.stop()
+
+# High and low prices for the technical indicators (ATR), adjusted like the closing prices.
+# Uploaded files only contain closing prices, so the indicators fall back to those.
+bars = adjusted_bars(None if use_uploaded_data else data, stock_prices)
 
 # Now `stock_prices` is a DataFrame where each column is the adjusted price of a selected stock over time.
+# All derived series and statistics (returns, normalized prices, drawdowns, clustering features, annualized
+# metrics) are computed once in a single pass and memoized on the content of the price data, so widgets that
+# do not change the prices reuse them. The memoized objects are shared, so we copy before modifying them.
+price_metrics = compute_price_metrics(stock_prices)
 st.subheader("Raw Data Preview")
 st.write("Below is a preview of the adjusted closing price data for the selected period:")
 st.dataframe(stock_prices.head(10))  # show first 10 rows as a sample
@@ -216,95 +241,171 @@ st.write("This line chart normalizes each stock to 100 at the start date, showin
 # We will create a line chart of the normalized price trends.
 # Normalization: We set each stock's price to 100 at the start date to compare relative growth.
 # This way, regardless of their absolute price, we can see how much each grew or fell in percentage terms.
-# Compute normalized prices:
-norm_prices = stock_prices.div(stock_prices.iloc[0]) * 100.0
-
-# Prepare data for plotting (long format for plotly express).
-plot_df = norm_prices.reset_index().melt(id_vars=norm_prices.index.name or 'Date',
-                                         var_name='Ticker', value_name='Normalized Price')
-# Ensure the date column is named 'Date' for clarity in labels:
-if 'index' in plot_df.columns:
-    plot_df.rename(columns={'index': 'Date'}, inplace=True)
-
-# Use Plotly for interactive line chart:
-fig = px.line(plot_df, x='Date', y='Normalized Price', color='Ticker',
-              title="Normalized Stock Price (Start = 100)",
-              labels={'Normalized Price': 'Normalized Price (Start=100)', 'Date': 'Date'})
-# Enhance the figure (e.g., add a horizontal line at 100 for reference, add tooltip formatting)
-fig.add_hline(y=100, line_dash="dot", line_color="gray", annotation_text="Start (100)", annotation_position="bottom right")
-fig.update_layout(legend_title_text='Company', hovermode="x unified")
-# Display the chart in the Streamlit app:
-st.plotly_chart(fig, use_container_width=True)
+# Normalized prices come from the metrics engine:
+norm_prices = price_metrics['norm_prices']
+
+# The page is split into sections that rerun independently (Streamlit fragments): a widget inside a
+# section only re-executes that section, while the data loading above only reruns when the sidebar changes.
+@st.fragment
+def price_chart_section(norm_prices, bars):
+    """Normalized price chart with its own zoom control, plus technical indicators for one stock."""
+    # Long histories are downsampled to a pixel budget (min/max per bucket) and drawn with WebGL traces,
+    # so the chart payload stays the same size however many years or tickers are selected.
+    chart_range = None
+    if len(norm_prices) > CHART_WIDTH_PX:
+        # Narrowing the window re-draws only that range, at full resolution once it fits the budget.
+        first_day, last_day = norm_prices.index[0].date(), norm_prices.index[-1].date()
+        chart_range = st.slider("Zoom to date range:", min_value=first_day, max_value=last_day,
+                                value=(first_day, last_day), format="YYYY-MM-DD")
+
+    # Use Plotly for interactive line chart:
+    fig = line_figure(norm_prices, title="Normalized Stock Price (Start = 100)",
+                      y_label="Normalized Price (Start=100)", date_range=chart_range)
+    # Enhance the figure (e.g., add a horizontal line at 100 for reference, add tooltip formatting)
+    fig.add_hline(y=100, line_dash="dot", line_color="gray", annotation_text="Start (100)", annotation_position="bottom right")
+    fig.update_layout(legend_title_text='Company', hovermode="x unified")
+    # Display the chart in the Streamlit app:
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Technical indicators: bands drawn over the price, oscillators in panels below it.
+    chosen_indicators = st.multiselect("Technical indicators:", options=list(INDICATORS))
+    if not chosen_indicators:
+        return
+    indicator_stock = st.selectbox("Show indicators for:", options=list(bars['Close'].columns))
+    params = {}
+    with st.expander("Indicator parameters"):
+        for name in chosen_indicators:
+            defaults = INDICATORS[name]
+            if name in ("Bollinger Bands", "MA Envelope"):
+                col_window, col_width = st.columns(2)
+                window = col_window.number_input(f"{name} window (days):", min_value=2, max_value=250, value=defaults[0])
+                if name == "Bollinger Bands":
+                    width = col_width.number_input("Band width (standard deviations):", min_value=0.5, max_value=5.0,
+                                                   value=defaults[1], step=0.5)
+                else:
+                    width = col_width.number_input("Envelope width (%):", min_value=0.5, max_value=50.0,
+                                                   value=defaults[1] * 100, step=0.5) / 100.0
+                params[name] = (int(window), float(width))
+            elif name == "MACD":
+                col_fast, col_slow, col_signal = st.columns(3)
+                params[name] = (int(col_fast.number_input("MACD fast span:", min_value=2, max_value=100, value=defaults[0])),
+                                int(col_slow.number_input("MACD slow span:", min_value=3, max_value=250, value=defaults[1])),
+                                int(col_signal.number_input("MACD signal span:", min_value=2, max_value=100, value=defaults[2])))
+            else:
+                params[name] = (int(st.number_input(f"{name} window (days):", min_value=2, max_value=250, value=defaults[0])),)
+
+    panels = [name for name in chosen_indicators if name not in PRICE_OVERLAYS]
+    fig_indicators = make_subplots(
+        rows=1 + len(panels), cols=1, shared_xaxes=True, vertical_spacing=0.05,
+        row_heights=[0.55] + [0.45 / len(panels)] * len(panels) if panels else None,
+        subplot_titles=[f"{indicator_stock} price"] + panels
+    )
+    price = bars['Close'][[indicator_stock]].set_axis(["Price"], axis=1)
+    for trace in line_traces(price, date_range=chart_range, line=dict(color="black", width=1.5)):
+        fig_indicators.add_trace(trace, row=1, col=1)
+    for name in chosen_indicators:
+        # Memoized per price data, indicator and parameters, and computed for all stocks at once:
+        # switching the stock or toggling an indicator only reads the stored result.
+        lines = compute_indicator(bars, name, params[name])
+        frame = pd.DataFrame({f"{name} {line}" if name in PRICE_OVERLAYS else line: values[indicator_stock]
+                              for line, values in lines.items() if line != "Histogram"})
+        row = 1 if name in PRICE_OVERLAYS else 2 + panels.index(name)
+        for trace in line_traces(frame, date_range=chart_range, line=dict(width=1)):
+            fig_indicators.add_trace(trace, row=row, col=1)
+        if name == "RSI":
+            for level in (70, 30):
+                fig_indicators.add_hline(y=level, line_dash="dot", line_color="gray", row=row, col=1)
+    fig_indicators.update_xaxes(type="date")
+    fig_indicators.update_layout(title=f"Technical Indicators: {indicator_stock}", height=450 + 200 * len(panels),
+                                 hovermode="x unified")
+    st.plotly_chart(fig_indicators, use_container_width=True)
+
+
+price_chart_section(norm_prices, bars)
 # The above chart allows the user to hover over dates to see each stock's normalized price, and toggle lines via the legend.
 
 st.subheader("Correlation Matrix of Daily Returns")
 st.write("This heatmap reveals pairwise correlations of daily returns, helping identify stocks that move together.")
-# Calculate daily percentage returns for each stock:
-returns = stock_prices.pct_change().dropna()
-# Compute correlation matrix:
-corr_matrix = returns.corr()
-# Use Plotly to display an interactive heatmap of correlation matrix:
-fig_corr = px.imshow(corr_matrix, text_auto=".2f", aspect="auto", origin="lower",
-                     color_continuous_scale="RdBu", zmin=-1, zmax=1,
-                     title="Correlation of Daily Returns")
-fig_corr.update_xaxes(side="bottom", tickangle=45)  # show ticker symbols on x-axis at bottom
-fig_corr.update_yaxes(tickangle=0)  # keep y-axis labels readable
-fig_corr.update_layout(coloraxis_colorbar=dict(title="Correlation"))
-st.plotly_chart(fig_corr, use_container_width=True)
-# The heatmap uses a red-blue colormap: red for positive correlation, blue for negative.
-# We annotated each cell with the correlation value (two decimal places) for clarity.
+# Daily percentage returns for each stock (from the metrics engine):
+returns = price_metrics['returns']
+# Correlation matrix from this session's covariance store, which keeps sums and cross-products of the
+# current selection: adding a ticker only computes its new row and column, removing one drops them.
+covariance_store = st.session_state.setdefault("covariance_store", CovarianceStore())
+corr_matrix = covariance_store.update(returns).correlation(returns.columns)
+if returns.shape[1] <= LARGE_UNIVERSE:
+    # Use Plotly to display an interactive heatmap of correlation matrix:
+    fig_corr = px.imshow(corr_matrix, text_auto=".2f", aspect="auto", origin="lower",
+                         color_continuous_scale="RdBu", zmin=-1, zmax=1,
+                         title="Correlation of Daily Returns")
+    fig_corr.update_xaxes(side="bottom", tickangle=45)  # show ticker symbols on x-axis at bottom
+    fig_corr.update_yaxes(tickangle=0)  # keep y-axis labels readable
+    fig_corr.update_layout(coloraxis_colorbar=dict(title="Correlation"))
+    st.plotly_chart(fig_corr, use_container_width=True)
+    # The heatmap uses a red-blue colormap: red for positive correlation, blue for negative.
+    # We annotated each cell with the correlation value (two decimal places) for clarity.
+else:
+    # Large-universe mode: correlation ordered by hierarchical clustering, so groups of related
+    # stocks appear as blocks. Cells are not annotated (hundreds of thousands of labels would freeze the
+    # browser) and values are rounded to keep the chart payload small; zoom in to inspect a block.
+    st.write(f"**Large-universe mode** ({returns.shape[1]} stocks): stocks are ordered by hierarchical clustering. "
+             "Zoom into the heatmap to inspect a group.")
+    order = cluster_order(corr_matrix)
+    corr_matrix = corr_matrix.loc[order, order]
+    fig_corr = go.Figure(go.Heatmap(
+        z=corr_matrix.to_numpy().round(2), x=list(corr_matrix.columns), y=list(corr_matrix.index),
+        colorscale="RdBu", zmin=-1, zmax=1, colorbar=dict(title="Correlation"),
+        hovertemplate="%{y} / %{x}: %{z:.2f}<extra></extra>"
+    ))
+    fig_corr.update_layout(title="Correlation of Daily Returns (clustered order)", height=700)
+    fig_corr.update_xaxes(showticklabels=returns.shape[1] <= 100)
+    fig_corr.update_yaxes(showticklabels=returns.shape[1] <= 100, autorange="reversed")
+    st.plotly_chart(fig_corr, use_container_width=True)
+
+if returns.shape[1] > 1:
+    # Strongest and weakest relationships, read directly from the upper triangle of the matrix.
+    most_correlated, least_correlated = top_pairs(corr_matrix, k=10)
+    col_most, col_least = st.columns(2)
+    with col_most:
+        st.write("**Most correlated pairs**")
+        st.dataframe(most_correlated.round(2), hide_index=True)
+    with col_least:
+        st.write("**Least correlated pairs**")
+        st.dataframe(least_correlated.round(2), hide_index=True)
 
 # Machine Learning: Clustering stocks by performance
-# Prepare features for clustering:
+# Features for clustering (computed once by the metrics engine):
 # Feature 1: Total return (%) over the period for each stock.
-total_return = (stock_prices.iloc[-1] / stock_prices.iloc[0] - 1) * 100  # percentage change from first to last day
-# Feature 2: Volatility (%) - we take standard deviation of daily returns and convert to percentage.
-volatility = returns.std() * 100
-
-# Create a DataFrame of features for each stock:
-features_df = pd.DataFrame({
-    'Return (%)': total_return,
-    'Volatility (%)': volatility
-})
-# Drop any stocks where return or volatility couldn't be computed (shouldn't happen unless data issues).
-features_df.dropna(inplace=True)
-
-if num_clusters > features_df.shape[0]:
-    st.warning(f"Cannot perform clustering: number of clusters ({num_clusters}) cannot exceed number of stocks ({features_df.shape[0]}). Please select fewer clusters or add more stocks.")
-else:
+# Feature 2: Volatility (%) - the standard deviation of daily returns in percent.
+# Stocks where return or volatility couldn't be computed are already dropped.
+features_df = price_metrics['features']
+
+@st.fragment
+def clustering_section(features_df):
+    """K-Means clustering section; moving the cluster slider only reruns this section."""
     st.subheader("K-Means Clustering of Stocks (Risk vs Return)")
     st.write("Clustering groups stocks with similar total return and volatility characteristics. Adjust cluster count to see different groupings.")
+    # Cluster Count Selection (for ML KMeans):
+    # Allow user to choose how many clusters to form for grouping similar stocks.
+    num_clusters = st.slider(
+        "Number of clusters (for grouping stocks):",
+        min_value=2, max_value=6, value=3, step=1
+    )
+    if num_clusters > features_df.shape[0]:
+        st.warning(f"Cannot perform clustering: number of clusters ({num_clusters}) cannot exceed number of stocks ({features_df.shape[0]}). Please select fewer clusters or add more stocks.")
+        return
+    # Work on a copy: the features are shared with the metrics cache and the fragment reuses its arguments.
+    features_df = features_df.copy()
     st.write(f"We apply an unsupervised machine learning model (K-Means) to cluster the selected stocks into **{num_clusters}** groups, "
              "based on their **risk and return** characteristics over the chosen period. "
              "Here, we define 'return' as the total percentage change in price over the period, and 'risk' as the volatility (standard deviation of daily returns).")
 
-    # Prepare features for clustering:
-    # Feature 1: Total return (%) over the period for each stock.
-    total_return = (stock_prices.iloc[-1] / stock_prices.iloc[0] - 1) * 100  # percentage change from first to last day
-    # Feature 2: Volatility (%) - we take standard deviation of daily returns and convert to percentage.
-    volatility = returns.std() * 100
-
-    # Create a DataFrame of features for each stock:
-    features_df = pd.DataFrame({
-        'Return (%)': total_return,
-        'Volatility (%)': volatility
-    })
-    # Drop any stocks where return or volatility couldn't be computed (shouldn't happen unless data issues).
-    features_df.dropna(inplace=True)
-
-    # Scale features before clustering (K-Means is distance-based, so it's good to normalize features).
-    scaler = StandardScaler()
-    X = scaler.fit_transform(features_df[['Return (%)', 'Volatility (%)']])
-
-    # Perform K-Means clustering:
-    kmeans = KMeans(n_clusters=num_clusters, n_init='auto', random_state=42)
-    cluster_labels = kmeans.fit_predict(X)
-    features_df['Cluster'] = cluster_labels  # assign cluster labels to each stock
-
-    # Evaluate clustering performance using silhouette score (only if more than 1 cluster):
-    # Compute silhouette score only when cluster count is valid (at least 2 clusters and fewer clusters than samples)
-    if num_clusters > 1 and features_df.shape[0] > num_clusters:
-        sil_score = silhouette_score(X, cluster_labels)
+    # K-Means (on standardized features) is fitted once for every slider value in parallel and cached on the
+    # features, so moving the slider only picks a stored clustering instead of refitting.
+    # The silhouette score evaluates the clustering; it is only defined when there are at least 2 clusters
+    # and fewer clusters than samples.
+    features_df['Cluster'], sil_score = cluster_labels(features_df, num_clusters)
+    sweep = cluster_sweep(features_df[['Return (%)', 'Volatility (%)']])
+    if not pd.isna(sil_score):
         st.write(f"**Silhouette Score** of the clustering: {sil_score:.2f} "
                  "(Silhouette score ranges from -1 to 1, where higher is better. Scores above 0 indicate meaningful clustering.)")
     else:
@@ -313,6 +414,23 @@ else:
             f"must be at least 2 and less than the number of stocks ({features_df.shape[0]})."
         )
 
+    # Elbow and silhouette chart over all cluster counts, so the best k can be read off without refitting.
+    cluster_scores = sweep['scores'].dropna()
+    if len(cluster_scores) > 1:
+        best_k = int(cluster_scores['Silhouette'].idxmax())
+        fig_k = make_subplots(specs=[[{"secondary_y": True}]])
+        fig_k.add_trace(go.Scatter(x=cluster_scores.index, y=cluster_scores['Inertia'], name="Inertia (elbow)",
+                                   mode="lines+markers"), secondary_y=False)
+        fig_k.add_trace(go.Scatter(x=cluster_scores.index, y=cluster_scores['Silhouette'], name="Silhouette score",
+                                   mode="lines+markers"), secondary_y=True)
+        fig_k.add_vline(x=best_k, line_dash="dot", line_color="gray", annotation_text=f"Best k = {best_k}")
+        fig_k.update_layout(title="Choosing the Number of Clusters", xaxis_title="Number of clusters (k)")
+        fig_k.update_yaxes(title_text="Inertia", secondary_y=False)
+        fig_k.update_yaxes(title_text="Silhouette score", secondary_y=True)
+        st.plotly_chart(fig_k, use_container_width=True)
+        st.write(f"The highest silhouette score is reached with **{best_k}** clusters. "
+                 "In the elbow curve, look for the point where adding clusters stops reducing inertia much.")
+
     # Create an interactive scatter plot for clusters:
     features_df['Ticker'] = features_df.index  # bring ticker name as a column for plotting
     fig_clusters = px.scatter(
@@ -334,65 +452,559 @@ else:
         members = features_df[features_df['Cluster'] == cluster_num]['Ticker'].tolist()
         st.write(f"- **Cluster {cluster_num}:** " + ", ".join(members))
 
-# Financial Metrics for Interview Prep
-st.write(
-    "Below are key performance and risk metrics commonly discussed in finance interviews, calculated for each stock."
-)
-st.subheader("Financial Metrics for Interview Prep")
-st.write("Key metrics often discussed in finance interviews: annualized return, volatility, Sharpe ratio, maximum drawdown, and Beta/Alpha relative to a benchmark.")
-
-# Compute annualized return and volatility
-trading_days = 252
-annual_return = (1 + returns).prod() ** (trading_days / len(returns)) - 1
-annual_vol = returns.std() * (trading_days ** 0.5)
-
-# Compute Sharpe ratio
-sharpe_ratio = (annual_return - risk_free_rate_annual) / annual_vol
-
-# Compute max drawdown
-cum_returns = (1 + returns).cumprod()
-running_max = cum_returns.cummax()
-drawdown = (cum_returns - running_max) / running_max
-max_drawdown = drawdown.min()
-
-# Prepare metrics DataFrame
-metrics_df = pd.DataFrame({
-    'Annual Return': annual_return,
-    'Annual Volatility': annual_vol,
-    'Sharpe Ratio': sharpe_ratio,
-    'Max Drawdown': max_drawdown
-})
-
-# Fetch benchmark data and compute returns
-bench_data = load_stock_data(benchmark_ticker, start_date, end_date)
-if isinstance(bench_data.columns, pd.MultiIndex):
-    bench_prices = bench_data['Adj Close'][benchmark_ticker]
+
+clustering_section(features_df)
+
+
+@st.fragment
+def pca_section(returns):
+    """Principal components of the returns: scree plot, loadings and eigen-portfolio performance."""
+    st.subheader("Principal Components & Eigen-Portfolios")
+    st.write("Principal component analysis (PCA) finds the few independent directions that explain most of the co-movement "
+             "of the selected stocks. The first component is usually the market as a whole, later ones are sector or style "
+             "tilts. Each component defines an **eigen-portfolio** (weights from its loadings) whose returns are shown below.")
+    if returns.shape[1] < 2:
+        st.info("Select at least two stocks for the principal component analysis.")
+        return
+    max_components = min(N_COMPONENTS, returns.shape[1])
+    # Memoized on the returns: the controls below only select from the result.
+    pca = principal_components(returns, max_components, True)
+    explained = pca['explained']
+
+    fig_scree = make_subplots(specs=[[{"secondary_y": True}]])
+    fig_scree.add_trace(go.Bar(x=explained.index, y=explained['Explained Variance'], name='Explained variance'))
+    fig_scree.add_trace(go.Scatter(x=explained.index, y=explained['Cumulative'], mode='lines+markers',
+                                   name='Cumulative'), secondary_y=True)
+    fig_scree.update_layout(title="Scree Plot: Share of Return Variance Explained by Each Component")
+    fig_scree.update_yaxes(tickformat='.0%', title_text="Explained variance", secondary_y=False)
+    fig_scree.update_yaxes(tickformat='.0%', title_text="Cumulative", range=[0, 1], secondary_y=True)
+    st.plotly_chart(fig_scree, use_container_width=True)
+
+    component = st.selectbox("Loadings of component:", options=list(explained.index))
+    loadings = pca['loadings'][component]
+    if len(loadings) > LARGE_UNIVERSE:
+        # Only the largest exposures stay readable in large universes.
+        loadings = loadings.loc[loadings.abs().nlargest(30).index]
+    loadings = loadings.sort_values()
+    fig_loadings = go.Figure(go.Bar(x=loadings.to_numpy(), y=list(loadings.index), orientation='h',
+                                    marker_color=np.where(loadings.to_numpy() < 0, 'indianred', 'seagreen')))
+    fig_loadings.update_layout(title=f"{component} Loadings per Stock" +
+                               (" (30 largest)" if returns.shape[1] > LARGE_UNIVERSE else ""),
+                               xaxis_title="Loading", height=max(400, 18 * len(loadings)))
+    st.plotly_chart(fig_loadings, use_container_width=True)
+
+    shown = st.multiselect("Eigen-portfolios to chart:", options=list(explained.index),
+                           default=list(explained.index[:3]))
+    if shown:
+        growth = (1.0 + pca['portfolio_returns'][shown]).cumprod() * 100.0
+        fig_eigen = line_figure(growth, title="Eigen-Portfolio Growth (start = 100, gross exposure 1)",
+                                y_label="Value")
+        fig_eigen.update_layout(legend_title_text='Component', hovermode="x unified")
+        st.plotly_chart(fig_eigen, use_container_width=True)
+
+
+pca_section(returns)
+
+# Benchmark data was fetched concurrently above; if it failed we still show the other metrics.
+bench_returns = None
+regression = None
+if "benchmarks" in fetch_errors:
+    st.warning(f"Could not load benchmark data, so Beta and Alpha are not shown: {fetch_errors['benchmarks']}")
 else:
-    bench_prices = bench_data['Adj Close']
-bench_returns = bench_prices.pct_change().dropna()
+    # Compute benchmark returns (one column per benchmark index that returned data)
+    bench_returns = benchmark_returns(fetched["benchmarks"])
+    if bench_returns is None:
+        st.warning("No benchmark data available, so Beta and Alpha are not shown.")
+    else:
+        # Compute Beta, Alpha, R-squared and residual volatility for all tickers and all benchmarks at once
+        # (closed-form regression over the aligned returns matrix instead of one model per ticker).
+        # This does not depend on any widget, so choosing a benchmark below only selects from it.
+        regression = batch_regression(returns, bench_returns)
+
+
+@st.fragment
+def metrics_section(stock_prices, returns, bench_returns, regression):
+    """Metrics table with its benchmark and risk-free rate inputs; changing them only reruns this section."""
+    # Financial Metrics for Interview Prep
+    st.write(
+        "Below are key performance and risk metrics commonly discussed in finance interviews, calculated for each stock."
+    )
+    st.subheader("Financial Metrics for Interview Prep")
+    st.write("Key metrics often discussed in finance interviews: annualized return, volatility, Sharpe ratio, maximum drawdown, and Beta/Alpha relative to a benchmark.")
+
+    col_benchmark, col_rate = st.columns(2)
+    with col_benchmark:
+        # Benchmark selection for regression analysis (e.g., S&P 500), among the indices that returned data
+        available_benchmarks = [b for b in benchmark_options if bench_returns is not None and b in bench_returns.columns]
+        benchmark_ticker = st.selectbox(
+            "Benchmark index ticker",
+            options=available_benchmarks,
+            index=0,
+            disabled=not available_benchmarks
+        )
+    with col_rate:
+        # Risk-free rate input for Sharpe ratio (annual)
+        risk_free_rate_annual = st.number_input(
+            "Risk-free rate (annual %, e.g., 2.5):", min_value=0.0, max_value=10.0, value=0.0, step=0.1
+        ) / 100.0
+
+    # Annualized return and volatility, Sharpe ratio and max drawdown from the metrics engine
+    # (memoized on the price data plus the risk-free rate, so a new rate only recomputes the Sharpe column),
+    # plus Beta, Alpha, R-squared and residual volatility against the chosen benchmark.
+    metrics_df = metrics_report(stock_prices, risk_free_rate_annual, regression, benchmark_ticker)
+
+    # Round for display
+    metrics_df = metrics_df.round(4)
+
+    # Display metrics table
+    st.dataframe(metrics_df)
+
+    if benchmark_ticker is not None:
+        # Beta of every stock against every available benchmark, from the same batched regression.
+        with st.expander("Beta across all benchmarks"):
+            st.dataframe(regression['Beta'].unstack('Benchmark').reindex(returns.columns).round(4))
+
+    bench_return = bench_returns[benchmark_ticker] if benchmark_ticker is not None else None
+    rolling_section(returns, bench_return, benchmark_ticker, risk_free_rate_annual)
+
+
+@st.fragment
+def rolling_section(returns, bench_return, benchmark_ticker, risk_free_rate_annual):
+    """Rolling risk metrics; its own widgets only rerun this section (it also reruns with the metrics section)."""
+    # Rolling risk metrics: how the full-period numbers above evolve over time.
+    st.subheader("Rolling Risk Metrics")
+    st.write("Interviewers often ask how risk changes over time. These charts recompute each metric over a trailing window "
+             "for every date (computed incrementally with cumulative sums, so long histories stay fast).")
+    rolling_options = ["Rolling Sharpe Ratio", "Rolling Volatility", "Rolling Drawdown"]
+    if bench_return is not None:
+        rolling_options += ["Rolling Correlation to Benchmark", "Rolling Beta"]
+    col_metric, col_window = st.columns(2)
+    with col_metric:
+        rolling_metric = st.selectbox("Metric:", options=rolling_options)
+    with col_window:
+        rolling_window = st.selectbox("Rolling window (trading days):", options=[20, 60, 120, 250], index=1)
+
+    if rolling_metric == "Rolling Sharpe Ratio":
+        rolling_values, reference_line = rolling_sharpe(returns, rolling_window, risk_free_rate_annual), 0
+    elif rolling_metric == "Rolling Volatility":
+        rolling_values, reference_line = rolling_volatility(returns, rolling_window), None
+    elif rolling_metric == "Rolling Drawdown":
+        rolling_values, reference_line = rolling_drawdown(returns, rolling_window), 0
+    elif rolling_metric == "Rolling Correlation to Benchmark":
+        rolling_values, reference_line = rolling_correlation(returns, bench_return, rolling_window), 0
+    else:
+        rolling_values, reference_line = rolling_beta(returns, bench_return, rolling_window), 1
+    rolling_values = rolling_values.dropna(how='all')
 
-# Align returns
-aligned = returns.join(bench_returns.rename('Benchmark'), how='inner')
+    if rolling_values.empty:
+        st.info("The selected period is shorter than the rolling window.")
+        return
+    # Same downsampled WebGL rendering as the price chart, so long histories stay interactive.
+    chart_title = f"{rolling_metric} ({rolling_window}-day window)"
+    if rolling_metric in ("Rolling Correlation to Benchmark", "Rolling Beta"):
+        chart_title += f" vs {benchmark_ticker}"
+    fig_rolling = line_figure(rolling_values, title=chart_title, y_label=rolling_metric.replace("Rolling ", ""))
+    if reference_line is not None:
+        fig_rolling.add_hline(y=reference_line, line_dash="dot", line_color="gray")
+    fig_rolling.update_layout(legend_title_text='Company', hovermode="x unified")
+    st.plotly_chart(fig_rolling, use_container_width=True)
 
-# Compute Beta and Alpha using linear regression
-betas = {}
-alphas = {}
-for ticker in returns.columns:
-    y = aligned[ticker].values.reshape(-1, 1)
-    x = aligned['Benchmark'].values.reshape(-1, 1)
-    model = LinearRegression().fit(x, y)
-    betas[ticker] = model.coef_[0][0]
-    alphas[ticker] = model.intercept_[0]
 
-metrics_df['Beta'] = pd.Series(betas)
-metrics_df['Alpha'] = pd.Series(alphas)
+metrics_section(stock_prices, returns, bench_returns, regression)
 
-# Round for display
-metrics_df = metrics_df.round(4)
 
+@st.fragment
+def factor_section(returns):
+    """Multi-factor exposures (market, size, value, momentum) from a local or uploaded factor file."""
+    st.subheader("Multi-Factor Exposures (Fama-French Style)")
+    st.write("Beyond CAPM, factor models explain returns with several risk factors: the market (Mkt-RF), size (SMB, small minus big), "
+             "value (HML, high minus low book-to-market) and momentum (Mom). Each stock's excess return is regressed on the factors; "
+             "a |t-stat| above about 2 means the exposure is statistically significant.")
+    factor_upload = st.file_uploader("Factor returns CSV (Date plus one column per factor, optional RF):", type=["csv"],
+                                     help="Defaults to the bundled factor file. Build it from the Kenneth R. French data library "
+                                          "with: python -m finance.factors build")
+    if factor_upload is not None:
+        content = factor_upload.getvalue()
+    elif os.path.exists(FACTORS_FILE):
+        with open(FACTORS_FILE, "rb") as f:
+            content = f.read()
+    else:
+        st.info("No factor data available. Upload a factor CSV or build the factor file with `python -m finance.factors build`.")
+        return
+    try:
+        # Parsed once per file content and converted to decimal returns.
+        factors = load_factors(content)
+    except ValueError as e:
+        st.warning(f"Could not read the factor file: {e}")
+        return
+
+    available_factors = factor_columns(factors)
+    chosen_factors = st.multiselect("Factors:", options=available_factors, default=available_factors)
+    if not chosen_factors:
+        st.info("Select at least one factor.")
+        return
+    try:
+        # One least-squares solve for all stocks at once.
+        exposures = factor_regression(returns, factors, chosen_factors)
+    except ValueError as e:
+        st.warning(f"Cannot estimate factor exposures: {e}")
+        return
+
+    col_coef, col_tstat = st.columns(2)
+    with col_coef:
+        st.write("**Factor loadings** (alpha annualized)")
+        st.dataframe(exposures['coef'].round(3))
+    with col_tstat:
+        st.write("**t-statistics**")
+        st.dataframe(exposures['tstat'].round(2))
+    st.dataframe(exposures['fit'].round(4))
+
+    # Rolling loadings: how the exposures drift over time (cumulative-sum windows, one batched solve).
+    col_factor, col_window = st.columns(2)
+    with col_factor:
+        rolling_factor = st.selectbox("Rolling loading of factor:", options=chosen_factors)
+    with col_window:
+        factor_window = st.selectbox("Factor window (trading days):", options=[60, 120, 250], index=1)
+    loadings = rolling_factor_loadings(returns, factors, factor_window, chosen_factors)[rolling_factor].dropna(how='all')
+    if loadings.empty:
+        st.info("The overlap with the factor data is shorter than the rolling window.")
+        return
+    fig_loadings = line_figure(loadings, title=f"Rolling {rolling_factor} Loading ({factor_window}-day window)",
+                               y_label=f"{rolling_factor} loading")
+    fig_loadings.update_layout(legend_title_text='Company', hovermode="x unified")
+    st.plotly_chart(fig_loadings, use_container_width=True)
+
+
+factor_section(returns)
+
+
+@st.fragment
+def risk_section(returns):
+    """Value-at-Risk and Expected Shortfall of every stock and a weighted basket, with four methods."""
+    st.subheader("Value-at-Risk (VaR) and Expected Shortfall (CVaR)")
+    st.write("VaR is the loss that is not exceeded with the chosen confidence over the horizon; CVaR (Expected Shortfall) is the "
+             "average loss in the remaining worst cases. **Historical** uses the actual overlapping returns, **Gaussian** assumes "
+             "normal returns, **Cornish-Fisher** corrects the normal quantile for skewness and fat tails, and **Monte Carlo** "
+             "simulates correlated returns. Losses are shown as a share of the position value.")
+    col_confidence, col_horizon, col_weights = st.columns(3)
+    with col_confidence:
+        confidence = st.selectbox("Confidence level:", options=CONFIDENCE_LEVELS, index=1, format_func=lambda c: f"{c:.1%}")
+    with col_horizon:
+        risk_horizon = st.selectbox("Horizon (trading days):", options=[1, 5, 10, 21], index=0, key="risk_horizon")
+    with col_weights:
+        weighting = st.radio("Basket weights:", options=["Equal weight", "Custom weights"])
+
+    weights = [1.0] * len(returns.columns)
+    if weighting == "Custom weights":
+        # Relative weights; they are normalized to sum to 1.
+        edited = st.data_editor(
+            pd.DataFrame({'Weight': weights}, index=pd.Index(returns.columns, name='Ticker')),
+            column_config={'Weight': st.column_config.NumberColumn(min_value=0.0, step=0.1)},
+            key="risk_weights"
+        )
+        weights = edited['Weight'].fillna(0.0).tolist()
+    # The correlated Monte Carlo draw grows with the square of the selection size, so large selections
+    # only run it on request; the other methods stay instant.
+    monte_carlo = st.checkbox("Include Monte Carlo", value=len(returns.columns) <= MC_DEFAULT_COLUMNS,
+                              help="Simulates correlated returns; slower for large selections.")
+    try:
+        # Memoized on the returns and all inputs; every method runs over all tickers at once.
+        risk = risk_table(returns, tuple(weights), confidence, int(risk_horizon), MC_PATHS if monte_carlo else 0)
+    except ValueError as e:
+        st.warning(f"Cannot compute VaR: {e}")
+        return
+    methods = [m for m in RISK_METHODS if monte_carlo or m != "Monte Carlo"]
+    risk = risk[[f"{m} {measure}" for m in methods for measure in ("VaR", "CVaR")]]
+
+    basket = risk.loc[BASKET]
+    fig_risk = go.Figure([
+        go.Bar(x=methods, y=[basket[f"{m} VaR"] for m in methods], name='VaR'),
+        go.Bar(x=methods, y=[basket[f"{m} CVaR"] for m in methods], name='CVaR')
+    ])
+    fig_risk.update_layout(title=f"Basket {risk_horizon}-day VaR and CVaR at {confidence:.1%} Confidence",
+                           yaxis_title="Loss (share of value)", barmode='group')
+    fig_risk.update_yaxes(tickformat='.1%')
+    st.plotly_chart(fig_risk, use_container_width=True)
+    st.dataframe(risk.round(4))
+
+
+risk_section(returns)
+
+
+@st.fragment
+def backtest_section(stock_prices):
+    """Backtests of simple trading rules over a grid of parameters, shown as heatmaps."""
+    st.subheader("Strategy Backtests Across Parameter Grids")
+    st.write("Simple trading rules are a common interview topic. **Moving-average crossover** is long while the fast average is "
+             "above the slow one; **Momentum** goes long after a positive and short after a negative trailing return (optionally "
+             "skipping the most recent days); **Mean reversion** buys when the price is far below its trailing mean and sells short "
+             "when it is far above. Every parameter combination is tested on every stock; beware of picking the best cell "
+             "of a grid, which overfits the past.")
+    # The grid only runs after the form is submitted: the submitted settings are kept in the session state
+    # (with the stocks they were run for), so the heatmap choices below rerun on the stored grid and neither
+    # the first page load nor editing the strategy or cost starts a backtest.
+    with st.form("backtest_form"):
+        col_strategy, col_cost = st.columns(2)
+        with col_strategy:
+            strategy = st.selectbox("Strategy:", options=list(STRATEGIES))
+        with col_cost:
+            cost_bps = st.number_input("Transaction cost (bps per trade):", min_value=0.0, max_value=100.0, value=5.0, step=1.0)
+        if st.form_submit_button("Run backtest"):
+            st.session_state["backtest_settings"] = (tuple(stock_prices.columns), strategy, float(cost_bps))
+    settings = st.session_state.get("backtest_settings")
+    if settings is None or settings[0] != tuple(stock_prices.columns):
+        st.info("Choose a strategy and transaction cost, then press **Run backtest**.")
+        return
+    _, strategy, cost_bps = settings
+    try:
+        with st.spinner("Backtesting the parameter grid..."):
+            # Memoized on the prices, strategy and cost; the metric and stock choices below only select from it.
+            grid = backtest_grid(stock_prices, strategy, None, None, cost_bps)
+    except ValueError as e:
+        st.warning(f"Cannot run the backtest: {e}")
+        return
+
+    first_name, second_name = grid.index.names[:2]
+    col_metric, col_stock = st.columns(2)
+    with col_metric:
+        heatmap_metric = st.selectbox("Heatmap metric:", options=BACKTEST_METRICS, index=1)
+    with col_stock:
+        stock_choice = st.selectbox("Stock:", options=["Average of all stocks"] + list(stock_prices.columns))
+    if stock_choice == "Average of all stocks":
+        combinations = grid.groupby(level=[0, 1]).mean()
+    else:
+        combinations = grid.xs(stock_choice, level='Ticker')
+    heatmap = combinations[heatmap_metric].unstack(second_name)
+    fig_grid = px.imshow(heatmap.to_numpy(), x=[str(v) for v in heatmap.columns], y=[str(v) for v in heatmap.index],
+                         origin="lower", aspect="auto",
+                         color_continuous_scale="Blues" if heatmap_metric == "Turnover" else "RdYlGn",
+                         labels=dict(x=second_name, y=first_name, color=heatmap_metric),
+                         title=f"{strategy}: {heatmap_metric} ({stock_choice}, after {cost_bps:g} bps costs)")
+    st.plotly_chart(fig_grid, use_container_width=True)
+
+    st.write("**Best parameter combinations by Sharpe ratio:**")
+    st.dataframe(combinations.dropna().nlargest(10, 'Sharpe Ratio').round(4))
+
+
+backtest_section(stock_prices)
+
+
+@st.fragment
+def pairs_section(stock_prices, corr_matrix):
+    """Cointegration scan over the correlated pairs of the selection, with the spread of a chosen pair."""
+    st.subheader("Pairs Trading: Cointegration Scanner")
+    st.write("Two stocks are cointegrated when a weighted difference of their log prices (the spread) keeps reverting to its mean, "
+             "the basis of pairs trading. Correlated pairs are tested with the Engle-Granger method: the **hedge ratio** comes from "
+             "regressing one log price on the other and the **ADF statistic** tests whether the spread mean-reverts (more "
+             "negative is stronger). The **half-life** is how many days a deviation takes to halve, and the **z-score** shows how "
+             "stretched the spread is today.")
+    if stock_prices.shape[1] < 2:
+        st.info("Select at least two stocks to scan for pairs.")
+        return
+    min_correlation = st.slider("Minimum return correlation of tested pairs:", min_value=0.0, max_value=0.99,
+                                value=MIN_CORRELATION, step=0.05)
+    # Prefilter with the correlation matrix computed above, so only plausible pairs are tested.
+    candidates = candidate_pairs(corr_matrix, min_correlation)
+    n_stocks = stock_prices.shape[1]
+    st.caption(f"{len(candidates):,} of {n_stocks * (n_stocks - 1) // 2:,} pairs pass the correlation filter.")
+    if not candidates:
+        st.info("No pair reaches the minimum correlation; lower the threshold.")
+        return
+    try:
+        with st.spinner(f"Testing {len(candidates):,} pairs for cointegration..."):
+            # Memoized on the price data and the candidate pairs.
+            pairs = scan_pairs(stock_prices, candidates)
+    except ValueError as e:
+        st.warning(f"Cannot scan for pairs: {e}")
+        return
 
-# Display metrics table
-st.dataframe(metrics_df)
+    st.write("**Pairs ranked by cointegration strength** (Engle-Granger significance level in the Significance column):")
+    st.dataframe(pairs.head(25).round(4), hide_index=True)
+
+    top = pairs.head(25)
+    pair_labels = [f"{a} / {b}" for a, b in zip(top['Ticker A'], top['Ticker B'])]
+    chosen = st.selectbox("Show the spread of:", options=range(len(top)), format_func=lambda i: pair_labels[i])
+    row = top.iloc[chosen]
+    spread = pair_spread(stock_prices, row['Ticker A'], row['Ticker B'], row['Hedge Ratio'], row['Intercept'])
+    fig_spread = go.Figure(go.Scatter(x=spread.index, y=spread['Z-Score'], mode='lines', name='Spread z-score'))
+    for level, dash in [(2, "dash"), (0, "dot"), (-2, "dash")]:
+        fig_spread.add_hline(y=level, line_dash=dash, line_color="gray")
+    fig_spread.update_layout(
+        title=f"Spread z-score: log {row['Ticker A']} − {row['Hedge Ratio']:.2f} × log {row['Ticker B']}",
+        xaxis_title="Date", yaxis_title="Z-score"
+    )
+    st.plotly_chart(fig_spread, use_container_width=True)
+
+
+pairs_section(stock_prices, corr_matrix)
+
+# Random portfolios drawn in the chart; the full Monte Carlo cloud is still used for the statistics.
+PORTFOLIO_CLOUD_POINTS = 5000
+
+
+@st.fragment
+def portfolio_section(returns):
+    """Mean-variance portfolio optimizer and efficient frontier; its inputs only rerun this section."""
+    st.subheader("Portfolio Optimization & Efficient Frontier")
+    st.write("Modern portfolio theory combines the selected stocks into portfolios. Every dot is a random long-only portfolio "
+             "(no short selling, fully invested); the line is the efficient frontier, the lowest volatility achievable for each expected return. "
+             "Expected returns are annualized average daily returns over the chosen period.")
+    if returns.shape[1] < 2:
+        st.info("Select at least two stocks to build portfolios.")
+        return
+
+    col_rate, col_count, col_shrink = st.columns(3)
+    with col_rate:
+        risk_free_rate = st.number_input(
+            "Risk-free rate for max Sharpe (annual %):", min_value=0.0, max_value=10.0, value=0.0, step=0.1
+        ) / 100.0
+    with col_count:
+        n_portfolios = st.selectbox("Random portfolios:", options=[10_000, 100_000, 250_000], index=1,
+                                    format_func=lambda n: f"{n:,}")
+    with col_shrink:
+        # Ledoit-Wolf shrinks the sample covariance towards a scaled identity, which keeps the optimizer
+        # from over-trusting noisy correlations when there are many stocks or a short history.
+        shrink = st.checkbox("Ledoit-Wolf covariance shrinkage", value=True)
+
+    # Memoized on the returns and these inputs; the Monte Carlo cloud is evaluated in chunked matrix products.
+    analysis = portfolio_analysis(returns, risk_free_rate, shrink, n_portfolios)
+    mu, cov = analysis['mu'], analysis['cov']
+    if shrink:
+        st.caption(f"Shrinkage intensity: {analysis['shrinkage']:.3f} (0 = sample covariance, 1 = fully shrunk).")
+
+    # Target-return portfolio: the cheapest single optimization, so it is the only one the slider recomputes.
+    min_var_return = portfolio_stats(analysis['min_variance'].to_numpy(), mu, cov)[0]
+    low_pct = round(min_var_return * 100, 1)
+    # Efficient targets run from the min-variance return up to the best single stock's return.
+    high_pct = max(round(float(mu.max()) * 100, 1), low_pct + 0.1)
+    target_pct = st.slider("Target annual return (%):", min_value=low_pct, max_value=high_pct,
+                           value=round((low_pct + high_pct) / 2, 1), step=0.1)
+    target_weights = pd.Series(target_return_weights(mu, cov, target_pct / 100.0), index=returns.columns)
+
+    portfolios = {
+        'Minimum Variance': analysis['min_variance'],
+        'Maximum Sharpe': analysis['max_sharpe'],
+        f'Target {target_pct:.1f}%': target_weights
+    }
+    simulated = analysis['simulated']
+    # Draw only a sample of the cloud; sending 100k+ points would make the chart sluggish without adding detail.
+    shown = slice(0, min(PORTFOLIO_CLOUD_POINTS, len(simulated['Return'])))
+    fig_frontier = go.Figure()
+    fig_frontier.add_trace(go.Scattergl(
+        x=simulated['Volatility'][shown], y=simulated['Return'][shown], mode='markers', name='Random portfolios',
+        marker=dict(size=4, color=simulated['Sharpe'][shown], colorscale='Viridis', showscale=True,
+                    colorbar=dict(title='Sharpe')),
+        hovertemplate="Volatility: %{x:.2%}<br>Return: %{y:.2%}<extra></extra>"
+    ))
+    frontier = analysis['frontier']
+    fig_frontier.add_trace(go.Scatter(x=frontier['Volatility'], y=frontier['Return'], mode='lines',
+                                      name='Efficient frontier', line=dict(color='black', width=2)))
+    fig_frontier.add_trace(go.Scatter(x=np.sqrt(np.diag(cov)), y=mu, mode='markers+text', name='Stocks',
+                                      text=list(returns.columns), textposition='top center',
+                                      marker=dict(symbol='diamond', size=8, color='gray')))
+    for (name, weights), symbol in zip(portfolios.items(), ['star', 'star-diamond', 'x']):
+        ret, vol, _ = portfolio_stats(weights.to_numpy(), mu, cov)
+        fig_frontier.add_trace(go.Scatter(x=[vol], y=[ret], mode='markers', name=name,
+                                          marker=dict(symbol=symbol, size=14, line=dict(width=1, color='black'))))
+    fig_frontier.update_layout(title=f"Efficient Frontier ({n_portfolios:,} random portfolios, {PORTFOLIO_CLOUD_POINTS:,} shown)",
+                               xaxis_title="Annual Volatility", yaxis_title="Expected Annual Return")
+    fig_frontier.update_xaxes(tickformat='.0%')
+    fig_frontier.update_yaxes(tickformat='.0%')
+    st.plotly_chart(fig_frontier, use_container_width=True)
+
+    # Weights and statistics of the optimized portfolios
+    summary = pd.DataFrame({
+        name: portfolio_stats(weights.to_numpy(), mu, cov, risk_free_rate) for name, weights in portfolios.items()
+    }, index=['Expected Return', 'Volatility', 'Sharpe Ratio']).T
+    st.dataframe(summary.round(4))
+    weights_df = pd.DataFrame(portfolios)
+    st.write("Portfolio weights (stocks with zero weight in all three portfolios are hidden):")
+    st.dataframe(weights_df[(weights_df > 1e-4).any(axis=1)].round(4))
+
+
+portfolio_section(returns)
+
+
+@st.fragment
+def simulation_section(returns):
+    """Monte Carlo scenario simulator for an equal-weight basket of the selected stocks."""
+    st.subheader("Monte Carlo Scenario Simulation")
+    st.write("Project the selected stocks forward to see the range of outcomes instead of a single forecast. "
+             "**Correlated GBM** draws normally distributed daily log returns with the historical means and correlations; "
+             "**Block bootstrap** replays random blocks of actual historical days (all stocks together), keeping fat tails and crashes. "
+             "The basket is bought with equal weights and held.")
+    with st.form("simulation_form"):
+        basket = st.multiselect("Stocks in the basket:", options=list(returns.columns),
+                                default=list(returns.columns[:10]))
+        col_model, col_horizon, col_paths = st.columns(3)
+        with col_model:
+            model = st.radio("Model:", options=MODELS)
+            block = st.number_input("Bootstrap block length (days):", min_value=1, max_value=250, value=20, step=1)
+        with col_horizon:
+            horizon = st.selectbox("Horizon (trading days):", options=[21, 63, 126, 252, 504], index=3)
+            seed = st.number_input("Random seed:", min_value=0, max_value=2**31 - 1, value=42, step=1)
+        with col_paths:
+            # A million paths are spread over the process pool (see finance/simulation.py); the progress bar
+            # below follows the finished jobs.
+            n_paths = st.selectbox("Number of paths:", options=[10_000, 100_000, 1_000_000], index=0,
+                                   format_func=lambda n: f"{n:,}")
+        st.form_submit_button("Run simulation")
+
+    if not basket:
+        st.info("Select at least one stock for the basket.")
+        return
+    progress_bar = st.progress(0.0, text=f"Simulating {n_paths:,} paths...")
+    try:
+        # Memoized on the returns and all inputs: the same settings are never simulated twice.
+        result = simulate_scenarios(returns[basket], tuple([1.0] * len(basket)), model, int(horizon),
+                                    int(n_paths), int(seed), int(block),
+                                    progress=lambda done: progress_bar.progress(
+                                        done, text=f"Simulating {n_paths:,} paths... {done:.0%}"))
+    except ValueError as e:
+        st.warning(f"Cannot run the simulation: {e}")
+        return
+    finally:
+        progress_bar.empty()
+
+    terminal = result['terminal']
+    col_loss, col_median, col_low = st.columns(3)
+    col_loss.metric("Probability of loss", f"{result['prob_loss']:.1%}")
+    col_median.metric("Median basket return", f"{result['fan'].iloc[-1]['P50'] - 1:.1%}")
+    col_low.metric("5th percentile return", f"{result['fan'].iloc[-1]['P5'] - 1:.1%}")
+
+    # Fan chart: percentile bands of the basket value (start = 100) for every simulated day.
+    fan = result['fan'] * 100
+    fig_fan = go.Figure()
+    bands = [('P5', 'P95', 'rgba(31, 119, 180, 0.15)', '5th–95th percentile'),
+             ('P25', 'P75', 'rgba(31, 119, 180, 0.35)', '25th–75th percentile')]
+    for low, high, color, name in bands:
+        fig_fan.add_trace(go.Scatter(x=fan.index, y=fan[high], mode='lines', line=dict(width=0),
+                                     showlegend=False, hoverinfo='skip'))
+        fig_fan.add_trace(go.Scatter(x=fan.index, y=fan[low], mode='lines', line=dict(width=0),
+                                     fill='tonexty', fillcolor=color, name=name))
+    fig_fan.add_trace(go.Scatter(x=fan.index, y=fan['P50'], mode='lines', name='Median',
+                                 line=dict(color='rgb(31, 119, 180)', width=2)))
+    fig_fan.add_hline(y=100, line_dash="dot", line_color="gray")
+    fig_fan.update_layout(title=f"Basket Value Fan Chart ({n_paths:,} paths, {model})",
+                          xaxis_title="Trading days ahead", yaxis_title="Basket value (start = 100)")
+    st.plotly_chart(fig_fan, use_container_width=True)
+
+    # Terminal distribution, binned here so only ~100 bars (not one value per path) go to the browser.
+    counts, edges = np.histogram(terminal, bins=100)
+    fig_terminal = go.Figure(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2, y=counts / counts.sum(), width=np.diff(edges),
+        marker_color=np.where(edges[1:] <= 0, 'indianred', 'seagreen')
+    ))
+    fig_terminal.update_layout(title=f"Distribution of Basket Return after {horizon} Trading Days",
+                               xaxis_title="Basket return", yaxis_title="Share of paths", bargap=0)
+    fig_terminal.update_xaxes(tickformat='.0%')
+    st.plotly_chart(fig_terminal, use_container_width=True)
+
+    st.write("Per-stock outcomes at the horizon:")
+    st.dataframe(result['assets'].round(4))
+
+
+simulation_section(returns)
 
 # Valuation Multiples for IB/PE Interview Prep
 st.write(
@@ -401,21 +1013,16 @@ st.write(
 st.subheader("Valuation Multiples for IB/PE Interview Prep")
 st.write("Common valuation multiples: P/E (trailing & forward), PEG ratio, P/B ratio, EV/EBITDA, EV/Sales.")
 
-multiples = {}
-for ticker in selected_tickers:
-    info = yf.Ticker(ticker).info
-    multiples[ticker] = {
-        'Trailing P/E': info.get('trailingPE', None),
-        'Forward P/E': info.get('forwardPE', None),
-        'PEG Ratio': info.get('pegRatio', None),
-        'Price/Book': info.get('priceToBook', None),
-        'EV/EBITDA': info.get('enterpriseToEbitda', None),
-        'EV/Sales': info.get('enterpriseToSales', None)
-    }
-
-multiples_df = pd.DataFrame(multiples).T
+# Fundamentals were loaded concurrently above; tickers whose data could not be loaded get empty rows.
+fundamentals, failed_fundamentals = fetched.get("fundamentals", ({}, {}))
+if "fundamentals" in fetch_errors:
+    failed_fundamentals = {t: fetch_errors["fundamentals"] for t in selected_tickers}
+multiples_df = valuation_multiples(fundamentals, selected_tickers)
 # Round numeric values for display
 multiples_df = multiples_df.round(2)
+failed_info = [t for t in selected_tickers if t in failed_fundamentals]
+if failed_info:
+    st.warning(f"Could not load valuation data for: {', '.join(failed_info)}.")
 # Display multiples table
 st.dataframe(multiples_df)
 